@@ -9,6 +9,7 @@ system_prompt = """
 - **[R2] 严格的Parameters结构**:`thought`对象的结构: "在这里用一句话简要描述你的思考过程。例如：用户想打开浏览器，我看到了桌面上的Chrome浏览器图标，所以下一步是点击它。"
 - **[R3] 精确的Action值**: `action`字段的值**必须**是`## 3. 工具集`中定义的一个大写字符串（例如 `"CLICK"`, `"TYPE"`），不允许有任何前导/后置空格或大小写变化。
 - **[R4] 严格的Parameters结构**: `parameters`对象的结构**必须**与所选Action在`## 3. 工具集`中定义的模板**完全一致**。键名、值类型都必须精确匹配。
+- **[R5] 批量操作**: 当截图中能确定连续多步操作时（例如依次填写表单的多个输入框），可以按`## 3. 工具集`末尾的批量操作格式一次输出多个动作，以减少交互轮次。
 
 ## 3. 工具集 (Available Actions)
 ### CLICK
@@ -57,6 +58,18 @@ system_prompt = """
   "reason": "<string: 清晰解释失败原因>"
 }
 
+### 批量操作（可选）
+- **功能**: 按顺序执行多个动作，每个动作的`action`和`parameters`规则与单个动作完全相同，坐标均基于当前截图。
+- **格式**:
+{
+  "thought": "<string>",
+  "actions": [
+    {"action": "CLICK", "parameters": {...}, "guard": {"expect_change": <boolean, optional: 执行后画面必须变化，否则停止后续动作>}},
+    {"action": "TYPE", "parameters": {...}, "guard": {"settle": <boolean, optional: 执行后是否等待界面稳定，默认true>}}
+  ]
+}
+- 只有在不需要观察中间结果就能确定后续动作时才使用批量操作；FINISH/FAIL之后的动作不会被执行。
+
 ## 4. 思维与决策框架
 在生成每一步操作前，请严格遵循以下思考-验证流程：
 
@@ -81,11 +94,29 @@ messages = [
         "content": [{"type": "image_url","image_url": {"url": "https://img.alicdn.com/imgextra/i2/O1CN016iJ8ob1C3xP1s2M6z_!!6000000000026-2-tps-3008-1758.png"}},
                   {"type": "text", "text": "帮我打开浏览器。"}]},
  ]
-import os
-from openai import OpenAI
+import json
+from openai_pool import get_openai_client
+
+# 发送给模型的截图像素上限，截图编码和坐标映射都应使用同一个值
+MAX_PIXELS = 1280 * 28 * 28
+
+
+def format_history(history):
+    """将已执行的步骤整理成文本，供模型了解之前做过什么。"""
+    lines = []
+    for step in history:
+        for executed in step["actions"]:
+            status = "" if executed["ok"] else "（执行失败）"
+            lines.append(f"第{step['step']}步: {executed['action']} "
+                         f"{json.dumps(executed['parameters'], ensure_ascii=False)}{status}")
+    return "\n".join(lines)
+
 
-def get_response(image_url,instruction):
-    messages = [
+def build_messages(image_url, instruction, history=None):
+    text = instruction
+    if history:
+        text = f"{instruction}\n\n已执行的操作：\n{format_history(history)}\n\n请根据当前截图给出下一步操作。"
+    return [
         {
             "role": "system",
             "content": system_prompt,
@@ -93,15 +124,16 @@ def get_response(image_url,instruction):
         {
             "role": "user",
             "content": [
-                {"type": "image_url", "image_url": {"url": image_url},"max_pixels":1280*28*28},
-                {"type": "text", "text": instruction}]},
+                {"type": "image_url", "image_url": {"url": image_url},"max_pixels":MAX_PIXELS},
+                {"type": "text", "text": text}]},
     ]
 
-    client = OpenAI(
-        # 若没有配置环境变量，请用阿里云百炼API Key将下行替换为：api_key="sk-xxx",
-        api_key=os.getenv("DASHSCOPE_API_KEY"),
-        base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
-    )
+
+def get_response(image_url,instruction, history=None):
+    messages = build_messages(image_url, instruction, history)
+
+    # 复用共享客户端及其连接池；若没有配置环境变量，请传入api_key="sk-xxx"
+    client = get_openai_client()
 
     completion = client.chat.completions.create(
         model="gui-plus",
@@ -110,37 +142,232 @@ def get_response(image_url,instruction):
     content = completion.choices[0].message.content
     return content
 
-import json
+
+class JsonObjectScanner:
+    """
+    增量扫描模型输出，找到第一个完整的JSON对象。
+    不依赖```json代码块标记，支持```JSON、行内代码块以及没有代码块的输出；
+    跟踪字符串和转义状态，字符串里的花括号不会影响括号配对。
+    """
+
+    def __init__(self):
+        self.buffer = []
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+
+    def feed(self, chunk):
+        """输入一段文本，若第一个JSON对象已经闭合则返回解析后的dict，否则返回None。"""
+        for char in chunk:
+            if self.depth == 0:
+                if char == "{":
+                    self.buffer = [char]
+                    self.depth = 1
+                continue
+            self.buffer.append(char)
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char == "{":
+                self.depth += 1
+            elif char == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    try:
+                        return json.loads("".join(self.buffer))
+                    except ValueError:
+                        # 花括号里不是合法JSON（例如思考文字），继续向后找
+                        self.buffer = []
+        return None
+
+
+# 各动作的参数模板，与system_prompt中的工具集保持一致：参数名 -> (类型, 是否必填, 可选值)
+ACTION_SCHEMAS = {
+    "CLICK": {
+        "x": ((int, float), True, None),
+        "y": ((int, float), True, None),
+        "description": (str, False, None),
+    },
+    "TYPE": {
+        "text": (str, True, None),
+        "needs_enter": (bool, False, None),
+    },
+    "SCROLL": {
+        "direction": (str, True, ("up", "down")),
+        "amount": (str, True, ("small", "medium", "large")),
+    },
+    "KEY_PRESS": {
+        "key": (str, True, None),
+    },
+    "FINISH": {
+        "message": (str, False, None),
+    },
+    "FAIL": {
+        "reason": (str, False, None),
+    },
+}
+# system_prompt中FAIL动作写作FAILE，两种写法都接受
+ACTION_ALIASES = {"FAILE": "FAIL"}
+
+
+def validate_action(response_dict):
+    """
+    按ACTION_SCHEMAS校验模型输出的动作，返回(action, parameters)。
+    校验失败抛出ValueError。
+    """
+    if not isinstance(response_dict, dict):
+        raise ValueError(f"动作必须是JSON对象: {response_dict!r}")
+    action = response_dict.get("action")
+    if not isinstance(action, str):
+        raise ValueError(f"缺少action字段: {response_dict!r}")
+    action = ACTION_ALIASES.get(action, action)
+    schema = ACTION_SCHEMAS.get(action)
+    if schema is None:
+        raise ValueError(f"未知动作类型: {action}")
+    parameters = response_dict.get("parameters", {})
+    if not isinstance(parameters, dict):
+        raise ValueError(f"{action} 的parameters必须是对象: {parameters!r}")
+    for name, (types, required, choices) in schema.items():
+        if name not in parameters:
+            if required:
+                raise ValueError(f"{action} 动作缺少 '{name}' 参数")
+            continue
+        value = parameters[name]
+        if not isinstance(value, types) or (types != bool and isinstance(value, bool)):
+            raise ValueError(f"{action} 动作的 '{name}' 参数类型错误: {value!r}")
+        if choices and value.lower() not in choices:
+            raise ValueError(f"{action} 动作的 '{name}' 参数取值错误: {value!r}")
+    return action, parameters
+
+
+def parse_action_plan(response_dict):
+    """
+    把模型输出统一为动作计划[(action, parameters, guard), ...]，单个动作视为只有一步的计划。
+    执行前先校验计划中的全部动作，任何一个不合法都抛出ValueError。
+    """
+    if isinstance(response_dict, dict) and "actions" in response_dict:
+        items = response_dict["actions"]
+        if not isinstance(items, list) or not items:
+            raise ValueError(f"actions必须是非空列表: {items!r}")
+    else:
+        items = [response_dict]
+    plan = []
+    for item in items:
+        action, parameters = validate_action(item)
+        guard = item.get("guard") or {}
+        if not isinstance(guard, dict):
+            raise ValueError(f"{action} 动作的guard必须是对象: {guard!r}")
+        plan.append((action, parameters, guard))
+    return plan
+
 
 def parse_json(json_output):
-    lines = json_output.splitlines()
-    for i, line in enumerate(lines):
-        if line == "```json":
-            json_output = "\n".join(lines[i + 1:])  # 删除 "```json"之前的所有内容
-            json_output = json_output.split("```")[0]  # 删除 "```"之后的所有内容
-            break  # 找到"```json"后退出循环
-    response_dict = json.loads(json_output)
+    response_dict = JsonObjectScanner().feed(json_output)
+    if response_dict is None:
+        raise ValueError(f"模型回复中没有完整的JSON对象: {json_output!r}")
     return response_dict
+
+
+def stream_action(image_url, instruction, history=None):
+    """
+    以流式方式调用模型，第一个JSON对象闭合后立即返回，不等待模型输出后续文本。
+    return: (response_dict, 已收到的文本, 耗时统计)；耗时包括首token时间和首个动作时间
+    """
+    messages = build_messages(image_url, instruction, history)
+    client = get_openai_client()
+
+    start = time.perf_counter()
+    timings = {}
+    scanner = JsonObjectScanner()
+    received = []
+    stream = client.chat.completions.create(
+        model="gui-plus",
+        messages=messages,
+        stream=True,
+    )
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            timings.setdefault("first_token", time.perf_counter() - start)
+            received.append(delta)
+            response_dict = scanner.feed(delta)
+            if response_dict is not None:
+                timings["first_action"] = time.perf_counter() - start
+                return response_dict, "".join(received), timings
+    finally:
+        # 拿到动作后直接关闭连接，不再等待模型输出的后续文本
+        stream.close()
+    raise ValueError(f"模型回复中没有完整的JSON对象: {''.join(received)!r}")
+
+
 import requests
 import math
+import base64
+import hashlib
+import struct
+import threading
+import time
+from collections import OrderedDict
 from PIL import Image
 from io import BytesIO
 
-def smart_size(image_url, point,factor = 28, max_pixels = 1280 * 28 * 28, min_pixels = 4 * 28 * 28):
+# 头部嗅探时最多读取的字节数，JPEG的SOF段可能位于较大的EXIF段之后
+SNIFF_MAX_BYTES = 256 * 1024
+SNIFF_CHUNK_SIZE = 8 * 1024
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# 携带图像尺寸的JPEG SOF标记（排除DHT=C4、JPG=C8、DAC=CC）
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def sniff_image_size(data):
     """
-    param
-      image_path: 图像url
-      max_pixels：输入图像的最大像素值，超过此值则将图像的像素缩小至max_pixels内，与发起模型调用步骤设置的max_pixels值，应保持一致。
-      min_pixels：输入图像的最小像素值，一般设置为默认值：4 * 28 * 28即可。
-    return: 单张图像的Token数
+    只根据文件头解析图像尺寸（PNG IHDR / JPEG SOF），不解码像素。
+    return: (width, height)；数据不足或格式不支持时返回None
+    """
+    if data[:8] == PNG_SIGNATURE:
+        if len(data) < 24 or data[12:16] != b"IHDR":
+            return None
+        width, height = struct.unpack(">II", data[16:24])
+        return width, height
+
+    if data[:2] == b"\xff\xd8":
+        offset = 2
+        while offset + 4 <= len(data):
+            if data[offset] != 0xFF:
+                return None
+            marker = data[offset + 1]
+            if marker == 0xFF:  # 填充字节
+                offset += 1
+                continue
+            if marker == 0x01 or 0xD0 <= marker <= 0xD9:  # 无长度字段的独立标记
+                offset += 2
+                continue
+            segment_length = struct.unpack(">H", data[offset + 2:offset + 4])[0]
+            if marker in JPEG_SOF_MARKERS:
+                if offset + 9 > len(data):
+                    return None
+                height, width = struct.unpack(">HH", data[offset + 5:offset + 9])
+                return width, height
+            offset += 2 + segment_length
+    return None
+
+
+def compute_resize_grid(height, width, factor=28, max_pixels=1280 * 28 * 28, min_pixels=4 * 28 * 28):
+    """
+    计算模型侧对图像缩放后的尺寸，保证宽高为factor的整数倍且总像素在[min_pixels,max_pixels]内。
+    return: (h_bar, w_bar)
     """
-    response = requests.get(image_url)
-    response.raise_for_status()
-    image = Image.open(BytesIO(response.content))
-    # 获取图片的原始尺寸
-    height = image.height
-    width = image.width
-
     # 将高度调整为factor的整数倍
     h_bar = round(height / factor) * factor
     # 将宽度调整为factor的整数倍
@@ -160,14 +387,150 @@ def smart_size(image_url, point,factor = 28, max_pixels = 1280 * 28 * 28, min_pi
         h_bar = math.ceil(height * beta / factor) * factor
         # 重新计算调整后的宽度，确保为factor的整数倍
         w_bar = math.ceil(width * beta / factor) * factor
+    return h_bar, w_bar
+
+
+class ImageSizeCache:
+    """
+    截图尺寸与缩放网格的缓存，按条目数（LRU）和TTL淘汰，线程安全。
+    同一张截图被多次CLICK时无需重复下载和解析。
+    """
+
+    def __init__(self, maxsize=256, ttl=300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                if time.monotonic() - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def get_stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': f"{(self.hits / total * 100) if total else 0:.2f}%",
+            }
+
+
+# 全局截图尺寸缓存
+image_size_cache = ImageSizeCache()
+
+
+def image_cache_key(image_url):
+    """http(s)地址直接以URL为键；data URL按内容哈希，避免用整段base64做键。"""
+    if image_url.startswith("data:"):
+        return "sha1:" + hashlib.sha1(image_url.encode("ascii", "ignore")).hexdigest()
+    return image_url
+
+
+def fetch_image_size(image_url):
+    """
+    获取图像的原始尺寸，只读取到能解析出尺寸的文件头为止。
+    return: (width, height)
+    """
+    if image_url.startswith("data:"):
+        encoded = image_url.split(",", 1)[1]
+        # 按4字节对齐分段解码base64，直到头部足够解析尺寸
+        limit = SNIFF_CHUNK_SIZE
+        while True:
+            head = base64.b64decode(encoded[:limit - limit % 4])
+            size = sniff_image_size(head)
+            if size is not None or limit >= len(encoded) or limit >= SNIFF_MAX_BYTES:
+                break
+            limit *= 4
+        if size is None:
+            size = Image.open(BytesIO(base64.b64decode(encoded))).size
+        return size
+
+    response = requests.get(image_url, stream=True)
+    try:
+        response.raise_for_status()
+        # iter_content会按Content-Encoding解压，始终从同一个迭代器读取，不能混用response.raw
+        chunks = response.iter_content(SNIFF_CHUNK_SIZE)
+        head = b""
+        size = None
+        for chunk in chunks:
+            head += chunk
+            size = sniff_image_size(head)
+            if size is not None or len(head) >= SNIFF_MAX_BYTES:
+                break
+        if size is None:
+            # 其他格式（如WebP）交给PIL，Image.open只解析头部，不解码像素；头部不完整时继续读取下一块
+            size = _pil_image_size(head)
+            while size is None:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                head += chunk
+                size = _pil_image_size(head)
+        if size is None:
+            # 读完仍无法识别，由PIL抛出具体的错误
+            size = Image.open(BytesIO(head)).size
+        return size
+    finally:
+        response.close()
+
+
+def _pil_image_size(head):
+    """用PIL解析已读取的部分，头部还不完整或格式无法识别时返回None"""
+    try:
+        return Image.open(BytesIO(head)).size
+    except Exception:
+        return None
+
+
+def smart_size(image_url, point,factor = 28, max_pixels = 1280 * 28 * 28, min_pixels = 4 * 28 * 28):
+    """
+    param
+      image_path: 图像url（支持http(s)地址和base64 data URL）
+      max_pixels：输入图像的最大像素值，超过此值则将图像的像素缩小至max_pixels内，与发起模型调用步骤设置的max_pixels值，应保持一致。
+      min_pixels：输入图像的最小像素值，一般设置为默认值：4 * 28 * 28即可。
+    return: 映射到原始图像上的绝对坐标(abs_x, abs_y)
+    """
+    cache_key = (image_cache_key(image_url), factor, max_pixels, min_pixels)
+    cached = image_size_cache.get(cache_key)
+    if cached is None:
+        # 获取图片的原始尺寸
+        width, height = fetch_image_size(image_url)
+        h_bar, w_bar = compute_resize_grid(height, width, factor, max_pixels, min_pixels)
+        cached = (width, height, h_bar, w_bar)
+        image_size_cache.put(cache_key, cached)
+    width, height, h_bar, w_bar = cached
+
     abs_x1 = int(point["x"] / w_bar * width)
     abs_y1 = int(point["y"] / h_bar * height)
     return abs_x1, abs_y1
 
-
 import pyautogui
-import time
-import sys
 
 # 模拟滚动操作的默认幅度
 SCROLL_AMOUNTS = {
@@ -176,8 +539,103 @@ SCROLL_AMOUNTS = {
     "large": 500,
 }
 
+# 每次操作后等待界面刷新的时间（秒），关闭稳定检测时使用
+SETTLE_DELAY = 1.0
+# 稳定检测：操作后持续采样低分辨率画面，连续几帧不再变化即认为界面已刷新完成
+SETTLE_UNTIL_STABLE = True
+SETTLE_MAX_WAIT = 2.0  # 最长等待时间（秒）
+SETTLE_MIN_WAIT = 0.1  # 没有操作前截图时，首次采样前的等待，给界面开始响应的时间
+SETTLE_POLL_INTERVAL = 0.05
+SETTLE_STABLE_FRAMES = 2  # 连续多少帧与前一帧一致才算稳定
+STABLE_THUMB_SIZE = (64, 36)
+STABLE_PIXEL_TOLERANCE = 8  # 缩略图灰度差超过该值才算像素变化
+STABLE_MAX_CHANGED_PIXELS = 2  # 允许的变化像素数，忽略光标闪烁
+# 终止任务的动作
+TERMINAL_ACTIONS = ("FINISH", "FAIL")
+
+
+# 动作处理函数注册表：动作名 -> handler(parameters, image_url)，返回是否执行成功
+ACTION_HANDLERS = {}
+
+
+def register_action(name, schema=None):
+    """注册动作处理函数；给出schema时同时登记到ACTION_SCHEMAS，供validate_action校验参数。"""
+    def decorator(handler):
+        ACTION_HANDLERS[name] = handler
+        if schema is not None:
+            ACTION_SCHEMAS[name] = schema
+        return handler
+    return decorator
+
+
+@register_action("CLICK")
+def click_action(parameters, image_url):
+    # 将模型输出的坐标映射到原始屏幕分辨率
+    try:
+        abs_x, abs_y = smart_size(image_url, parameters)
+        pyautogui.click(abs_x, abs_y)
+        print(f"已点击坐标 ({abs_x}, {abs_y})")
+        return True
+    except Exception as e:
+        print(f"坐标映射或点击失败: {e}")
+        return False
+
+
+@register_action("TYPE")
+def type_action(parameters, image_url):
+    text_to_type = parameters["text"]
+    needs_enter = parameters.get("needs_enter", False)
+
+    pyautogui.write(text_to_type)
+    if needs_enter:
+        pyautogui.press("enter")
+    print(f"已输入文本: '{text_to_type}', 是否按回车: {needs_enter}")
+    return True
+
+
+@register_action("SCROLL")
+def scroll_action(parameters, image_url):
+    direction = parameters["direction"].lower()
+    amount_key = parameters["amount"].lower()
+
+    scroll_value = SCROLL_AMOUNTS.get(amount_key, SCROLL_AMOUNTS["medium"])  # 默认中等
+
+    if direction == "up":
+        pyautogui.scroll(scroll_value)
+        print(f"已向上滚动 {scroll_value} 单位。")
+    else:
+        pyautogui.scroll(-scroll_value)  # pyautogui向下滚动需要负值
+        print(f"已向下滚动 {scroll_value} 单位。")
+    return True
+
+
+@register_action("KEY_PRESS")
+def key_press_action(parameters, image_url):
+    key_to_press = parameters["key"].lower()
+    # 组合键（如 'alt+f4'）用hotkey依次按下
+    if "+" in key_to_press:
+        pyautogui.hotkey(*key_to_press.split("+"))
+    else:
+        pyautogui.press(key_to_press)
+    print(f"已按下按键: {key_to_press}")
+    return True
+
+
+@register_action("FINISH")
+def finish_action(parameters, image_url):
+    message = parameters.get("message", "任务已完成。")
+    print(f"任务完成: {message}")
+    return True
 
-def execute_gui_action(action: str, parameters: dict, original_image_url: str):
+
+@register_action("FAIL")
+def fail_action(parameters, image_url):
+    reason = parameters.get("reason", "任务失败。")
+    print(f"任务失败: {reason}")
+    return True
+
+
+def execute_gui_action(action: str, parameters: dict, original_image_url: str, wait: bool = True):
     """
     根据模型输出的动作和参数执行GUI操作。
 
@@ -185,92 +643,288 @@ def execute_gui_action(action: str, parameters: dict, original_image_url: str):
         action (str): 模型输出的动作类型（如 "CLICK", "TYPE"）。
         parameters (dict): 动作的参数字典。
         original_image_url (str): 原始屏幕截图的URL，用于坐标映射。
+        wait (bool): 是否在操作后等待界面刷新；多步循环中由调用方自行安排等待。
+
+    Returns:
+        bool: 动作是否执行成功。
     """
     print(f"执行动作: {action}, 参数: {parameters}")
 
-    if action == "CLICK":
-        # 确保 'x' 和 'y' 存在并为数值类型
-        if "x" not in parameters or "y" not in parameters:
-            print("错误: CLICK 动作缺少 'x' 或 'y' 坐标。")
-            return
-
-        # 将模型输出的坐标映射到原始屏幕分辨率
-        try:
-            abs_x, abs_y = smart_size(original_image_url, parameters)
-            pyautogui.click(abs_x, abs_y)
-            print(f"已点击坐标 ({abs_x}, {abs_y})")
-        except Exception as e:
-            print(f"坐标映射或点击失败: {e}")
-
-    elif action == "TYPE":
-        if "text" not in parameters:
-            print("错误: TYPE 动作缺少 'text' 参数。")
-            return
+    try:
+        action, parameters = validate_action({"action": action, "parameters": parameters})
+    except ValueError as e:
+        print(f"错误: {e}")
+        return False
+    handler = ACTION_HANDLERS.get(action)
+    if handler is None:
+        print(f"警告: 动作 {action} 没有注册处理函数")
+        return False
 
-        text_to_type = parameters["text"]
-        needs_enter = parameters.get("needs_enter", False)
+    # 稳定检测以操作前的画面为基准，画面变化后才开始判断稳定
+    baseline = frame_thumbnail(pyautogui.screenshot()) if wait and SETTLE_UNTIL_STABLE else None
+    ok = handler(parameters, original_image_url)
 
-        pyautogui.write(text_to_type)
-        if needs_enter:
-            pyautogui.press("enter")
-        print(f"已输入文本: '{text_to_type}', 是否按回车: {needs_enter}")
+    # 等待界面刷新，避免GUI操作过快
+    if wait:
+        settle_screen(baseline)
+    return ok
 
-    elif action == "SCROLL":
-        if "direction" not in parameters or "amount" not in parameters:
-            print("错误: SCROLL 动作缺少 'direction' 或 'amount' 参数。")
-            return
 
-        direction = parameters["direction"].lower()
-        amount_key = parameters["amount"].lower()
+def execute_action_plan(plan, image_url, until_stable=None):
+    """
+    按顺序执行动作计划，返回(已执行动作的记录, 最后一个动作执行前的画面缩略图)。
 
-        scroll_value = SCROLL_AMOUNTS.get(amount_key, SCROLL_AMOUNTS["medium"])  # 默认中等
+    每个动作执行后按guard处理：settle（默认True）等待界面稳定再执行下一个动作；
+    expect_change要求画面发生变化，否则放弃剩余动作。动作失败或遇到FINISH/FAIL时也会停止。
+    最后一个动作之后不等待，由调用方安排，返回的缩略图作为调用方稳定检测的基准。
+    until_stable默认取SETTLE_UNTIL_STABLE；关闭时只在需要expect_change时截取操作前的画面。
+    """
+    if until_stable is None:
+        until_stable = SETTLE_UNTIL_STABLE
+    executed = []
+    before = None
+    for index, (action, parameters, guard) in enumerate(plan):
+        expect_change = guard.get("expect_change")
+        before = frame_thumbnail(pyautogui.screenshot()) if until_stable or expect_change else None
+        ok = execute_gui_action(action, parameters, image_url, wait=False)
+        record = {"action": action, "parameters": parameters, "ok": ok}
+        executed.append(record)
+        if not ok or action in TERMINAL_ACTIONS or index == len(plan) - 1:
+            break
+
+        frame = None
+        if guard.get("settle", True) or expect_change:
+            frame, _ = settle_screen(before, until_stable)
+        if expect_change:
+            after = frame if frame is not None else pyautogui.screenshot()
+            if frames_match(before, frame_thumbnail(after)):
+                print(f"警告: {action} 执行后画面没有变化，放弃计划中剩余的 {len(plan) - index - 1} 个动作")
+                record["guard_failed"] = True
+                break
+    return executed, before
+
+
+from PIL import ImageChops
+
+
+def frame_thumbnail(image):
+    """缩小为灰度缩略图，用于快速比较两帧画面。"""
+    return image.convert("L").resize(STABLE_THUMB_SIZE, Image.NEAREST)
+
+
+def frames_match(previous, current):
+    diff = ImageChops.difference(previous, current)
+    changed = sum(diff.histogram()[STABLE_PIXEL_TOLERANCE + 1:])
+    return changed <= STABLE_MAX_CHANGED_PIXELS
+
+
+def wait_until_stable(baseline=None, max_wait=SETTLE_MAX_WAIT, min_wait=SETTLE_MIN_WAIT,
+                      interval=SETTLE_POLL_INTERVAL, stable_frames=SETTLE_STABLE_FRAMES, no_change_wait=SETTLE_DELAY):
+    """
+    采样屏幕直到连续stable_frames帧不再变化，或超过max_wait。
 
-        if direction == "up":
-            pyautogui.scroll(scroll_value)
-            print(f"已向上滚动 {scroll_value} 单位。")
-        elif direction == "down":
-            pyautogui.scroll(-scroll_value)  # pyautogui向下滚动需要负值
-            print(f"已向下滚动 {scroll_value} 单位。")
+    baseline为操作前画面的缩略图：画面与它不同之后才开始计算稳定帧，避免界面还没开始响应时
+    把操作前的静止画面当成稳定；no_change_wait秒内画面一直没有变化时按固定等待处理，返回当前画面。
+    没有baseline时先等待min_wait秒再开始计算。
+    return: (最后一帧截图, 是否稳定)；调用方可以直接复用这帧截图，省去一次截屏。
+    """
+    start = time.monotonic()
+    deadline = start + max_wait
+    changed = baseline is None
+    if changed:
+        time.sleep(min_wait)
+    frame = pyautogui.screenshot()
+    previous = frame_thumbnail(frame)
+    matched = 0
+    while time.monotonic() < deadline:
+        if not changed:
+            changed = not frames_match(baseline, previous)
+            if not changed and time.monotonic() - start >= no_change_wait:
+                return frame, False
+        time.sleep(interval)
+        frame = pyautogui.screenshot()
+        current = frame_thumbnail(frame)
+        if changed and frames_match(previous, current):
+            matched += 1
+            if matched >= stable_frames:
+                return frame, True
         else:
-            print(f"警告: 未知滚动方向: {direction}")
+            matched = 0
+        previous = current
+    return frame, False
 
-    elif action == "KEY_PRESS":
-        if "key" not in parameters:
-            print("错误: KEY_PRESS 动作缺少 'key' 参数。")
-            return
 
-        key_to_press = parameters["key"].lower()
-        pyautogui.press(key_to_press)
-        print(f"已按下按键: {key_to_press}")
+def settle_screen(baseline=None, until_stable=None):
+    """
+    操作后等待界面刷新：开启稳定检测（默认取SETTLE_UNTIL_STABLE）时等到画面稳定，否则固定等待SETTLE_DELAY秒。
+    baseline为操作前画面的缩略图，见wait_until_stable。
+    """
+    if until_stable is None:
+        until_stable = SETTLE_UNTIL_STABLE
+    if until_stable:
+        return wait_until_stable(baseline)
+    time.sleep(SETTLE_DELAY)
+    return None, True
 
-    elif action == "FINISH":
-        message = parameters.get("message", "任务已完成。")
-        print(f"任务完成: {message}")
 
-    elif action == "FAIL":
-        reason = parameters.get("reason", "任务失败。")
-        print(f"任务失败: {reason}")
+from concurrent.futures import ThreadPoolExecutor
 
-    else:
-        print(f"警告: 收到未知动作类型: {action}")
 
-    # 模拟人类操作的延时，避免GUI操作过快
-    time.sleep(1)  # 每次操作后等待1秒
+def capture_screenshot(image=None):
+    """
+    截取本地屏幕，image不为空时直接使用（例如稳定检测的最后一帧）。
+    return: (截图, 屏幕逻辑尺寸)；高分屏下截图像素可能大于pyautogui点击使用的逻辑坐标
+    """
+    if image is None:
+        image = pyautogui.screenshot()
+    screen_width, screen_height = pyautogui.size()
+    return image, (screen_width, screen_height)
 
 
-if __name__ == "__main__":
-    original_image_url = "https://img.alicdn.com/imgextra/i2/O1CN016iJ8ob1C3xP1s2M6z_!!6000000000026-2-tps-3008-1758.png"
-    instruction = "帮我打开浏览器。"
+def encode_screenshot(image, screen_size, factor=28, max_pixels=MAX_PIXELS, min_pixels=4 * 28 * 28, quality=85):
+    """
+    按模型的max_pixels预算缩放截图并编码为base64 data URL。
+    同时把屏幕逻辑尺寸写入截图尺寸缓存，CLICK时smart_size直接映射回屏幕坐标，无需再解析图片。
+    """
+    screen_width, screen_height = screen_size
+    h_bar, w_bar = compute_resize_grid(screen_height, screen_width, factor, max_pixels, min_pixels)
+    resized = image.convert("RGB").resize((w_bar, h_bar), Image.BILINEAR)
+    buffer = BytesIO()
+    resized.save(buffer, format="JPEG", quality=quality)
+    image_url = "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+    cache_key = (image_cache_key(image_url), factor, max_pixels, min_pixels)
+    image_size_cache.put(cache_key, (screen_width, screen_height, h_bar, w_bar))
+    return image_url
+
+
+def capture_and_encode(delay=0.0, until_stable=False, baseline=None):
+    """
+    等待界面刷新后截屏并编码，返回(data URL, 耗时统计)。
+    until_stable为True时等待画面稳定并复用最后一帧（baseline为操作前画面的缩略图），否则固定等待delay秒。
+    """
+    frame = None
+    start = time.perf_counter()
+    if until_stable:
+        frame, _ = wait_until_stable(baseline)
+    elif delay > 0:
+        time.sleep(delay)
+    settled = time.perf_counter()
+    image, screen_size = capture_screenshot(frame)
+    captured = time.perf_counter()
+    image_url = encode_screenshot(image, screen_size)
+    encoded = time.perf_counter()
+    return image_url, {"settle": settled - start, "capture": captured - settled, "encode": encoded - captured}
+
+
+class TaskStats:
+    """统计已完成任务的模型调用次数，用来衡量批量操作减少了多少轮推理。"""
+
+    def __init__(self):
+        self.completed_tasks = 0
+        self.model_calls = 0
+        self.actions = 0
+
+    def record(self, result):
+        if result["status"] != "FINISH":
+            return
+        self.completed_tasks += 1
+        self.model_calls += result["model_calls"]
+        self.actions += sum(len(step["actions"]) for step in result["steps"])
+
+    def get_stats(self):
+        tasks = self.completed_tasks
+        return {
+            'completed_tasks': tasks,
+            'model_calls': self.model_calls,
+            'actions': self.actions,
+            'model_calls_per_task': f"{(self.model_calls / tasks) if tasks else 0:.2f}",
+            'actions_per_model_call': f"{(self.actions / self.model_calls) if self.model_calls else 0:.2f}",
+        }
+
+
+# 全局任务统计
+task_stats = TaskStats()
+
+
+def run_gui_agent(instruction, max_steps=20, settle_delay=SETTLE_DELAY, until_stable=None):
+    """
+    多步GUI代理循环：截屏 -> 调用模型 -> 解析 -> 执行，直到FINISH/FAIL或达到最大步数。
 
-    model_response = get_response(original_image_url, instruction)
-    print("大模型的回复：", model_response)
+    动作执行后的等待在后台线程进行：开启稳定检测（默认取SETTLE_UNTIL_STABLE）时，
+    画面一稳定就复用最后一帧编码；固定等待时在等待窗口的末尾截屏，提前量取上一帧
+    截屏+编码的耗时，这样等待结束时截图基本已编码完成。
 
+    模型可以一次返回多个动作（见parse_action_plan），一次推理驱动多步操作。
+
+    return: {"status": "FINISH"/"FAIL"/"MAX_STEPS", "steps": 每一步的动作与各阶段耗时, "model_calls": 模型调用次数}
+    """
+    if until_stable is None:
+        until_stable = SETTLE_UNTIL_STABLE
+    history = []
+    status = "MAX_STEPS"
+    model_calls = 0
+    executor = ThreadPoolExecutor(max_workers=1)
     try:
-        response_dict = parse_json(model_response)
-        action = response_dict["action"]
-        parameters = response_dict["parameters"]
-    except ValueError as e:
-        print(f"处理模型响应失败: {e}")
-        sys.exit()
+        pending = executor.submit(capture_and_encode)
+        for step in range(1, max_steps + 1):
+            step_start = time.perf_counter()
+            image_url, timings = pending.result()
+            # 主线程等待下一帧的时间（扣除后台截屏/编码后的剩余等待）
+            timings["wait"] = time.perf_counter() - step_start
+
+            start = time.perf_counter()
+            model_calls += 1
+            try:
+                response_dict, model_response, model_timings = stream_action(image_url, instruction, history)
+                plan = parse_action_plan(response_dict)
+            except ValueError as e:
+                print(f"处理模型响应失败: {e}")
+                status = "FAIL"
+                break
+            timings["model"] = time.perf_counter() - start
+            timings.update(model_timings)
+            print(f"第{step}步 大模型的回复：", model_response)
+
+            start = time.perf_counter()
+            executed, baseline = execute_action_plan(plan, image_url, until_stable)
+            timings["execute"] = time.perf_counter() - start
+
+            history.append({
+                "step": step,
+                "actions": executed,
+                "thought": response_dict.get("thought", ""),
+                "timings": timings,
+            })
+            action = executed[-1]["action"]
+            if action in TERMINAL_ACTIONS:
+                status = action
+                break
+
+            lead = timings["capture"] + timings["encode"]
+            pending = executor.submit(capture_and_encode, max(0.0, settle_delay - lead), until_stable, baseline)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    result = {"status": status, "steps": history, "model_calls": model_calls}
+    task_stats.record(result)
+    return result
+
+
+def print_step_timings(result):
+    print(f"任务状态: {result['status']}，共 {len(result['steps'])} 步，模型调用 {result['model_calls']} 次")
+    for step in result["steps"]:
+        t = step["timings"]
+        actions = ", ".join(executed["action"] for executed in step["actions"])
+        print(
+            f"第{step['step']}步 {actions}: "
+            f"稳定 {t['settle'] * 1000:.0f}ms, 截屏 {t['capture'] * 1000:.0f}ms, 编码 {t['encode'] * 1000:.0f}ms, "
+            f"等待 {t['wait'] * 1000:.0f}ms, 模型首token {t['first_token'] * 1000:.0f}ms, "
+            f"首个动作 {t['first_action'] * 1000:.0f}ms, 执行 {t['execute'] * 1000:.0f}ms"
+        )
+
+
+if __name__ == "__main__":
+    instruction = "帮我打开浏览器。"
 
-    execute_gui_action(action, parameters, original_image_url)
\ No newline at end of file
+    result = run_gui_agent(instruction)
+    print_step_timings(result)
+    print(task_stats.get_stats())
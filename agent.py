@@ -1,26 +1,56 @@
+"""
+深度调研智能体，langgraph.json通过get_agent加载。
 
-from deepagents import create_deep_agent
-from tavily import TavilyClient
-from langchain_community.chat_models import ChatTongyi
+导入本模块只定义函数：deepagents、langchain_community等依赖在第一次调用get_agent()时才导入，
+模型和智能体也在这时才创建，之后复用同一个实例；Tavily客户端在第一次搜索时创建（见research_tools）。
+LangGraph服务启动时不用等这些导入和构造，也不会发出任何模型请求。
 
-tongyi_chat = ChatTongyi(model="qwen-plus", )
+直接运行本文件会执行一次调研并流式输出：
+    python agent.py
+"""
+import threading
 
-tavily_client = TavilyClient(api_key="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")
+system_prompt = "你是一个专家级的研究助理，任务是进行彻底的调研并撰写报告"
 
-def internet_search(query: str):
-    """联网搜索功能"""
-    return tavily_client.search(query)
+_agent = None
+_agent_lock = threading.Lock()
 
-system_prompt = "你是一个专家级的研究助理，任务是进行彻底的调研并撰写报告"
 
-agent = create_deep_agent(
-    model=tongyi_chat,
-    tools=[internet_search],
-    system_prompt=system_prompt,
-)
-
-result = agent.invoke({
-    "messages": [
-        {"role": "user", "content": "详细调研Langchain最新发展写一个总结"}
-    ]
-})
+def get_agent():
+    """创建（只在第一次调用时）并返回深度调研智能体"""
+    global _agent
+    if _agent is None:
+        with _agent_lock:
+            if _agent is None:
+                from deepagents import create_deep_agent
+
+                from model_router import build_default_model
+                from research_tools import internet_search
+
+                # 同时配置了通义千问和DeepSeek的API Key时在两家之间路由：选当前最快的后端，
+                # 2秒内没有首个token就对冲到下一个，出错自动切换；只有一家的Key时直接使用该模型
+                model = build_default_model()
+                # 联网搜索：一次调用并发执行多个查询，TAVILY_API_KEY从环境变量（.env）读取
+                _agent = create_deep_agent(
+                    model=model,
+                    tools=[internet_search],
+                    system_prompt=system_prompt,
+                )
+    return _agent
+
+
+def __getattr__(name):
+    # 兼容from agent import agent，访问时才创建
+    if name == "agent":
+        return get_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+if __name__ == "__main__":
+    from streaming_runner import stream_agent
+
+    result, stats = stream_agent(get_agent(), {
+        "messages": [
+            {"role": "user", "content": "详细调研Langchain最新发展写一个总结"}
+        ]
+    })
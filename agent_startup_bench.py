@@ -0,0 +1,50 @@
+"""
+agent.py的冷启动耗时：每轮在新的Python进程中测量，反映LangGraph服务启动时加载图的开销。
+
+- import：导入agent模块（langgraph.json加载的模块）
+- ready：第一次调用get_agent()，导入deepagents等依赖并创建模型和智能体
+- cached：第二次调用get_agent()，直接返回已创建的实例
+
+不发出任何模型或搜索请求；没有配置API Key时使用占位值。
+
+    python agent_startup_bench.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = """
+import json, time
+start = time.perf_counter()
+import agent
+imported = time.perf_counter()
+agent.get_agent()
+ready = time.perf_counter()
+agent.get_agent()
+cached = time.perf_counter()
+print(json.dumps({"import": imported - start, "ready": ready - imported, "cached": cached - ready}))
+"""
+
+
+def measure():
+    env = dict(os.environ)
+    env.setdefault("DASHSCOPE_API_KEY", "sk-bench")
+    output = subprocess.run([sys.executable, "-W", "ignore", "-c", PROBE], env=env, capture_output=True,
+                            text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="测量agent.py的导入耗时和第一次创建智能体的耗时")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [measure() for _ in range(args.runs)]
+    for phase in ("import", "ready", "cached"):
+        values = sorted(run[phase] * 1000 for run in runs)
+        print(f"{phase:<7} 中位数 {statistics.median(values):8.2f}ms  最小 {values[0]:8.2f}ms  最大 {values[-1]:8.2f}ms")
+    total = statistics.median(run["import"] + run["ready"] for run in runs) * 1000
+    print(f"import + ready 中位数 {total:.1f}ms")
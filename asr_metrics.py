@@ -0,0 +1,165 @@
+"""
+语音识别延迟指标：按请求记录首包延迟、尾包延迟、音频时长和实时率（RTF），
+按(model, endpoint)分组计算p50/p95/p99，可导出为Prometheus文本格式或逐条追加到JSONL。
+
+- 首包延迟：开始发送音频到收到第一个识别结果（Recognition.get_first_package_delay()）
+- 尾包延迟：停止发送音频到识别完成（Recognition.get_last_package_delay()）
+- RTF：处理耗时 / 音频时长；文件识别中小于1表示比实时快
+
+用法：
+    asr_metrics.record_recognition(recognition, audio_seconds=12.3, processing_seconds=2.1)
+    print(asr_metrics.to_prometheus())
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+from percentiles import percentile
+
+# 分位数只在最近WINDOW个请求上计算，反映当前的延迟水平；_sum/_count为累计值
+WINDOW = 1000
+QUANTILES = (0.5, 0.95, 0.99)
+# 参与分位数统计的指标及其Prometheus说明
+METRICS = {
+    'first_package_delay_ms': '开始发送音频到收到首个识别结果的延迟（毫秒）',
+    'last_package_delay_ms': '停止发送音频到识别完成的延迟（毫秒）',
+    'rtf': '实时率：处理耗时 / 音频时长',
+}
+
+
+def default_endpoint():
+    """识别服务的接入域名，区分不同地域（如dashscope.aliyuncs.com、dashscope-intl.aliyuncs.com）"""
+    import dashscope
+    return urlparse(dashscope.base_websocket_api_url).hostname or 'unknown'
+
+
+def _delay(value):
+    # 未收到首包/未完成时dashscope返回负数
+    return round(value, 1) if value is not None and value >= 0 else None
+
+
+class _Series:
+    """同一组标签下的一个指标：滑动窗口 + 累计的sum/count"""
+    __slots__ = ('window', 'sum', 'count')
+
+    def __init__(self, size):
+        self.window = deque(maxlen=size)
+        self.sum = 0.0
+        self.count = 0
+
+    def add(self, value):
+        self.window.append(value)
+        self.sum += value
+        self.count += 1
+
+
+class AsrMetrics:
+    """线程安全；jsonl_path不为空时每条记录追加写入该文件"""
+
+    def __init__(self, window=WINDOW, jsonl_path=None):
+        self.window = window
+        self.jsonl_path = jsonl_path
+        self._lock = threading.Lock()
+        self._series = {}
+        self._audio_seconds = {}
+        self._requests = {}
+
+    def record(self, request_id, first_package_delay_ms=None, last_package_delay_ms=None, audio_seconds=None,
+               processing_seconds=None, model='unknown', endpoint='unknown'):
+        """记录一次识别请求，返回记录内容"""
+        rtf = processing_seconds / audio_seconds if audio_seconds and processing_seconds is not None else None
+        record = {
+            'timestamp': round(time.time(), 3),
+            'request_id': request_id,
+            'model': model,
+            'endpoint': endpoint,
+            'first_package_delay_ms': _delay(first_package_delay_ms),
+            'last_package_delay_ms': _delay(last_package_delay_ms),
+            'audio_seconds': round(audio_seconds, 3) if audio_seconds is not None else None,
+            'processing_seconds': round(processing_seconds, 3) if processing_seconds is not None else None,
+            'rtf': round(rtf, 4) if rtf is not None else None,
+        }
+        labels = (model, endpoint)
+        with self._lock:
+            self._requests[labels] = self._requests.get(labels, 0) + 1
+            if audio_seconds:
+                self._audio_seconds[labels] = self._audio_seconds.get(labels, 0.0) + audio_seconds
+            for name in METRICS:
+                if record[name] is not None:
+                    series = self._series.get((name, labels))
+                    if series is None:
+                        series = self._series[(name, labels)] = _Series(self.window)
+                    series.add(record[name])
+            if self.jsonl_path:
+                with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return record
+
+    def record_recognition(self, recognition, audio_seconds=None, processing_seconds=None, endpoint=None):
+        """从dashscope的Recognition（或接口一致的对象）读取请求id和首包/尾包延迟并记录"""
+        def read(name):
+            getter = getattr(recognition, name, None)
+            return getter() if getter is not None else None
+
+        return self.record(read('get_last_request_id'), read('get_first_package_delay'),
+                           read('get_last_package_delay'), audio_seconds, processing_seconds,
+                           model=getattr(recognition, 'model', 'unknown'), endpoint=endpoint or default_endpoint())
+
+    def summary(self):
+        """{ 'model@endpoint': {指标: {count, p50, p95, p99}} }，分位数基于最近window个请求"""
+        with self._lock:
+            snapshot = {key: sorted(series.window) for key, series in self._series.items()}
+        result = {}
+        for (name, (model, endpoint)), values in snapshot.items():
+            stats = {'count': len(values)}
+            for q in QUANTILES:
+                stats[f'p{int(q * 100)}'] = percentile(values, q)
+            result.setdefault(f'{model}@{endpoint}', {})[name] = stats
+        return result
+
+    def to_prometheus(self):
+        """Prometheus文本格式：每个指标一个summary，另有请求数和音频时长的计数器"""
+        with self._lock:
+            series = {key: (sorted(s.window), s.sum, s.count) for key, s in self._series.items()}
+            requests = dict(self._requests)
+            audio_seconds = dict(self._audio_seconds)
+
+        def label_text(labels, **extra):
+            pairs = [('model', labels[0]), ('endpoint', labels[1])] + list(extra.items())
+            return ','.join(f'{key}="{value}"' for key, value in pairs)
+
+        lines = []
+        for name, help_text in METRICS.items():
+            metric = f'asr_{name}'
+            lines.append(f'# HELP {metric} {help_text}')
+            lines.append(f'# TYPE {metric} summary')
+            for (series_name, labels), (values, total, count) in sorted(series.items()):
+                if series_name != name:
+                    continue
+                for q in QUANTILES:
+                    lines.append(f'{metric}{{{label_text(labels, quantile=q)}}} {percentile(values, q)}')
+                lines.append(f'{metric}_sum{{{label_text(labels)}}} {total}')
+                lines.append(f'{metric}_count{{{label_text(labels)}}} {count}')
+        lines.append('# HELP asr_requests_total 识别请求数')
+        lines.append('# TYPE asr_requests_total counter')
+        for labels, count in sorted(requests.items()):
+            lines.append(f'asr_requests_total{{{label_text(labels)}}} {count}')
+        lines.append('# HELP asr_audio_seconds_total 已识别的音频时长（秒）')
+        lines.append('# TYPE asr_audio_seconds_total counter')
+        for labels, total in sorted(audio_seconds.items()):
+            lines.append(f'asr_audio_seconds_total{{{label_text(labels)}}} {total}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        """写出Prometheus文本，可配合node_exporter的textfile collector采集"""
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+
+# 进程内默认的收集器；设置环境变量ASR_METRICS_JSONL时逐条追加到该文件
+asr_metrics = AsrMetrics(jsonl_path=os.environ.get('ASR_METRICS_JSONL'))
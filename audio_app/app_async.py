@@ -0,0 +1,234 @@
+"""
+audio_app的asyncio版本：python-socketio的ASGI服务，运行在uvicorn上。
+
+帧接收、验证和转发都在事件循环中以协程完成，空闲连接不占用线程；
+识别实例的start()/stop()放到线程池执行，识别回调（在dashscope的线程中触发）投递回事件循环发送。
+只有正在推送WebM音频的客户端才有解码线程。
+
+运行方式：
+    python app_async.py
+    或 uvicorn app_async:asgi_app --port 5000
+"""
+import asyncio
+import json
+import os
+
+import socketio
+
+from decoder import EBML_MAGIC, DecodeStats
+from frame_analyzer import AudioFrame
+from frame_buffer import FrameBuffer
+from log_config import logger
+from result_emitter import ResultCoalescer
+from sessions import (BUFFER_CAPACITY, INPUT_PCM, INPUT_WEBM, OVERFLOW_POLICY, PARTIAL_RESULT_INTERVAL, WebCallback,
+                      create_recognition)
+from supervisor import SupervisedRecognition
+from validation import ENABLE_VAD, AudioValidator, init_dashscope_api_key
+from vad import VoiceActivityDetector
+
+INDEX_HTML = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'index.html')
+
+sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
+audio_validator = AudioValidator(drop_silence=not ENABLE_VAD)
+
+
+class AsyncRecognitionSession:
+    """
+    单个客户端的识别会话（asyncio版）：与线程版相同的有界缓冲（溢出策略、高低水位流控）+ 转发协程。
+    缓冲只在事件循环线程中读写，有帧到达时通过asyncio.Event唤醒转发协程。
+    """
+
+    def __init__(self, sid, loop, recognition_factory, input_format, vad_factory):
+        self.sid = sid
+        self.loop = loop
+        self.recognition_factory = recognition_factory
+        self.input_format = input_format
+        self.vad = vad_factory() if vad_factory is not None else None
+        self.audio_queue = FrameBuffer(BUFFER_CAPACITY, OVERFLOW_POLICY, on_flow_control=self._on_flow_control)
+        self._frame_ready = asyncio.Event()
+        self.results = ResultCoalescer(self.emit, PARTIAL_RESULT_INTERVAL)
+        self.recognition = None
+        self.decoder = None
+        self.decode_stats = DecodeStats()
+        self.opened = False
+        self._task = None
+        # close()之后到达的帧（如解码线程排空的尾部）直接丢弃
+        self._closed = False
+
+    def emit(self, event, data):
+        """识别回调可能在其他线程中触发，统一投递到事件循环发送"""
+        asyncio.run_coroutine_threadsafe(sio.emit(event, data, to=self.sid), self.loop)
+
+    def _on_flow_control(self, action, metrics):
+        """缓冲积压时通知前端暂停发送，回落后恢复"""
+        logger.info('[%s] 流控: %s, 队列深度 %d, 延迟 %sms', self.sid, action, metrics['depth'], metrics['lag_ms'])
+        self.emit('flow_control', {'action': action, 'depth': metrics['depth'], 'lag_ms': metrics['lag_ms']})
+
+    def feed(self, data):
+        if self._closed:
+            return
+        if self.input_format == INPUT_PCM:
+            self.accept_pcm(data)
+            return
+        # 浏览器重新开始录音时会发送新的WebM文件头，需要换一个解码器
+        if self.decoder is None or bytes(data[:4]) == EBML_MAGIC:
+            if self.decoder is not None:
+                self.decoder.close()
+            self.decoder = self.decode_stats.open(self._on_decoded, on_error=self._on_decode_error)
+        self.decoder.feed(data)
+
+    def _on_decoded(self, pcm):
+        # 解码线程 -> 事件循环
+        self.loop.call_soon_threadsafe(self.accept_pcm, pcm)
+
+    def _on_decode_error(self, error):
+        logger.warning('[%s] 音频解码失败: %s', self.sid, error)
+        self.emit('audio_error', {'message': '音频解码失败，请检查浏览器录音格式'})
+
+    def accept_pcm(self, pcm):
+        """验证并入队，首帧到达时启动转发协程"""
+        if self._closed:
+            return
+        stats = audio_validator.validate(pcm)
+        if stats is None:
+            return
+        if self._task is None:
+            self._task = self.loop.create_task(self._forward())
+        self.audio_queue.put(AudioFrame(pcm, stats))
+        self._frame_ready.set()
+
+    async def _next_frame(self):
+        """取出下一帧；关闭后排空缓冲再返回None"""
+        while True:
+            frame = self.audio_queue.get(timeout=0)
+            if frame is not None or self._closed:
+                return frame
+            self._frame_ready.clear()
+            await self._frame_ready.wait()
+
+    async def _forward(self):
+        self.recognition = SupervisedRecognition(self.recognition_factory, WebCallback(self))
+        try:
+            if self.vad is None:
+                await self._start()
+            while True:
+                frame = await self._next_frame()
+                if frame is None:
+                    break
+                if self.vad is None:
+                    self.recognition.send_audio_frame(frame.data)
+                    continue
+                result = self.vad.process(frame.data, frame.stats.rms)
+                if result.started:
+                    await self._start()
+                for speech_frame in result.frames:
+                    self.recognition.send_audio_frame(speech_frame)
+                if result.ended:
+                    await self._stop()
+        finally:
+            if self.opened:
+                await self._stop()
+
+    async def _start(self):
+        # start()需要与服务端握手，放到线程池避免阻塞事件循环
+        await self.loop.run_in_executor(None, self.recognition.start)
+        self.opened = True
+
+    async def _stop(self):
+        self.opened = False
+        await self.loop.run_in_executor(None, self.recognition.stop)
+
+    def close(self):
+        self._closed = True
+        if self.decoder is not None:
+            self.decoder.close()
+            self.decoder = None
+        # 转发协程处理完已缓冲的帧后退出，在finally中停止识别
+        self._frame_ready.set()
+
+    def get_stats(self):
+        stats = self.audio_queue.get_metrics()
+        stats['started'] = self._task is not None
+        stats.update(self.results.get_stats())
+        if self.recognition is not None:
+            stats.update(self.recognition.get_stats())
+        stats.update(self.decode_stats.get_stats())
+        if self.vad is not None:
+            stats.update(self.vad.get_stats())
+        return stats
+
+
+class AsyncSessionManager:
+    """按sid管理识别会话，只在事件循环线程中访问，无需加锁"""
+
+    def __init__(self, recognition_factory=create_recognition, input_format=INPUT_WEBM, vad_factory=None):
+        self.recognition_factory = recognition_factory
+        self.input_format = input_format
+        self.vad_factory = vad_factory
+        self._sessions = {}
+
+    def get(self, sid):
+        session = self._sessions.get(sid)
+        if session is None:
+            session = AsyncRecognitionSession(sid, asyncio.get_running_loop(), self.recognition_factory,
+                                              self.input_format, self.vad_factory)
+            self._sessions[sid] = session
+        return session
+
+    def close(self, sid):
+        session = self._sessions.pop(sid, None)
+        if session is not None:
+            session.close()
+
+    def get_stats(self):
+        return {sid: session.get_stats() for sid, session in self._sessions.items()}
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+session_manager = AsyncSessionManager(input_format=INPUT_WEBM,
+                                      vad_factory=VoiceActivityDetector if ENABLE_VAD else None)
+
+
+@sio.event
+async def connect(sid, environ):
+    logger.info('客户端已连接: %s', sid)
+    await sio.emit('status', {'message': '连接成功'}, to=sid)
+
+
+@sio.event
+async def disconnect(sid, *args):
+    logger.info('客户端已断开: %s', sid)
+    session_manager.close(sid)
+
+
+@sio.on('audio_data')
+async def audio_data(sid, data):
+    """接收前端发送的音频数据，验证后放入该客户端的队列"""
+    session_manager.get(sid).feed(data)
+
+
+async def stats_app(scope, receive, send):
+    """/stats：验证统计和各客户端会话的队列指标"""
+    if scope['type'] != 'http' or scope['path'] != '/stats':
+        await send({'type': 'http.response.start', 'status': 404, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+    body = json.dumps({
+        'validator': audio_validator.get_stats(),
+        'sessions': session_manager.get_stats(),
+    }, ensure_ascii=False).encode()
+    await send({'type': 'http.response.start', 'status': 200,
+                'headers': [(b'content-type', b'application/json')]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+asgi_app = socketio.ASGIApp(sio, other_asgi_app=stats_app, static_files={'/': INDEX_HTML})
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    init_dashscope_api_key()
+    uvicorn.run(asgi_app, port=5000)
@@ -0,0 +1,146 @@
+"""
+threading版（app.py）与asyncio版（app_async.py）服务的对比基准。
+
+分别启动两种服务（识别服务用load_test中的本地替身），用N个Socket.IO客户端连接：
+先统计建立连接后的服务端线程数和内存，再让每个客户端按实时速率发送音频，
+统计从发送一帧到收到对应识别结果的延迟（p50/p99）。
+运行方式：
+    python bench_modes.py --clients 200 --seconds 5
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+import socketio
+
+FRAME_SAMPLES = 1600  # 100ms @ 16kHz
+
+
+def serve(mode, port):
+    """在子进程中启动指定模式的服务，识别服务替换为本地替身，输入为PCM"""
+    import sessions
+    from load_test import StandInRecognition
+    from log_config import setup_logging
+    from sessions import INPUT_PCM
+
+    setup_logging('WARNING')
+    sys.stdout = open(os.devnull, 'w')  # 屏蔽服务的启动信息
+    # 每帧的结果都立即发送，比较的是两种服务模型本身的延迟，不含中间结果合并的等待
+    sessions.PARTIAL_RESULT_INTERVAL = 0
+    if mode == 'threading':
+        import app as audio_app
+        audio_app.session_manager.recognition_factory = StandInRecognition
+        audio_app.session_manager.input_format = INPUT_PCM
+        audio_app.socketio.run(audio_app.app, port=port, allow_unsafe_werkzeug=True)
+    else:
+        import uvicorn
+        import app_async
+        app_async.session_manager.recognition_factory = StandInRecognition
+        app_async.session_manager.input_format = INPUT_PCM
+        uvicorn.run(app_async.asgi_app, port=port, log_level='error')
+
+
+def process_usage(pid):
+    """服务进程的线程数和常驻内存（Linux /proc）"""
+    usage = {}
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('Threads:'):
+                usage['threads'] = int(line.split()[1])
+            elif line.startswith('VmRSS:'):
+                usage['rss_mb'] = int(line.split()[1]) / 1024
+    return usage
+
+
+def wait_for_port(port, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with contextlib.suppress(OSError), socket.create_connection(('127.0.0.1', port), timeout=0.5):
+            return
+        time.sleep(0.1)
+    raise RuntimeError(f'服务没有在{timeout}秒内启动')
+
+
+async def run_client(url, seconds, latencies, connected):
+    client = socketio.AsyncClient()
+    sent_at = {}
+
+    @client.on('recognition_result')
+    async def on_result(data):
+        seq = int(data['text'].split('-')[1])
+        start = sent_at.pop(seq, None)
+        if start is not None:
+            latencies.append(time.perf_counter() - start)
+
+    try:
+        await client.connect(url, transports=['websocket'])
+    except socketio.exceptions.ConnectionError:
+        return None
+    connected.append(client)
+    return client, sent_at
+
+
+async def stream_audio(client, sent_at, seconds, rng):
+    for seq in range(int(seconds * 10)):
+        samples = rng.normal(0, 3000, FRAME_SAMPLES).clip(-32768, 32767).astype(np.int16)
+        samples[0] = seq  # 用首个采样值标记帧序号，替身识别器会原样带回
+        sent_at[seq] = time.perf_counter()
+        await client.emit('audio_data', samples.tobytes())
+        await asyncio.sleep(0.1)
+
+
+async def bench_mode(mode, port, clients, seconds):
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', mode, '--port', str(port)],
+                              cwd=os.path.dirname(os.path.abspath(__file__)))
+    try:
+        wait_for_port(port)
+        base_usage = process_usage(server.pid)
+        url = f'http://127.0.0.1:{port}'
+        latencies, connected = [], []
+        results = await asyncio.gather(*(run_client(url, seconds, latencies, connected) for _ in range(clients)))
+        await asyncio.sleep(1)
+        idle_usage = process_usage(server.pid)
+
+        rng = np.random.default_rng(0)
+        await asyncio.gather(*(stream_audio(client, sent_at, seconds, rng)
+                               for client, sent_at in filter(None, results)))
+        await asyncio.sleep(1)
+        await asyncio.gather(*(client.disconnect() for client in connected))
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000 if latencies else float('nan')
+    p99 = latencies[max(0, int(len(latencies) * 0.99) - 1)] * 1000 if latencies else float('nan')
+    print(f'[{mode}] 连接成功 {len(connected)}/{clients}，'
+          f'空闲连接时线程数 {idle_usage["threads"]}（启动时 {base_usage["threads"]}），'
+          f'内存 {idle_usage["rss_mb"]:.0f}MB（启动时 {base_usage["rss_mb"]:.0f}MB）')
+    print(f'[{mode}] 识别结果 {len(latencies)} 条，延迟 p50 {p50:.1f}ms，p99 {p99:.1f}ms')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--port', type=int, default=5100)
+    parser.add_argument('--serve', choices=['threading', 'asyncio'], help='只启动服务（内部使用）')
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port)
+        return
+
+    asyncio.run(bench_mode('threading', args.port, args.clients, args.seconds))
+    asyncio.run(bench_mode('asyncio', args.port + 1, args.clients, args.seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""
+浏览器音频的流式解码：MediaRecorder发送的是audio/webm;codecs=opus容器分片，
+这里按客户端增量解封装、解码，重采样为16kHz单声道int16 PCM，并切成固定大小的帧。
+"""
+import queue
+import threading
+import time
+
+import av
+
+# WebM（EBML）文件头，浏览器每次重新开始录音都会发送新的文件头
+EBML_MAGIC = b"\x1a\x45\xdf\xa3"
+
+TARGET_SAMPLE_RATE = 16000
+FRAME_BYTES = 3200  # 100ms @ 16kHz int16
+
+
+class ChunkReader:
+    """把陆续到达的数据分片包装成阻塞读取的文件对象，供PyAV增量解封装"""
+
+    def __init__(self):
+        self._chunks = queue.Queue()
+        self._buffer = bytearray()
+        self._eof = False
+
+    def feed(self, data):
+        self._chunks.put(bytes(data))
+
+    def close(self):
+        self._chunks.put(None)
+
+    def read(self, size=-1):
+        # 至少等到一个分片或EOF，PyAV会按需反复调用
+        while not self._buffer and not self._eof:
+            chunk = self._chunks.get()
+            if chunk is None:
+                self._eof = True
+            else:
+                self._buffer += chunk
+        if size is None or size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+
+class StreamingDecoder:
+    """
+    单个WebM/Opus流的解码器，在自己的线程中运行，不占用Socket.IO事件线程。
+    每凑满frame_bytes字节的PCM就调用一次on_frame(pcm_bytes)；结束时不足一帧的尾部也会送出。
+    解码线程退出时调用on_finish(decoder)，此时decoded_samples和cpu_seconds已是最终值。
+    """
+
+    def __init__(self, on_frame, on_error=None, frame_bytes=FRAME_BYTES,
+                 sample_rate=TARGET_SAMPLE_RATE, container_format="webm", on_finish=None):
+        self.on_frame = on_frame
+        self.on_error = on_error
+        self.on_finish = on_finish
+        self.frame_bytes = frame_bytes
+        self.sample_rate = sample_rate
+        self.container_format = container_format
+        self._reader = ChunkReader()
+        self._pending = bytearray()
+        self.decoded_samples = 0
+        self.cpu_seconds = 0.0
+        self._thread = threading.Thread(target=self._run, name="webm-decoder", daemon=True)
+        self._thread.start()
+
+    def feed(self, data):
+        self._reader.feed(data)
+
+    def close(self):
+        """结束输入，解码线程处理完剩余数据后退出（只是放入EOF，不等待；需要最终统计时用join或on_finish）"""
+        self._reader.close()
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    def _emit_frames(self, final=False):
+        while len(self._pending) >= self.frame_bytes:
+            self.on_frame(bytes(self._pending[:self.frame_bytes]))
+            del self._pending[:self.frame_bytes]
+        if final and self._pending:
+            self.on_frame(bytes(self._pending))
+            self._pending.clear()
+
+    def _handle(self, resampled):
+        for out in resampled:
+            # s16单声道为packed格式，只有一个plane；plane可能带对齐填充，按采样数截取
+            self._pending += bytes(out.planes[0])[:out.samples * 2]
+            self.decoded_samples += out.samples
+        self._emit_frames()
+
+    def _run(self):
+        container = None
+        try:
+            container = av.open(self._reader, mode="r", format=self.container_format)
+            resampler = av.AudioResampler(format="s16", layout="mono", rate=self.sample_rate)
+            stream = container.streams.audio[0]
+            for packet in container.demux(stream):
+                # 只计时解码和重采样；on_frame（验证、VAD、入队等）在计时窗口之外调用。
+                # thread_time只统计本线程的CPU时间，等待数据到达的时间不计入解码开销
+                start = time.thread_time()
+                resampled = [out for frame in packet.decode() for out in resampler.resample(frame)]
+                self.cpu_seconds += time.thread_time() - start
+                self._handle(resampled)
+            start = time.thread_time()
+            resampled = resampler.resample(None)
+            self.cpu_seconds += time.thread_time() - start
+            self._handle(resampled)
+            self._emit_frames(final=True)
+        except Exception as e:
+            if self.on_error:
+                self.on_error(e)
+        finally:
+            if container is not None:
+                container.close()
+            if self.on_finish:
+                self.on_finish(self)
+
+
+class DecodeStats:
+    """
+    累计一个会话先后使用的所有解码器的解码量和CPU时间。
+    解码器由open()创建：退出时计入总量；已关闭但仍在处理剩余数据的解码器实时计入。
+    """
+
+    def __init__(self, sample_rate=TARGET_SAMPLE_RATE):
+        self.sample_rate = sample_rate
+        self._samples = 0
+        self._cpu_seconds = 0.0
+        self._running = set()
+        self._lock = threading.Lock()
+
+    def open(self, on_frame, on_error=None, **kwargs):
+        # 持有锁直到登记完成，解码线程即使立刻退出，_finished也会在登记之后执行
+        with self._lock:
+            decoder = StreamingDecoder(on_frame, on_error, sample_rate=self.sample_rate,
+                                       on_finish=self._finished, **kwargs)
+            self._running.add(decoder)
+        return decoder
+
+    def _finished(self, decoder):
+        with self._lock:
+            self._running.discard(decoder)
+            self._samples += decoder.decoded_samples
+            self._cpu_seconds += decoder.cpu_seconds
+
+    def get_stats(self):
+        """解码开销：每秒音频消耗的解码CPU时间"""
+        with self._lock:
+            samples = self._samples + sum(d.decoded_samples for d in self._running)
+            cpu_seconds = self._cpu_seconds + sum(d.cpu_seconds for d in self._running)
+        audio_seconds = samples / self.sample_rate
+        return {
+            'decoded_audio_seconds': round(audio_seconds, 2),
+            'decode_ms_per_audio_second': round(cpu_seconds * 1000 / audio_seconds, 2) if audio_seconds else 0.0,
+        }
@@ -0,0 +1,69 @@
+"""
+音频帧分析：一次计算PCM int16帧的RMS和峰值，结果随帧缓存，避免重复计算。
+"""
+import math
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+# 帧统计结果：采样点数、均方根、峰值（均为绝对幅值）
+FrameStats = namedtuple("FrameStats", ["samples", "rms", "peak"])
+
+# 预分配缓冲区的初始大小：1秒16kHz音频
+DEFAULT_BUFFER_SAMPLES = 16000
+
+
+class FrameAnalyzer:
+    """
+    在预分配的float32缓冲区上计算帧统计，每帧不再分配新数组。
+    先转为float32再平方，避免int16平方溢出（原实现中 audio_array ** 2 会溢出）。
+    缓冲区不是线程安全的，每个线程使用自己的实例（见analyze_frame）。
+    """
+
+    def __init__(self, max_samples=DEFAULT_BUFFER_SAMPLES):
+        self._buffer = np.empty(max_samples, dtype=np.float32)
+
+    def analyze(self, audio_data):
+        # 奇数长度时丢弃最后一个字节，frombuffer只创建视图，不复制数据
+        usable = len(audio_data) - len(audio_data) % 2
+        samples = np.frombuffer(audio_data, dtype=np.int16, count=usable // 2)
+        count = samples.size
+        if count == 0:
+            return FrameStats(0, 0.0, 0.0)
+        if count > self._buffer.size:
+            self._buffer = np.empty(count, dtype=np.float32)
+        buffer = self._buffer[:count]
+        np.copyto(buffer, samples)
+        rms = math.sqrt(float(np.dot(buffer, buffer)) / count)
+        peak = max(float(buffer.max()), -float(buffer.min()))
+        return FrameStats(count, rms, peak)
+
+
+def merge_stats(first, second):
+    """合并两帧的统计结果（帧合并时使用），无需重新计算"""
+    samples = first.samples + second.samples
+    if samples == 0:
+        return FrameStats(0, 0.0, 0.0)
+    rms = math.sqrt((first.samples * first.rms ** 2 + second.samples * second.rms ** 2) / samples)
+    return FrameStats(samples, rms, max(first.peak, second.peak))
+
+
+_local = threading.local()
+
+
+def analyze_frame(audio_data):
+    """使用当前线程的FrameAnalyzer计算帧统计。"""
+    analyzer = getattr(_local, "analyzer", None)
+    if analyzer is None:
+        analyzer = _local.analyzer = FrameAnalyzer()
+    return analyzer.analyze(audio_data)
+
+
+class AudioFrame:
+    """音频数据及其统计结果，放入队列后工作线程直接使用，无需再次验证。"""
+    __slots__ = ("data", "stats")
+
+    def __init__(self, data, stats):
+        self.data = data
+        self.stats = stats
@@ -0,0 +1,116 @@
+"""
+有界音频帧缓冲：识别服务变慢时不再无限堆积，按溢出策略丢帧或合并帧，
+并统计队列深度、延迟和丢弃数量；深度越过高/低水位时通知前端暂停/恢复发送。
+"""
+import threading
+import time
+from collections import deque
+
+from frame_analyzer import AudioFrame, merge_stats
+
+# 溢出策略
+DROP_OLDEST = "drop_oldest"  # 丢弃最旧的帧，保证延迟有界（实时识别的默认选择）
+DROP_NEWEST = "drop_newest"  # 丢弃新到的帧，保留已排队的连续音频
+COALESCE = "coalesce"  # 把新帧合并进队尾帧，合并后超过max_coalesce_bytes时退化为丢弃最旧的帧
+OVERFLOW_POLICIES = (DROP_OLDEST, DROP_NEWEST, COALESCE)
+
+# 流控信号
+FLOW_PAUSE = "pause"
+FLOW_RESUME = "resume"
+
+
+class FrameBuffer:
+    """
+    线程安全的有界帧队列（环形缓冲）。
+
+    capacity按帧数计，100ms一帧时默认30帧即最多积压3秒音频。
+    on_flow_control(action, metrics)在深度达到high_watermark时以"pause"调用，
+    暂停后回落到low_watermark时以"resume"调用。
+    """
+
+    def __init__(self, capacity=30, policy=DROP_OLDEST, high_watermark=0.8, low_watermark=0.3,
+                 max_coalesce_bytes=32000, on_flow_control=None):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"未知的溢出策略: {policy}")
+        self.capacity = capacity
+        self.policy = policy
+        self.high_watermark = max(1, int(capacity * high_watermark))
+        self.low_watermark = int(capacity * low_watermark)
+        self.max_coalesce_bytes = max_coalesce_bytes
+        self.on_flow_control = on_flow_control
+        self._frames = deque()
+        self._cond = threading.Condition()
+        self.paused = False
+        # 统计
+        self.pushed = 0
+        self.popped = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def put(self, frame):
+        """放入一帧，队列已满时按溢出策略处理"""
+        with self._cond:
+            self.pushed += 1
+            now = time.monotonic()
+            if len(self._frames) >= self.capacity:
+                if self.policy == DROP_NEWEST:
+                    self.dropped += 1
+                    return
+                if self.policy == COALESCE:
+                    tail, enqueued_at = self._frames[-1]
+                    if len(tail.data) + len(frame.data) <= self.max_coalesce_bytes:
+                        merged = AudioFrame(bytes(tail.data) + bytes(frame.data), merge_stats(tail.stats, frame.stats))
+                        self._frames[-1] = (merged, enqueued_at)
+                        self.coalesced += 1
+                        return
+                self._frames.popleft()
+                self.dropped += 1
+            self._frames.append((frame, now))
+            transition = None
+            if not self.paused and len(self._frames) >= self.high_watermark:
+                self.paused = True
+                transition = FLOW_PAUSE
+            self._cond.notify()
+        self._notify_flow(transition)
+
+    def get(self, timeout=None):
+        """取出最旧的一帧，超时返回None；同时记录该帧在队列中的等待时间"""
+        with self._cond:
+            if not self._frames and not self._cond.wait_for(lambda: self._frames, timeout):
+                return None
+            frame, enqueued_at = self._frames.popleft()
+            self.popped += 1
+            self.last_lag = time.monotonic() - enqueued_at
+            self.max_lag = max(self.max_lag, self.last_lag)
+            transition = None
+            if self.paused and len(self._frames) <= self.low_watermark:
+                self.paused = False
+                transition = FLOW_RESUME
+        self._notify_flow(transition)
+        return frame
+
+    def _notify_flow(self, transition):
+        if transition and self.on_flow_control:
+            self.on_flow_control(transition, self.get_metrics())
+
+    def __len__(self):
+        return len(self._frames)
+
+    def get_metrics(self):
+        with self._cond:
+            oldest_age = time.monotonic() - self._frames[0][1] if self._frames else 0.0
+            return {
+                'depth': len(self._frames),
+                'capacity': self.capacity,
+                'policy': self.policy,
+                'paused': self.paused,
+                'pushed': self.pushed,
+                'popped': self.popped,
+                'dropped': self.dropped,
+                'coalesced': self.coalesced,
+                'lag_ms': round(oldest_age * 1000, 1),
+                'last_lag_ms': round(self.last_lag * 1000, 1),
+                'max_lag_ms': round(self.max_lag * 1000, 1),
+            }
@@ -0,0 +1,143 @@
+"""
+多客户端负载测试：N个模拟客户端同时推送音频，识别服务用本地替身代替。
+
+检查每个客户端只收到自己的识别结果、断开后会话被清理，并统计整体吞吐和中间结果的合并情况。
+运行方式：
+    python load_test.py --clients 50 --frames 100
+"""
+import argparse
+import struct
+import threading
+import time
+
+import numpy as np
+
+import app as audio_app
+import sessions
+from log_config import setup_logging
+from sessions import INPUT_PCM
+
+FRAME_SAMPLES = 1600  # 100ms @ 16kHz
+
+
+class StandInResult:
+    """与RecognitionResult接口一致的替身结果"""
+
+    def __init__(self, text, sentence_end):
+        self.sentence = {'text': text, 'end_time': 0 if sentence_end else None}
+
+    def get_sentence(self):
+        return self.sentence
+
+    def get_request_id(self):
+        return 'stand-in'
+
+    def get_usage(self, sentence):
+        return None
+
+
+class StandInRecognition:
+    """
+    本地替身识别器：每收到一帧就回调一次结果，结果文本带上帧首个采样值和帧序号，
+    客户端据此确认结果来自自己的音频。
+    """
+
+    def __init__(self, callback, sentence_frames=10):
+        self.callback = callback
+        self.sentence_frames = sentence_frames
+        self.frames = 0
+
+    def start(self):
+        self.callback.on_open()
+
+    def send_audio_frame(self, data):
+        self.frames += 1
+        tag = struct.unpack_from('<h', data)[0]
+        self.callback.on_event(StandInResult(f'client-{tag}-{self.frames}', self.frames % self.sentence_frames == 0))
+
+    def stop(self):
+        self.callback.on_complete()
+        self.callback.on_close()
+
+
+def make_frame(client_index, rng):
+    samples = rng.normal(0, 3000, FRAME_SAMPLES).clip(-32768, 32767).astype(np.int16)
+    samples[0] = client_index  # 用首个采样值标记客户端
+    return samples.tobytes()
+
+
+def run_client(index, frames, interval, results):
+    rng = np.random.default_rng(index)
+    client = audio_app.socketio.test_client(audio_app.app)
+    for _ in range(frames):
+        client.emit('audio_data', make_frame(index, rng))
+        if interval:
+            time.sleep(interval)
+    results[index] = client
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--interval', type=float, default=0.1,
+                        help='每个客户端的发帧间隔（秒），0表示尽快发送以压测缓冲区溢出')
+    parser.add_argument('--result-interval', type=float, default=sessions.PARTIAL_RESULT_INTERVAL,
+                        help='中间结果的最小发送间隔（秒），0表示每个变化的结果都发送')
+    args = parser.parse_args()
+
+    # 识别事件的日志只在DEBUG级别输出，测试期间只保留告警
+    setup_logging('WARNING')
+    sessions.PARTIAL_RESULT_INTERVAL = args.result_interval
+
+    audio_app.session_manager.recognition_factory = StandInRecognition
+    # 模拟客户端直接发送PCM帧，跳过WebM解码
+    audio_app.session_manager.input_format = INPUT_PCM
+    clients = {}
+    start = time.perf_counter()
+    threads = [threading.Thread(target=run_client, args=(i, args.frames, args.interval, clients)) for i in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 等待各会话的工作线程把队列中的帧送完（被缓冲区丢弃或合并的帧不会产生识别回调）
+    sent = args.clients * args.frames
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        session_stats = audio_app.session_manager.get_stats()
+        expected = sum(stats['popped'] + stats['depth'] for stats in session_stats.values())
+        recognized = sum(stats['partials_received'] + stats['sentences_emitted'] for stats in session_stats.values())
+        if recognized >= expected:
+            break
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    # 等待被合并的最后一条中间结果补发
+    time.sleep(args.result_interval + 0.1)
+    received = {index: client.get_received() for index, client in clients.items()}
+    sessions_before = len(session_stats)
+    for client in clients.values():
+        client.disconnect()
+    time.sleep(0.3)  # 等待工作线程停止识别
+
+    leaked = 0
+    results = 0
+    for index, packets in received.items():
+        texts = [p['args'][0]['text'] for p in packets if p['name'] == 'recognition_result']
+        results += len(texts)
+        leaked += sum(1 for text in texts if not text.startswith(f'client-{index}-'))
+
+    dropped = sum(stats['dropped'] for stats in session_stats.values())
+    coalesced = sum(stats['coalesced'] for stats in session_stats.values())
+    max_lag = max((stats['max_lag_ms'] for stats in session_stats.values()), default=0)
+    print(f'客户端 {args.clients} 个，每个 {args.frames} 帧，共 {sent} 帧，用时 {elapsed:.2f}s')
+    print(f'识别回调 {recognized}/{expected}，吞吐 {recognized / elapsed:,.0f} 帧/秒 '
+          f'（相当于 {recognized / elapsed / 10:,.0f} 路实时音频）')
+    print(f'发送recognition_result {results} 条（合并间隔 {args.result_interval * 1000:.0f}ms，'
+          f'为识别回调的 {results / recognized * 100 if recognized else 0:.1f}%）')
+    print(f'缓冲区: 丢弃 {dropped} 帧，合并 {coalesced} 帧，最大排队延迟 {max_lag}ms')
+    print(f'串到其他客户端的结果: {leaked}')
+    print(f'会话数: 断开前 {sessions_before}，断开后 {len(audio_app.session_manager)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""
+audio_app的日志配置：日志记录只把消息放入队列，由后台的QueueListener线程写出，
+识别回调、帧处理等热路径上不再有同步的print。
+
+日志级别由环境变量AUDIO_APP_LOG_LEVEL控制，默认INFO；逐帧的验证告警为DEBUG级别。
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+
+logger = logging.getLogger('audio_app')
+
+_listener = None
+
+
+def setup_logging(level=None):
+    """配置异步日志，重复调用只更新日志级别"""
+    global _listener
+    level = level or os.environ.get('AUDIO_APP_LOG_LEVEL', 'INFO')
+    logger.setLevel(level)
+    if _listener is not None:
+        return logger
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    _listener.start()
+    atexit.register(_listener.stop)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.propagate = False
+    return logger
+
+
+setup_logging()
@@ -0,0 +1,115 @@
+"""
+识别结果的合并发送：中间结果按时间间隔和文本变化合并后再发给前端，句子结束立即发送。
+
+识别服务对每个中间假设都会回调一次，逐条广播是Web层的主要CPU开销；
+这里同一会话的中间结果最多每min_interval秒发送一次，且文本不变时不发送，
+被合并掉的最新文本由共享的定时线程在间隔到期时补发。
+"""
+import heapq
+import itertools
+import threading
+import time
+
+from log_config import logger
+
+
+class FlushScheduler:
+    """所有会话共用的一个定时线程，按到期时间执行延迟的补发"""
+
+    def __init__(self):
+        self._heap = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def call_later(self, delay, callback):
+        with self._cond:
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._counter), callback))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='result-flush', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+                    self._cond.wait(timeout)
+                _, _, callback = heapq.heappop(self._heap)
+            try:
+                callback()
+            except Exception:
+                logger.exception('补发识别结果失败')
+
+
+flush_scheduler = FlushScheduler()
+
+
+class ResultCoalescer:
+    """
+    单个会话的识别结果发送器，线程安全。
+    emit(event, data)负责把事件发给该会话的客户端（房间）。
+    """
+
+    def __init__(self, emit, min_interval=0.2, scheduler=flush_scheduler):
+        self._emit = emit
+        self.min_interval = min_interval
+        self._scheduler = scheduler
+        self._lock = threading.Lock()
+        self._last_text = None
+        self._last_emit = 0.0
+        self._pending = None
+        self._scheduled = False
+        # 统计
+        self.partials_received = 0
+        self.partials_emitted = 0
+        self.sentences_emitted = 0
+
+    def partial(self, text):
+        """中间结果：文本没变化则丢弃；距上次发送不足min_interval则暂存，到期补发最新的一条"""
+        with self._lock:
+            self.partials_received += 1
+            if text == self._last_text:
+                self._pending = None
+                return
+            wait = self._last_emit + self.min_interval - time.monotonic()
+            if wait > 0 or self._scheduled:
+                self._pending = text
+                if not self._scheduled:
+                    self._scheduled = True
+                    self._scheduler.call_later(wait, self._flush)
+                return
+            self._mark_sent(text)
+        self._emit('recognition_result', {'text': text, 'final': False})
+
+    def _flush(self):
+        with self._lock:
+            self._scheduled = False
+            text, self._pending = self._pending, None
+            if text is None or text == self._last_text:
+                return
+            self._mark_sent(text)
+        self._emit('recognition_result', {'text': text, 'final': False})
+
+    def _mark_sent(self, text):
+        self._last_text = text
+        self._last_emit = time.monotonic()
+        self.partials_emitted += 1
+
+    def final(self, text, sentence_end):
+        """句子结束：丢弃未发送的中间结果，立即发送最终文本和sentence_end"""
+        with self._lock:
+            self._pending = None
+            self._last_text = None
+            self._last_emit = time.monotonic()
+            self.sentences_emitted += 1
+        self._emit('recognition_result', {'text': text, 'final': True})
+        self._emit('sentence_end', sentence_end)
+
+    def get_stats(self):
+        return {
+            'partials_received': self.partials_received,
+            'partials_emitted': self.partials_emitted,
+            'sentences_emitted': self.sentences_emitted,
+        }
@@ -0,0 +1,94 @@
+"""
+采集用的环形缓冲区：PyAudio的回调线程把音频写入预分配的bytearray，消费线程按固定帧长取出。
+
+写入端永不阻塞（满了丢弃最旧的整帧并计数），音频回调中不分配内存；读取端在锁内把一帧复制为bytes返回。
+本模块只依赖标准库，供audio_input.py使用。
+"""
+import threading
+
+
+class AudioRingBuffer:
+    """
+    单写单读的环形缓冲区。frame_bytes为每次read()返回的字节数，容量为capacity_frames帧。
+
+    read()移动读位置后该段空间就可以被写入端覆盖，所以必须在锁内复制；
+    返回的bytes归调用方所有，可以放入队列、异步发送或长期持有。
+    """
+
+    def __init__(self, frame_bytes=6400, capacity_frames=32):
+        self.frame_bytes = frame_bytes
+        self.capacity = frame_bytes * capacity_frames
+        self._buffer = bytearray(self.capacity)
+        self._view = memoryview(self._buffer)
+        # 累计写入/读取的字节数，差值为当前积压量
+        self._write_pos = 0
+        self._read_pos = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        # 统计
+        self.overflows = 0
+        self.overflow_bytes = 0
+        self.max_fill = 0
+
+    def write(self, data):
+        """写入任意长度的数据（在音频回调线程中调用，不阻塞）"""
+        data = memoryview(data).cast("B")
+        with self._cond:
+            if len(data) > self.capacity:
+                self.overflow_bytes += len(data) - self.capacity
+                data = data[-self.capacity:]
+            size = len(data)
+            free = self.capacity - (self._write_pos - self._read_pos)
+            if size > free:
+                # 缓冲区满：按整帧丢弃最旧的数据，保持延迟有界
+                drop = -(-(size - free) // self.frame_bytes) * self.frame_bytes
+                drop = min(drop, self._write_pos - self._read_pos)
+                self._read_pos += drop
+                self.overflows += 1
+                self.overflow_bytes += drop
+            start = self._write_pos % self.capacity
+            first = min(size, self.capacity - start)
+            self._view[start:start + first] = data[:first]
+            if first < size:
+                self._view[:size - first] = data[first:]
+            self._write_pos += size
+            self.max_fill = max(self.max_fill, self._write_pos - self._read_pos)
+            self._cond.notify()
+
+    def read(self, timeout=None):
+        """取出一帧，返回bytes；超时或已关闭且数据不足一帧时返回None"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._write_pos - self._read_pos >= self.frame_bytes or self._closed,
+                                       timeout):
+                return None
+            if self._write_pos - self._read_pos < self.frame_bytes:
+                return None
+            start = self._read_pos % self.capacity
+            end = start + self.frame_bytes
+            self._read_pos += self.frame_bytes
+            # 释放锁之前复制：缓冲区接近满时，回调线程随后的write()会覆盖刚让出的空间
+            if end <= self.capacity:
+                return bytes(self._view[start:end])
+            # 帧跨越缓冲区末尾（写入长度不是帧长的整数倍）
+            return bytes(self._view[start:]) + bytes(self._view[:end - self.capacity])
+
+    def close(self):
+        """唤醒等待中的read()，之后read()只返回剩余的整帧"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def get_stats(self):
+        with self._cond:
+            return {
+                "frame_bytes": self.frame_bytes,
+                "capacity_frames": self.capacity // self.frame_bytes,
+                "buffered_bytes": self._write_pos - self._read_pos,
+                "max_fill_frames": round(self.max_fill / self.frame_bytes, 2),
+                "overflows": self.overflows,
+                "overflow_bytes": self.overflow_bytes,
+            }
@@ -0,0 +1,262 @@
+"""
+按Socket.IO客户端（sid）隔离的语音识别会话。
+
+每个客户端拥有独立的音频队列、Recognition实例和工作线程，识别结果只发送给该客户端；
+会话在收到第一帧音频时才启动，客户端断开时清理。
+"""
+import threading
+
+from dashscope.audio.asr import Recognition, RecognitionCallback, RecognitionResult
+
+from decoder import EBML_MAGIC, DecodeStats
+from frame_analyzer import AudioFrame, analyze_frame
+from frame_buffer import DROP_OLDEST, FrameBuffer
+from log_config import logger
+from result_emitter import ResultCoalescer
+from supervisor import SupervisedRecognition
+from vad import RecognitionGate
+
+# 每个会话的音频缓冲：最多积压30帧（100ms一帧即3秒），满了丢弃最旧的帧以保证延迟有界
+BUFFER_CAPACITY = 30
+OVERFLOW_POLICY = DROP_OLDEST
+# 浏览器发送的音频格式：'webm'为MediaRecorder的WebM/Opus分片，需要先解码；'pcm'为16kHz int16原始数据
+INPUT_WEBM = 'webm'
+INPUT_PCM = 'pcm'
+# 中间识别结果的最小发送间隔（秒），文本不变时不发送；句子结束总是立即发送
+PARTIAL_RESULT_INTERVAL = 0.2
+
+
+def create_recognition(callback):
+    """默认的识别实例工厂，测试时可替换为本地的替身识别器。"""
+    return Recognition(
+        model='paraformer-realtime-v2',
+        format='pcm',
+        sample_rate=16000,
+        semantic_punctuation_enabled=False,
+        callback=callback
+    )
+
+
+class WebCallback(RecognitionCallback):
+    """把识别事件转发给会话所属的客户端"""
+
+    def __init__(self, session):
+        self.session = session
+
+    def on_open(self):
+        logger.info('[%s] 语音识别服务已启动', self.session.sid)
+        self.session.emit('status', {'message': '语音识别服务已启动'})
+
+    def on_close(self):
+        logger.info('[%s] 语音识别服务已关闭', self.session.sid)
+        self.session.emit('status', {'message': '语音识别服务已关闭'})
+
+    def on_complete(self):
+        logger.info('[%s] 识别完成', self.session.sid)
+        self.session.emit('status', {'message': '识别完成'})
+
+    def on_error(self, message):
+        error_msg = f'识别错误: {message.message}'
+        logger.error('[%s] %s', self.session.sid, error_msg)
+
+        # 根据错误类型进行不同处理
+        if 'NO_VALID_AUDIO' in message.message:
+            self.handle_audio_error()
+        self.session.emit('error', {'message': error_msg})
+
+    def on_reconnecting(self, attempt, delay):
+        logger.info('[%s] %.1f秒后第%d次重连识别服务', self.session.sid, delay, attempt)
+        self.session.emit('status', {'message': f'识别服务连接中断，正在重连（第{attempt}次）'})
+
+    def on_reconnected(self, gap_ms):
+        self.session.emit('status', {'message': f'识别服务已重连，中断{gap_ms / 1000:.1f}秒'})
+
+    def handle_audio_error(self):
+        """处理音频数据错误"""
+        logger.warning('[%s] 音频数据错误处理：检查麦克风、音频格式和网络连接', self.session.sid)
+
+        # 可以在这里添加重连逻辑或用户提示
+        self.session.emit('audio_error', {
+            'message': '音频数据无效，请检查麦克风设置'
+        })
+
+    def on_event(self, result: RecognitionResult):
+        sentence = result.get_sentence()
+        if 'text' in sentence:
+            text = sentence['text']
+            logger.debug('[%s] 识别结果: %s', self.session.sid, text)
+            if RecognitionResult.is_sentence_end(sentence):
+                # 句子结束立即发送，未发出的中间结果作废
+                self.session.results.final(text, {
+                    'request_id': result.get_request_id(),
+                    'usage': result.get_usage(sentence)
+                })
+            else:
+                # 中间结果合并后再发送到前端
+                self.session.results.partial(text)
+
+
+class RecognitionSession:
+    """
+    单个客户端的识别会话：独立的音频队列、识别实例和工作线程。
+    validate(pcm)返回帧统计或None（丢弃该帧）；为None时不做验证，所有帧都计算统计后入队。
+    """
+
+    def __init__(self, sid, emit, recognition_factory=create_recognition, validate=None, input_format=INPUT_WEBM,
+                 vad_factory=None):
+        self.sid = sid
+        self._emit = emit
+        self._recognition_factory = recognition_factory
+        self._validate = validate
+        # 提供vad_factory时只在检测到语音时打开识别流
+        self._vad_factory = vad_factory
+        self.gate = None
+        self.input_format = input_format
+        self.decoder = None
+        self.decode_stats = DecodeStats()
+        self.audio_queue = FrameBuffer(BUFFER_CAPACITY, OVERFLOW_POLICY, on_flow_control=self._on_flow_control)
+        self.results = ResultCoalescer(self.emit, PARTIAL_RESULT_INTERVAL)
+        self.recognition = None
+        self._thread = None
+        self._closed = threading.Event()
+        self._start_lock = threading.Lock()
+
+    def emit(self, event, data):
+        self._emit(self.sid, event, data)
+
+    def _on_flow_control(self, action, metrics):
+        """缓冲积压时通知前端暂停发送，回落后恢复"""
+        logger.info('[%s] 流控: %s, 队列深度 %d, 延迟 %sms', self.sid, action, metrics['depth'], metrics['lag_ms'])
+        self.emit('flow_control', {'action': action, 'depth': metrics['depth'], 'lag_ms': metrics['lag_ms']})
+
+    def feed(self, data):
+        """
+        接收客户端发来的原始音频数据。
+        WebM分片交给该会话的解码线程，解码后的PCM帧再验证入队；PCM数据直接验证入队。
+        """
+        if self._closed.is_set():
+            return
+        if self.input_format == INPUT_PCM:
+            self._accept_pcm(data)
+            return
+        # 浏览器重新开始录音时会发送新的WebM文件头，需要换一个解码器
+        if self.decoder is None or bytes(data[:4]) == EBML_MAGIC:
+            self._close_decoder()
+            self.decoder = self.decode_stats.open(self._accept_pcm, on_error=self._on_decode_error)
+        self.decoder.feed(data)
+
+    def _accept_pcm(self, pcm):
+        stats = self._validate(pcm) if self._validate else analyze_frame(pcm)
+        if stats is not None:
+            self.push(AudioFrame(pcm, stats))
+
+    def _on_decode_error(self, error):
+        logger.warning('[%s] 音频解码失败: %s', self.sid, error)
+        self.emit('audio_error', {'message': '音频解码失败，请检查浏览器录音格式'})
+
+    def _close_decoder(self):
+        # close()只放入EOF，解码线程处理完剩余数据后才计入decode_stats的总量
+        if self.decoder is not None:
+            self.decoder.close()
+            self.decoder = None
+
+    def push(self, frame):
+        """放入一帧已验证的音频，首帧到达时才启动识别"""
+        if self._closed.is_set():
+            return
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._worker, name=f"recognition-{self.sid}", daemon=True)
+                    self._thread.start()
+        self.audio_queue.put(frame)
+
+    def _worker(self):
+        # 识别服务出错时自动重连并补发缓存的音频，会话不会因临时错误而失效
+        self.recognition = SupervisedRecognition(self._recognition_factory, WebCallback(self))
+        if self._vad_factory is not None:
+            self.gate = RecognitionGate(self.recognition, self._vad_factory())
+        else:
+            self.recognition.start()
+        try:
+            while not self._closed.is_set():
+                frame = self.audio_queue.get(timeout=0.1)
+                if frame is None:
+                    continue
+                # 入队前已完成验证，统计结果随帧携带，VAD直接使用其中的RMS，不再重复计算
+                if self.gate is not None:
+                    self.gate.process(frame.data, frame.stats.rms)
+                else:
+                    self.recognition.send_audio_frame(frame.data)
+        finally:
+            if self.gate is not None:
+                self.gate.close()
+            else:
+                self.recognition.stop()
+
+    def close(self):
+        """通知工作线程停止；识别实例的stop()在工作线程中执行，不阻塞断开事件"""
+        self._closed.set()
+        self._close_decoder()
+
+    @property
+    def started(self):
+        return self._thread is not None
+
+    def get_stats(self):
+        stats = self.audio_queue.get_metrics()
+        stats['started'] = self.started
+        stats.update(self.results.get_stats())
+        if self.recognition is not None:
+            stats.update(self.recognition.get_stats())
+        stats.update(self.decode_stats.get_stats())
+        if self.gate is not None:
+            stats.update(self.gate.get_stats())
+        return stats
+
+
+class SessionManager:
+    """按sid管理识别会话，线程安全；validate的含义见RecognitionSession"""
+
+    def __init__(self, emit, recognition_factory=create_recognition, validate=None, input_format=INPUT_WEBM,
+                 vad_factory=None):
+        self._emit = emit
+        self.recognition_factory = recognition_factory
+        self.validate = validate
+        self.input_format = input_format
+        self.vad_factory = vad_factory
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, sid):
+        """获取会话，不存在时创建（此时尚未启动识别）"""
+        with self._lock:
+            session = self._sessions.get(sid)
+            if session is None:
+                session = RecognitionSession(sid, self._emit, self.recognition_factory,
+                                             validate=self.validate, input_format=self.input_format,
+                                             vad_factory=self.vad_factory)
+                self._sessions[sid] = session
+            return session
+
+    def close(self, sid):
+        with self._lock:
+            session = self._sessions.pop(sid, None)
+        if session is not None:
+            session.close()
+
+    def close_all(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+    def get_stats(self):
+        """各会话的缓冲区统计：队列深度、延迟、丢弃/合并计数"""
+        with self._lock:
+            sessions = dict(self._sessions)
+        return {sid: session.get_stats() for sid, session in sessions.items()}
+
+    def __len__(self):
+        return len(self._sessions)
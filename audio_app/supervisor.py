@@ -0,0 +1,230 @@
+"""
+带自动重连的识别会话：识别服务出错时按指数退避重建识别实例，并补发缓存的音频尾部，
+长时间运行的转写不会因为一次临时的服务错误而中断或需要重启进程。
+
+SupervisedRecognition与Recognition接口一致（start/stop/send_audio_frame），
+可以直接交给RecognitionGate或会话的工作线程使用。本模块只依赖标准库，audio_app和audio_input.py共用。
+"""
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger("audio_app")
+
+
+class _SupervisedCallback:
+    """转发识别事件给用户回调；错误交给SupervisedRecognition处理，旧实例的迟到事件被忽略"""
+
+    def __init__(self, supervisor, generation):
+        self._supervisor = supervisor
+        self._generation = generation
+
+    def _current(self):
+        return self._generation == self._supervisor.generation
+
+    def on_open(self):
+        self._supervisor.callback.on_open()
+
+    def on_close(self):
+        if self._current():
+            self._supervisor.callback.on_close()
+
+    def on_complete(self):
+        if self._current():
+            self._supervisor.callback.on_complete()
+
+    def on_error(self, message):
+        if self._current():
+            self._supervisor.callback.on_error(message)
+            self._supervisor.fail(message.message)
+
+    def on_event(self, result):
+        if self._current():
+            self._supervisor.callback.on_event(result)
+
+
+class SupervisedRecognition:
+    """
+    recognition_factory(callback)创建底层识别实例（例如dashscope的Recognition），每次重连都会新建一个。
+
+    正常运行时保留最近replay_ms的音频；出错后进入断流状态，期间的音频继续缓存（最多buffer_ms），
+    后台线程按backoff_initial起、每次翻倍、不超过backoff_max的间隔重连，成功后先补发缓存的音频。
+    补发断流前的尾部可以找回服务端尚未确认的语音，代价是句子开头可能出现少量重复文本。
+
+    callback如果实现了on_reconnecting(attempt, delay)/on_reconnected(gap_ms)，会在重连前后被调用。
+    """
+
+    def __init__(self, recognition_factory, callback, sample_rate=16000, replay_ms=1000, buffer_ms=10000,
+                 backoff_initial=0.5, backoff_max=30.0, max_attempts=None):
+        self.recognition_factory = recognition_factory
+        self.callback = callback
+        self.sample_rate = sample_rate
+        self.replay_ms = replay_ms
+        self.buffer_ms = buffer_ms
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.max_attempts = max_attempts
+        self.recognition = None
+        self.generation = 0
+        # 替身识别器等会在send_audio_frame()中同步回调on_error，需要可重入锁
+        self._lock = threading.RLock()
+        self._tail = deque()
+        self._tail_ms = 0.0
+        self._active = False
+        self._failed_at = None
+        self._stop_event = threading.Event()
+        self._reconnect_thread = None
+        # 统计
+        self.failures = 0
+        self.reconnects = 0
+        self.gaps_ms = []
+        self.replayed_ms = 0.0
+        self.lost_ms = 0.0
+
+    def __getattr__(self, name):
+        # get_last_request_id()、get_first_package_delay()等指标转发给当前的识别实例；
+        # 还没有识别实例时（例如启用VAD但一直没有检测到语音）这些指标返回None
+        recognition = self.__dict__.get("recognition")
+        if recognition is None:
+            if name.startswith("get_"):
+                return lambda *args, **kwargs: None
+            raise AttributeError(name)
+        return getattr(recognition, name)
+
+    def _duration_ms(self, frame):
+        return len(frame) / 2 / self.sample_rate * 1000
+
+    def _create(self):
+        self.generation += 1
+        return self.recognition_factory(_SupervisedCallback(self, self.generation))
+
+    def start(self):
+        """启动识别；首次连接失败也进入重连流程，不向调用方抛出异常"""
+        with self._lock:
+            self._active = True
+            self._stop_event.clear()
+            self._failed_at = None
+        try:
+            recognition = self._create()
+            recognition.start()
+        except Exception as e:
+            logger.warning("识别服务连接失败: %s", e)
+            self.fail(e)
+            return
+        with self._lock:
+            self.recognition = recognition
+
+    def send_audio_frame(self, data):
+        with self._lock:
+            self._remember(data)
+            if self._failed_at is not None or self.recognition is None:
+                # 断流期间只缓存，重连成功后补发
+                return
+            try:
+                self.recognition.send_audio_frame(data)
+                return
+            except Exception as e:
+                error = e
+        self.fail(error)
+
+    def _remember(self, data):
+        self._tail.append(data)
+        self._tail_ms += self._duration_ms(data)
+        limit = self.buffer_ms if self._failed_at is not None else self.replay_ms
+        while len(self._tail) > 1 and self._tail_ms > limit:
+            dropped = self._duration_ms(self._tail.popleft())
+            self._tail_ms -= dropped
+            if self._failed_at is not None:
+                self.lost_ms += dropped
+
+    def fail(self, reason):
+        """标记当前识别实例失效，启动后台重连（已在重连中则忽略）"""
+        with self._lock:
+            if not self._active or self._failed_at is not None:
+                return
+            self._failed_at = time.monotonic()
+            self.failures += 1
+            self._reconnect_thread = threading.Thread(target=self._reconnect, name="recognition-reconnect",
+                                                      daemon=True)
+            self._reconnect_thread.start()
+        logger.warning("识别服务出错，准备重连: %s", reason)
+
+    def _reconnect(self):
+        delay = self.backoff_initial
+        attempt = 0
+        while True:
+            attempt += 1
+            if self.max_attempts is not None and attempt > self.max_attempts:
+                logger.error("识别服务重连%d次仍失败，放弃重连", self.max_attempts)
+                return
+            # 加一点随机抖动，避免大量会话同时重连
+            wait = delay * random.uniform(0.8, 1.2)
+            on_reconnecting = getattr(self.callback, "on_reconnecting", None)
+            if on_reconnecting is not None:
+                on_reconnecting(attempt, wait)
+            if self._stop_event.wait(wait):
+                return
+            try:
+                recognition = self._create()
+                recognition.start()
+            except Exception as e:
+                logger.warning("第%d次重连失败: %s", attempt, e)
+                delay = min(delay * 2, self.backoff_max)
+                continue
+            with self._lock:
+                if not self._active:
+                    break
+                gap_ms = (time.monotonic() - self._failed_at) * 1000
+                for frame in self._tail:
+                    recognition.send_audio_frame(frame)
+                self.replayed_ms += self._tail_ms
+                self.recognition = recognition
+                self._failed_at = None
+                self.reconnects += 1
+                self.gaps_ms.append(gap_ms)
+            logger.info("识别服务已重连，断流%.0fms，补发%.0fms音频", gap_ms, self._tail_ms)
+            on_reconnected = getattr(self.callback, "on_reconnected", None)
+            if on_reconnected is not None:
+                on_reconnected(gap_ms)
+            return
+        # 重连成功前已经stop()，新实例不再使用
+        recognition.stop()
+
+    def stop(self):
+        """停止识别；正在重连时取消重连，尚未补发的音频计入丢失"""
+        with self._lock:
+            self._active = False
+            self._stop_event.set()
+            recognition = self.recognition
+            failed = self._failed_at is not None
+            if failed:
+                self.lost_ms += self._tail_ms
+            self._tail.clear()
+            self._tail_ms = 0.0
+        if self._reconnect_thread is not None:
+            self._reconnect_thread.join()
+            self._reconnect_thread = None
+        with self._lock:
+            self._failed_at = None
+        if recognition is not None and not failed:
+            try:
+                recognition.stop()
+            except Exception as e:
+                logger.warning("停止识别失败: %s", e)
+
+    def get_stats(self):
+        with self._lock:
+            gaps = list(self.gaps_ms)
+            reconnecting = self._failed_at is not None
+        return {
+            "recognition_failures": self.failures,
+            "recognition_reconnects": self.reconnects,
+            "reconnecting": reconnecting,
+            "last_gap_ms": round(gaps[-1]) if gaps else 0,
+            "max_gap_ms": round(max(gaps)) if gaps else 0,
+            "total_gap_ms": round(sum(gaps)),
+            "replayed_ms": round(self.replayed_ms),
+            "lost_ms": round(self.lost_ms),
+        }
@@ -0,0 +1,70 @@
+"""frame_buffer的离线测试：验证三种溢出策略和高/低水位的暂停/恢复通知。"""
+import math
+
+from frame_analyzer import AudioFrame, analyze_frame
+from frame_buffer import COALESCE, DROP_NEWEST, DROP_OLDEST, FLOW_PAUSE, FLOW_RESUME, FrameBuffer
+
+
+def audio_frame(index, size=100):
+    data = bytes([index]) * size
+    return AudioFrame(data, analyze_frame(data))
+
+
+def drain(buffer):
+    frames = []
+    while True:
+        frame = buffer.get(timeout=0)
+        if frame is None:
+            return frames
+        frames.append(frame)
+
+
+def fill(buffer, count):
+    for i in range(count):
+        buffer.put(audio_frame(i))
+
+
+def test_drop_oldest_keeps_latest_frames():
+    buffer = FrameBuffer(capacity=4, policy=DROP_OLDEST)
+    fill(buffer, 6)
+    assert [frame.data[0] for frame in drain(buffer)] == [2, 3, 4, 5]
+    assert buffer.get_metrics()["dropped"] == 2
+
+
+def test_drop_newest_keeps_queued_frames():
+    buffer = FrameBuffer(capacity=4, policy=DROP_NEWEST)
+    fill(buffer, 6)
+    assert [frame.data[0] for frame in drain(buffer)] == [0, 1, 2, 3]
+    assert buffer.get_metrics()["dropped"] == 2
+
+
+def test_coalesce_merges_into_tail_until_size_limit():
+    buffer = FrameBuffer(capacity=4, policy=COALESCE, max_coalesce_bytes=200)
+    fill(buffer, 6)
+    frames = drain(buffer)
+    # 帧4并入队尾的帧3；再合并帧5会超过200字节，退化为丢弃最旧的帧0
+    assert [frame.data for frame in frames] == [bytes([1]) * 100, bytes([2]) * 100,
+                                                bytes([3]) * 100 + bytes([4]) * 100, bytes([5]) * 100]
+    # 合并的统计结果与重新计算的一致
+    merged, recomputed = frames[2].stats, analyze_frame(frames[2].data)
+    assert (merged.samples, merged.peak) == (recomputed.samples, recomputed.peak)
+    assert math.isclose(merged.rms, recomputed.rms, rel_tol=1e-6)
+    metrics = buffer.get_metrics()
+    assert (metrics["coalesced"], metrics["dropped"]) == (1, 1)
+
+
+def test_watermarks_pause_and_resume_once():
+    events = []
+    buffer = FrameBuffer(capacity=10, high_watermark=0.8, low_watermark=0.3,
+                         on_flow_control=lambda action, metrics: events.append((action, metrics["depth"])))
+    fill(buffer, 7)
+    assert events == []
+    fill(buffer, 2)
+    assert events == [(FLOW_PAUSE, 8)]
+    assert buffer.paused
+    for _ in range(5):
+        buffer.get(timeout=0)
+    assert events == [(FLOW_PAUSE, 8)]
+    buffer.get(timeout=0)
+    assert events == [(FLOW_PAUSE, 8), (FLOW_RESUME, 3)]
+    assert not buffer.paused
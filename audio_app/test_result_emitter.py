@@ -0,0 +1,60 @@
+"""result_emitter的离线测试：用手动触发的调度器验证中间结果的合并与最终结果的立即发送。"""
+from result_emitter import ResultCoalescer
+
+
+class ManualScheduler:
+    """记录call_later的回调，由测试决定何时执行"""
+
+    def __init__(self):
+        self.calls = []
+
+    def call_later(self, delay, callback):
+        self.calls.append(callback)
+
+    def run(self):
+        calls, self.calls = self.calls, []
+        for callback in calls:
+            callback()
+
+
+def coalescer(min_interval):
+    events = []
+    scheduler = ManualScheduler()
+    return ResultCoalescer(lambda event, data: events.append((event, data)), min_interval, scheduler), events, scheduler
+
+
+def test_partial_emitted_only_when_text_changes():
+    emitter, events, scheduler = coalescer(0)
+    for text in ["今天", "今天", "今天天气", "今天天气"]:
+        emitter.partial(text)
+    assert [data["text"] for _, data in events] == ["今天", "今天天气"]
+    assert scheduler.calls == []
+    stats = emitter.get_stats()
+    assert (stats["partials_received"], stats["partials_emitted"]) == (4, 2)
+
+
+def test_partials_within_interval_flush_latest_once():
+    emitter, events, scheduler = coalescer(60)
+    emitter.partial("今")
+    emitter.partial("今天")
+    emitter.partial("今天天")
+    assert events == [("recognition_result", {"text": "今", "final": False})]
+    assert len(scheduler.calls) == 1
+    scheduler.run()
+    assert events[1:] == [("recognition_result", {"text": "今天天", "final": False})]
+
+
+def test_final_is_sent_immediately_and_drops_pending_partial():
+    emitter, events, scheduler = coalescer(60)
+    emitter.partial("今天")
+    emitter.partial("今天天气")
+    emitter.final("今天天气很好。", {"text": "今天天气很好。"})
+    assert events == [
+        ("recognition_result", {"text": "今天", "final": False}),
+        ("recognition_result", {"text": "今天天气很好。", "final": True}),
+        ("sentence_end", {"text": "今天天气很好。"}),
+    ]
+    # 被final取代的中间结果到期后不再补发
+    scheduler.run()
+    assert len(events) == 3
+    assert emitter.get_stats()["sentences_emitted"] == 1
@@ -0,0 +1,69 @@
+"""supervisor的离线测试：用替身识别实例验证出错后重连，并补发最近replay_ms的音频。"""
+import threading
+
+from supervisor import SupervisedRecognition
+
+FRAME_BYTES = 3200  # 16kHz下100ms一帧
+
+
+class FakeRecognition:
+    def __init__(self, callback):
+        self.callback = callback
+        self.frames = []
+        self.fail_next = False
+        self.stopped = False
+
+    def start(self):
+        pass
+
+    def stop(self):
+        self.stopped = True
+
+    def send_audio_frame(self, data):
+        if self.fail_next:
+            raise ConnectionError("服务端断开")
+        self.frames.append(data)
+
+
+class Callback:
+    def __init__(self):
+        self.reconnected = threading.Event()
+
+    def on_reconnected(self, gap_ms):
+        self.reconnected.set()
+
+
+def frame(index):
+    return bytes([index]) * FRAME_BYTES
+
+
+def test_reconnect_replays_tail_within_replay_window():
+    instances = []
+    callback = Callback()
+
+    def factory(cb):
+        instances.append(FakeRecognition(cb))
+        return instances[-1]
+
+    supervised = SupervisedRecognition(factory, callback, replay_ms=300, backoff_initial=0.2)
+    supervised.start()
+    for i in range(5):
+        supervised.send_audio_frame(frame(i))
+    assert instances[0].frames == [frame(i) for i in range(5)]
+
+    instances[0].fail_next = True
+    supervised.send_audio_frame(frame(5))
+    # 断流期间的音频只缓存
+    supervised.send_audio_frame(frame(6))
+    assert callback.reconnected.wait(5)
+    assert len(instances) == 2
+    # 补发出错前300ms（帧3~5）以及断流期间的帧6
+    assert instances[1].frames == [frame(i) for i in range(3, 7)]
+    supervised.send_audio_frame(frame(7))
+    assert instances[1].frames[-1] == frame(7)
+
+    supervised.stop()
+    assert instances[1].stopped
+    stats = supervised.get_stats()
+    assert (stats["recognition_failures"], stats["recognition_reconnects"]) == (1, 1)
+    assert (stats["replayed_ms"], stats["lost_ms"]) == (400, 0)
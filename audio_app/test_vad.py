@@ -0,0 +1,42 @@
+"""vad的离线测试：用合成的静音/语音帧验证预录音（pre-roll）和拖尾（hangover）。"""
+import numpy as np
+
+from vad import VoiceActivityDetector
+
+FRAME_SAMPLES = 1600  # 16kHz下100ms一帧
+
+
+def frame(value):
+    """常数幅值的一帧；幅值小于100为静音，取不同的值便于区分各帧"""
+    return np.full(FRAME_SAMPLES, value, dtype=np.int16).tobytes()
+
+
+def test_speech_start_sends_pre_roll_first():
+    vad = VoiceActivityDetector(pre_roll_ms=300, hangover_ms=600)
+    silence = [frame(i) for i in range(1, 6)]
+    for silent_frame in silence:
+        assert vad.process(silent_frame) == ([], False, False)
+    speech = frame(3000)
+    result = vad.process(speech)
+    # 只保留最近300ms的静音作为预录音，按原顺序排在语音帧之前
+    assert result.started and not result.ended
+    assert result.frames == silence[-3:] + [speech]
+    assert vad.get_stats()["vad_sent_seconds"] == 0.4
+
+
+def test_hangover_keeps_sending_until_silence_lasts_long_enough():
+    vad = VoiceActivityDetector(pre_roll_ms=0, hangover_ms=600)
+    assert vad.process(frame(3000)).started
+    for i in range(1, 6):
+        result = vad.process(frame(i))
+        assert result.frames == [frame(i)] and not result.ended
+    # 拖尾期间再次出现语音：重新计时
+    assert vad.process(frame(3000)) == ([frame(3000)], False, False)
+    for i in range(1, 6):
+        assert not vad.process(frame(i)).ended
+    result = vad.process(frame(6))
+    assert result == ([frame(6)], False, True)
+    assert not vad.in_speech
+    # 语音段结束后的静音不再发送
+    assert vad.process(frame(7)).frames == []
+    assert vad.get_stats()["vad_segments"] == 1
@@ -0,0 +1,188 @@
+"""
+流式语音活动检测（VAD）：只在有人说话时打开识别流，静音不再上传。
+
+能量+过零率判决，噪声底噪自适应；检测到语音时先补发一段预录音（pre-roll），
+语音结束后再保持一段拖尾（hangover），避免切掉字头字尾。
+本模块只依赖numpy，audio_app和audio_input.py共用。
+"""
+import logging
+import queue
+import threading
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+logger = logging.getLogger("audio_app")
+
+# process()的返回值：需要立即发送的帧、本帧是否开始/结束一段语音
+VadResult = namedtuple("VadResult", ["frames", "started", "ended"])
+
+
+class VoiceActivityDetector:
+    """
+    输入任意长度的16kHz int16单声道PCM帧，逐帧判断是否为语音。
+
+    判决规则：RMS超过自适应阈值（max(min_energy, 噪声底噪 * energy_ratio)）即为语音；
+    能量不足阈值但超过一半、且过零率高于zcr_threshold（清辅音等）也算语音。
+    验证阶段已算出RMS时（AudioFrame.stats.rms）通过rms参数传入，不再重复计算；过零率只在需要时计算。
+    """
+
+    def __init__(self, sample_rate=16000, min_energy=200.0, energy_ratio=3.0, zcr_threshold=0.25,
+                 pre_roll_ms=300, hangover_ms=600, noise_adapt_rate=0.05):
+        self.sample_rate = sample_rate
+        self.min_energy = min_energy
+        self.energy_ratio = energy_ratio
+        self.zcr_threshold = zcr_threshold
+        self.pre_roll_ms = pre_roll_ms
+        self.hangover_ms = hangover_ms
+        self.noise_adapt_rate = noise_adapt_rate
+        self.noise_floor = min_energy / energy_ratio
+        self.in_speech = False
+        self._pre_roll = deque()
+        self._pre_roll_duration = 0.0
+        self._silence_ms = 0.0
+        # 统计
+        self.total_ms = 0.0
+        self.sent_ms = 0.0
+        self.segments = 0
+
+    def _duration_ms(self, frame):
+        return len(frame) / 2 / self.sample_rate * 1000
+
+    def is_speech(self, frame, rms=None):
+        samples = np.frombuffer(frame, dtype=np.int16, count=len(frame) // 2)
+        if samples.size == 0:
+            return False
+        if rms is None:
+            # 先转为float32再平方，避免int16溢出
+            floats = samples.astype(np.float32)
+            rms = float(np.sqrt(np.dot(floats, floats) / samples.size))
+        threshold = max(self.min_energy, self.noise_floor * self.energy_ratio)
+        speech = rms >= threshold
+        if not speech and rms >= threshold / 2:
+            zcr = np.count_nonzero(np.diff(samples < 0)) / samples.size
+            speech = zcr >= self.zcr_threshold
+        if not speech:
+            # 只用非语音帧更新噪声底噪
+            self.noise_floor += (rms - self.noise_floor) * self.noise_adapt_rate
+        return speech
+
+    def process(self, frame, rms=None):
+        """处理一帧，返回VadResult：frames为需要发送给识别服务的帧（可能包含预录音）；rms见is_speech"""
+        duration = self._duration_ms(frame)
+        self.total_ms += duration
+        speech = self.is_speech(frame, rms)
+
+        if not self.in_speech:
+            if not speech:
+                # 静音：只进入预录音缓冲
+                self._pre_roll.append(frame)
+                self._pre_roll_duration += duration
+                while self._pre_roll and self._pre_roll_duration > self.pre_roll_ms:
+                    self._pre_roll_duration -= self._duration_ms(self._pre_roll.popleft())
+                return VadResult([], False, False)
+            # 语音开始：先发送预录音
+            self.in_speech = True
+            self.segments += 1
+            self._silence_ms = 0.0
+            frames = list(self._pre_roll) + [frame]
+            self.sent_ms += self._pre_roll_duration + duration
+            self._pre_roll.clear()
+            self._pre_roll_duration = 0.0
+            return VadResult(frames, True, False)
+
+        self.sent_ms += duration
+        if speech:
+            self._silence_ms = 0.0
+            return VadResult([frame], False, False)
+        self._silence_ms += duration
+        if self._silence_ms < self.hangover_ms:
+            return VadResult([frame], False, False)
+        # 拖尾结束：语音段结束
+        self.in_speech = False
+        self._silence_ms = 0.0
+        return VadResult([frame], False, True)
+
+    def get_stats(self):
+        suppressed = 1 - self.sent_ms / self.total_ms if self.total_ms else 0.0
+        return {
+            'vad_audio_seconds': round(self.total_ms / 1000, 2),
+            'vad_sent_seconds': round(self.sent_ms / 1000, 2),
+            'vad_segments': self.segments,
+            'vad_suppressed': f"{suppressed * 100:.2f}%",
+        }
+
+
+class RecognitionGate:
+    """
+    用VAD控制识别流的开关：检测到语音时start()并发送预录音，语音段结束后stop()。
+    start()要与服务端握手，stop()会等待最终识别结果，都可能耗时较长；识别实例的调用按顺序放到
+    后台线程执行，process()只做VAD判决和入队，不阻塞音频采集。上一段的stop()没返回时，
+    下一段的start()和音频在队列中等待，不会与它并发。
+    recognition只需提供start()/stop()/send_audio_frame()。
+    on_segment_end(audio_seconds, elapsed_seconds)在每段识别stop()返回后调用，可用于记录该次请求的延迟指标。
+    """
+
+    def __init__(self, recognition, vad=None, on_segment_end=None):
+        self.recognition = recognition
+        self.vad = vad or VoiceActivityDetector()
+        self.on_segment_end = on_segment_end
+        self.opened = False
+        self._calls = queue.Queue()
+        self._thread = None
+        self._segment_ms = 0.0
+        self._segment_start = 0.0
+
+    def process(self, frame, rms=None):
+        result = self.vad.process(frame, rms)
+        if result.started:
+            self.opened = True
+            self._segment_ms = 0.0
+            self._submit(self._start)
+        for speech_frame in result.frames:
+            self._submit(self.recognition.send_audio_frame, speech_frame)
+            self._segment_ms += len(speech_frame) / 2 / self.vad.sample_rate * 1000
+        if result.ended:
+            self.opened = False
+            self._submit(self._stop, self._segment_ms / 1000)
+        return result
+
+    def _submit(self, method, *args):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="recognition-gate", daemon=True)
+            self._thread.start()
+        self._calls.put((method, args))
+
+    def _run(self):
+        while True:
+            call = self._calls.get()
+            if call is None:
+                return
+            method, args = call
+            try:
+                method(*args)
+            except Exception as e:
+                logger.warning("识别调用失败: %s", e)
+
+    def _start(self):
+        self._segment_start = time.perf_counter()
+        self.recognition.start()
+
+    def _stop(self, audio_seconds):
+        self.recognition.stop()
+        if self.on_segment_end is not None:
+            self.on_segment_end(audio_seconds, time.perf_counter() - self._segment_start)
+
+    def close(self):
+        """结束时停止仍在进行的识别，等待已提交的调用全部完成"""
+        if self.opened:
+            self.opened = False
+            self._submit(self._stop, self._segment_ms / 1000)
+        if self._thread is not None:
+            self._calls.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def get_stats(self):
+        return self.vad.get_stats()
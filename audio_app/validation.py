@@ -0,0 +1,98 @@
+"""
+两个服务（app.py的Flask线程版和app_async.py的asyncio版）共用的配置和音频验证。
+导入本模块不会创建Flask应用、SocketIO服务或会话管理器。
+"""
+import os
+import threading
+
+import dashscope
+
+from frame_analyzer import analyze_frame
+from log_config import logger
+
+# 静音检测阈值（RMS）
+SILENCE_THRESHOLD = 500
+# 启用VAD时静音帧不再在验证阶段丢弃，而是交给VAD决定何时打开识别流（保留预录音和拖尾）
+ENABLE_VAD = True
+
+
+def validate_audio_data(audio_data, drop_silence=True):
+    """
+    验证音频数据的有效性
+    drop_silence: 是否丢弃静音帧；启用VAD时由VAD处理静音
+    return: 验证通过时返回帧统计FrameStats，否则返回None
+    """
+    # 检查音频数据是否为空
+    if audio_data is None or len(audio_data) == 0:
+        logger.debug('音频数据为空')
+        return None
+
+    # 检查音频数据长度是否符合要求
+    if len(audio_data) < 320:  # 最小音频帧长度
+        logger.debug('音频数据过短，长度：%d', len(audio_data))
+        return None
+
+    # 检查音频数据格式（PCM int16），RMS和峰值只计算一次
+    try:
+        stats = analyze_frame(audio_data)
+    except Exception as e:
+        logger.warning('音频数据格式验证失败：%s', e)
+        return None
+
+    # 检查音频数据是否为静音（可选）
+    if drop_silence and stats.rms < SILENCE_THRESHOLD:
+        logger.debug('检测到静音数据')
+        return None
+
+    # 检查音频幅值范围
+    if stats.peak < 100:  # 幅值过小可能是静音
+        logger.debug('音频幅值过小，最大值：%d', stats.peak)
+    return stats
+
+
+def is_silence(audio_data, threshold=SILENCE_THRESHOLD):
+    """
+    检测是否为静音
+    threshold: 静音检测阈值，可根据实际情况调整
+    """
+    return analyze_frame(audio_data).rms < threshold
+
+
+class AudioValidator:
+    """所有会话共用一个实例，validate在各会话的解码线程中调用，计数需要加锁"""
+
+    def __init__(self, drop_silence=True):
+        self.drop_silence = drop_silence
+        self.total_packets = 0
+        self.valid_packets = 0
+        self.invalid_packets = 0
+        self._lock = threading.Lock()
+
+    def validate(self, audio_data):
+        """返回验证通过的帧统计，未通过时返回None"""
+        stats = validate_audio_data(audio_data, self.drop_silence)
+        with self._lock:
+            self.total_packets += 1
+            if stats is not None:
+                self.valid_packets += 1
+            else:
+                self.invalid_packets += 1
+        return stats
+
+    def get_stats(self):
+        with self._lock:
+            total, valid, invalid = self.total_packets, self.valid_packets, self.invalid_packets
+        valid_rate = (valid / total * 100) if total > 0 else 0
+        return {
+            'total_packets': total,
+            'valid_packets': valid,
+            'invalid_packets': invalid,
+            'valid_rate': f"{valid_rate:.2f}%"
+        }
+
+
+def init_dashscope_api_key():
+    if 'DASHSCOPE_API_KEY' in os.environ:
+        dashscope.api_key = os.environ['DASHSCOPE_API_KEY']
+    else:
+        dashscope.api_key = '<your-dashscope-api-key>'
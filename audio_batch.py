@@ -0,0 +1,368 @@
+"""
+批量文件识别：输入目录或清单文件，长音频在静音处切成带重叠的片段，
+用有界线程池并发识别（令牌桶限流），按时间戳拼回整段文本后逐文件写入JSONL。
+
+- 输出文件中已成功的文件会被跳过，中断后重新运行即可续跑
+- 结束时输出吞吐：每小时墙钟时间处理的音频小时数
+- --stand-in使用本地替身识别器，不调用识别服务，便于测试切分、拼接和并发
+
+运行方式：
+    python audio_batch.py ./recordings -o transcripts.jsonl --workers 8 --rate 10
+    python audio_batch.py manifest.txt -o transcripts.jsonl --stand-in
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from asr_metrics import AsrMetrics
+from audio_file import TranscriptionError, create_recognition, transcribe_file
+from jsonl_checkpoint import JsonlCheckpoint
+from rate_limiter import TokenBucket
+
+# 识别服务支持的文件格式（扩展名即format参数）；只有wav会被切分，其他格式整段识别
+AUDIO_FORMATS = ('wav', 'pcm', 'opus', 'speex', 'aac', 'amr')
+
+MAX_SEGMENT_SECONDS = 60.0  # 片段目标长度
+OVERLAP_SECONDS = 1.0  # 相邻片段各向外多取的重叠长度
+SEARCH_SECONDS = 5.0  # 在目标切点前多长范围内找最安静的位置
+ANALYSIS_MS = 100  # 切点搜索的分析窗长
+
+
+class Segment:
+    """一个待识别的片段：[start, end)为包含重叠的采样范围，[own_start, own_end)为归属于本片段的范围"""
+    __slots__ = ('index', 'start', 'end', 'own_start', 'own_end')
+
+    def __init__(self, index, start, end, own_start, own_end):
+        self.index = index
+        self.start = start
+        self.end = end
+        self.own_start = own_start
+        self.own_end = own_end
+
+
+def read_wav(path):
+    """读取PCM wav，返回(int16单声道采样, 采样率)；多声道取平均"""
+    with wave.open(path, 'rb') as f:
+        if f.getsampwidth() != 2:
+            raise ValueError(f'只支持16bit PCM wav: {path}')
+        channels = f.getnchannels()
+        sample_rate = f.getframerate()
+        samples = np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    return samples, sample_rate
+
+
+def write_wav(path, samples, sample_rate):
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(samples.tobytes())
+
+
+def split_at_silence(samples, sample_rate, max_segment=MAX_SEGMENT_SECONDS, overlap=OVERLAP_SECONDS,
+                     search=SEARCH_SECONDS):
+    """
+    把长音频切成不超过max_segment秒（不含重叠）的片段：在每个目标切点之前search秒内
+    找能量最低的分析窗作为切点，切点两侧各多取overlap秒，避免切在字中间时丢字。
+    """
+    window = sample_rate * ANALYSIS_MS // 1000
+    total = len(samples)
+    max_len = int(max_segment * sample_rate)
+    overlap_len = int(overlap * sample_rate)
+    search_len = int(search * sample_rate)
+
+    cuts = [0]
+    while total - cuts[-1] > max_len:
+        target = cuts[-1] + max_len
+        lo = max(cuts[-1] + window, target - search_len)
+        region = samples[lo:target].astype(np.float32)
+        frames = len(region) // window
+        if frames == 0:
+            cuts.append(target)
+            continue
+        blocks = region[:frames * window].reshape(frames, window)
+        energy = np.einsum('ij,ij->i', blocks, blocks)
+        cuts.append(lo + int(np.argmin(energy)) * window + window // 2)
+    cuts.append(total)
+
+    return [Segment(i, max(0, own_start - overlap_len), min(total, own_end + overlap_len), own_start, own_end)
+            for i, (own_start, own_end) in enumerate(zip(cuts, cuts[1:]))]
+
+
+def stitch(segment_results, sample_rate):
+    """
+    按片段顺序拼接识别结果：句子时间戳换算成整个文件的时间，
+    重叠区域内的句子只保留中点落在片段归属范围内的那一份。
+    """
+    sentences = []
+    for segment, segment_sentences in segment_results:
+        offset_ms = segment.start * 1000 // sample_rate
+        own_start_ms = segment.own_start * 1000 / sample_rate
+        own_end_ms = segment.own_end * 1000 / sample_rate
+        for sentence in segment_sentences:
+            begin = sentence.get('begin_time', 0) + offset_ms
+            end = (sentence.get('end_time') or sentence.get('begin_time', 0)) + offset_ms
+            if own_start_ms <= (begin + end) / 2 < own_end_ms:
+                sentences.append({'begin_time': begin, 'end_time': end, 'text': sentence.get('text', '')})
+    return sentences
+
+
+class StandInResult:
+    """与RecognitionResult接口一致的替身结果"""
+
+    def __init__(self, sentences):
+        self.status_code = 200
+        self.message = ''
+        self.sentences = sentences
+
+    def get_sentence(self):
+        return self.sentences
+
+    def get_request_id(self):
+        return 'stand-in'
+
+
+class StandInFileRecognition:
+    """
+    本地替身识别器：按能量找出语音段，每段作为一句，文本为该段在片段内的起始毫秒数；
+    按音频时长的latency_ratio倍模拟识别耗时。
+    """
+
+    model = 'stand-in'
+
+    def __init__(self, audio_format='wav', sample_rate=16000, latency_ratio=0.01, min_energy=500.0):
+        self.sample_rate = sample_rate
+        self.latency_ratio = latency_ratio
+        self.min_energy = min_energy
+        self._latency_ms = -1
+
+    def call(self, path):
+        samples, sample_rate = read_wav(path)
+        window = sample_rate * ANALYSIS_MS // 1000
+        frames = len(samples) // window
+        blocks = samples[:frames * window].reshape(frames, window).astype(np.float32)
+        voiced = np.sqrt((blocks * blocks).mean(axis=1)) >= self.min_energy
+        sentences = []
+        begin = None
+        for i, is_voiced in enumerate(list(voiced) + [False]):
+            if is_voiced and begin is None:
+                begin = i
+            elif not is_voiced and begin is not None:
+                sentences.append({'begin_time': begin * ANALYSIS_MS, 'end_time': i * ANALYSIS_MS,
+                                  'text': f'speech@{begin * ANALYSIS_MS}'})
+                begin = None
+        latency = len(samples) / sample_rate * self.latency_ratio
+        time.sleep(latency)
+        self._latency_ms = latency * 1000
+        return StandInResult(sentences)
+
+    def get_last_request_id(self):
+        return 'stand-in'
+
+    def get_first_package_delay(self):
+        return self._latency_ms
+
+    def get_last_package_delay(self):
+        return self._latency_ms
+
+
+def list_audio_files(source):
+    """目录：递归查找支持的音频文件；清单文件：每行一个路径，或JSONL中的path字段（相对路径相对清单所在目录）"""
+    if os.path.isdir(source):
+        files = []
+        for root, _, names in os.walk(source):
+            files.extend(os.path.join(root, name) for name in names
+                         if os.path.splitext(name)[1].lower().lstrip('.') in AUDIO_FORMATS)
+        return sorted(os.path.abspath(path) for path in files)
+
+    base = os.path.dirname(os.path.abspath(source))
+    files = []
+    with open(source, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            path = json.loads(line)['path'] if line.startswith('{') else line
+            files.append(os.path.abspath(os.path.join(base, path)))
+    return files
+
+
+def load_completed(output_path):
+    """读取已有输出中识别成功的文件，用于续跑"""
+    return JsonlCheckpoint(output_path, 'file').load_completed()
+
+
+class BatchTranscriber:
+    """
+    批量识别引擎：所有文件的片段共用一个有界线程池，每个请求先从令牌桶取令牌；
+    同时驻留内存的文件数不超过max_pending_files，文件的最后一个片段完成时拼接并写出。
+    recognition_factory(audio_format, sample_rate)与audio_file.create_recognition一致，可替换为替身；
+    每个片段请求的延迟指标记录到metrics（AsrMetrics）。
+    """
+
+    def __init__(self, recognition_factory=create_recognition, workers=4, rate=5.0, max_segment=MAX_SEGMENT_SECONDS,
+                 overlap=OVERLAP_SECONDS, retries=2, max_pending_files=None, metrics=None):
+        self.recognition_factory = recognition_factory
+        self.metrics = metrics if metrics is not None else AsrMetrics()
+        self.workers = workers
+        self.limiter = TokenBucket(rate, capacity=max(1, workers))
+        self.max_segment = max_segment
+        self.overlap = overlap
+        self.retries = retries
+        self._pending_files = threading.BoundedSemaphore(max_pending_files or workers * 2)
+        self._stats_lock = threading.Lock()
+        self.stats = {'files_ok': 0, 'files_failed': 0, 'files_skipped': 0, 'segments': 0,
+                      'audio_seconds': 0.0, 'retries': 0}
+
+    def _recognize(self, path, audio_format, sample_rate):
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            try:
+                sentences, _ = transcribe_file(path, audio_format, sample_rate, self.recognition_factory,
+                                               metrics=self.metrics)
+                return sentences
+            except (TranscriptionError, OSError) as e:
+                if attempt == self.retries:
+                    raise
+                with self._stats_lock:
+                    self.stats['retries'] += 1
+                time.sleep(2 ** attempt)
+
+    def _transcribe_segment(self, samples, sample_rate, segment):
+        fd, path = tempfile.mkstemp(suffix='.wav')
+        os.close(fd)
+        try:
+            write_wav(path, samples[segment.start:segment.end], sample_rate)
+            return self._recognize(path, 'wav', sample_rate)
+        finally:
+            os.remove(path)
+
+    def run(self, files, output_path, resume=True):
+        """识别files并追加写入output_path，返回统计信息"""
+        output = JsonlCheckpoint(output_path, 'file')
+        completed = output.load_completed() if resume else set()
+        started = time.perf_counter()
+        # 线程池先于输出文件退出，等所有片段完成、结果写完后再关闭文件
+        with output as out, ThreadPoolExecutor(self.workers) as pool:
+            for path in files:
+                if path in completed:
+                    self.stats['files_skipped'] += 1
+                    continue
+                self._pending_files.acquire()
+                try:
+                    self._submit_file(pool, out, path)
+                except Exception as e:
+                    out.write({'file': path, 'status': 'error', 'error': str(e)})
+                    self._pending_files.release()
+        self.stats['wall_seconds'] = time.perf_counter() - started
+        return self.get_stats()
+
+    def _submit_file(self, pool, out, path):
+        audio_format = os.path.splitext(path)[1].lower().lstrip('.')
+        file_started = time.perf_counter()
+        if audio_format != 'wav':
+            # 非wav格式无法在本地切分，整段交给识别服务
+            future = pool.submit(self._recognize, path, audio_format, 16000)
+            segments = [Segment(0, 0, 0, 0, 0)]
+            futures = [future]
+            sample_rate, duration = 16000, None
+        else:
+            samples, sample_rate = read_wav(path)
+            duration = len(samples) / sample_rate
+            segments = split_at_silence(samples, sample_rate, self.max_segment, self.overlap)
+            futures = [pool.submit(self._transcribe_segment, samples, sample_rate, segment) for segment in segments]
+
+        remaining = [len(futures)]
+        lock = threading.Lock()
+
+        def on_done(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            try:
+                self._finish_file(out, path, segments, futures, sample_rate, duration, file_started)
+            finally:
+                self._pending_files.release()
+
+        for future in futures:
+            future.add_done_callback(on_done)
+
+    def _finish_file(self, out, path, segments, futures, sample_rate, duration, file_started):
+        errors = [future.exception() for future in futures if future.exception() is not None]
+        if errors:
+            out.write({'file': path, 'status': 'error', 'error': str(errors[0])})
+            with self._stats_lock:
+                self.stats['files_failed'] += 1
+            return
+        if duration is None:
+            # 整段识别的文件：句子时间戳本身就是整个文件的时间，以最后一句的结束时间作为时长
+            sentences = stitch([(Segment(0, 0, 0, 0, float('inf')), futures[0].result())], sample_rate)
+            duration = sentences[-1]['end_time'] / 1000 if sentences else 0.0
+        else:
+            sentences = stitch([(segment, future.result()) for segment, future in zip(segments, futures)], sample_rate)
+        out.write({
+            'file': path,
+            'status': 'ok',
+            'duration': round(duration, 3),
+            'segments': len(segments),
+            'elapsed': round(time.perf_counter() - file_started, 3),
+            'text': ''.join(sentence['text'] for sentence in sentences),
+            'sentences': sentences,
+        })
+        with self._stats_lock:
+            self.stats['files_ok'] += 1
+            self.stats['segments'] += len(segments)
+            self.stats['audio_seconds'] += duration
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        wall = stats.get('wall_seconds') or 0.0
+        stats['audio_hours_per_wall_hour'] = round(stats['audio_seconds'] / wall, 2) if wall else 0.0
+        stats['rate_limiter'] = self.limiter.get_stats()
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量音频文件识别')
+    parser.add_argument('source', help='音频目录，或每行一个路径的清单文件')
+    parser.add_argument('-o', '--output', default='transcripts.jsonl')
+    parser.add_argument('--workers', type=int, default=4, help='并发识别的片段数')
+    parser.add_argument('--rate', type=float, default=5.0, help='每秒最多发起的识别请求数')
+    parser.add_argument('--max-segment', type=float, default=MAX_SEGMENT_SECONDS, help='片段最大长度（秒）')
+    parser.add_argument('--overlap', type=float, default=OVERLAP_SECONDS, help='片段两侧的重叠长度（秒）')
+    parser.add_argument('--no-resume', action='store_true', help='不跳过输出中已完成的文件')
+    parser.add_argument('--stand-in', action='store_true', help='使用本地替身识别器')
+    parser.add_argument('--metrics-jsonl', help='逐个片段请求的延迟指标追加写入的JSONL文件')
+    parser.add_argument('--metrics-prom', help='结束时写出Prometheus文本格式的延迟指标')
+    args = parser.parse_args()
+
+    # API Key从环境变量DASHSCOPE_API_KEY读取
+    factory = StandInFileRecognition if args.stand_in else create_recognition
+
+    files = list_audio_files(args.source)
+    metrics = AsrMetrics(jsonl_path=args.metrics_jsonl)
+    transcriber = BatchTranscriber(factory, workers=args.workers, rate=args.rate, max_segment=args.max_segment,
+                                   overlap=args.overlap, metrics=metrics)
+    stats = transcriber.run(files, args.output, resume=not args.no_resume)
+    print(f"文件 {len(files)} 个：成功 {stats['files_ok']}，失败 {stats['files_failed']}，"
+          f"跳过 {stats['files_skipped']}；片段 {stats['segments']} 个，重试 {stats['retries']} 次")
+    print(f"音频 {stats['audio_seconds'] / 3600:.2f} 小时，用时 {stats['wall_seconds']:.1f}s，"
+          f"吞吐 {stats['audio_hours_per_wall_hour']} 音频小时/小时")
+    for labels, values in metrics.summary().items():
+        print(f'[Metric] {labels}: {values}')
+    if args.metrics_prom:
+        metrics.write_prometheus(args.metrics_prom)
+
+
+if __name__ == '__main__':
+    main()
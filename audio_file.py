@@ -1,27 +1,68 @@
+import time
+import wave
 from http import HTTPStatus
 from dashscope.audio.asr import Recognition
 
+from asr_metrics import asr_metrics
+
 # 若没有将API Key配置到环境变量中，需将下面这行代码注释放开，并将apiKey替换为自己的API Key
 # import dashscope
 # dashscope.api_key = "apiKey"
 
-recognition = Recognition(model='paraformer-realtime-v2',
-                          format='wav',
-                          sample_rate=16000,
-                          # “language_hints”只支持paraformer-realtime-v2模型
-                          language_hints=['zh', 'en'],
-                          callback=None)
-result = recognition.call('asr_example.wav')
-if result.status_code == HTTPStatus.OK:
-    print('识别结果：')
-    print(result.get_sentence())
-else:
-    print('Error: ', result.message)
-
-print(
-    '[Metric] requestId: {}, first package delay ms: {}, last package delay ms: {}'
-    .format(
-        recognition.get_last_request_id(),
-        recognition.get_first_package_delay(),
-        recognition.get_last_package_delay(),
-    ))
\ No newline at end of file
+
+class TranscriptionError(RuntimeError):
+    """识别服务返回了非200的结果"""
+
+    def __init__(self, message, request_id=None):
+        super().__init__(message)
+        self.request_id = request_id
+
+
+def create_recognition(audio_format='wav', sample_rate=16000):
+    """默认的识别实例工厂；Recognition.call()不能并发调用，每个文件（片段）新建一个实例"""
+    return Recognition(model='paraformer-realtime-v2',
+                       format=audio_format,
+                       sample_rate=sample_rate,
+                       # “language_hints”只支持paraformer-realtime-v2模型
+                       language_hints=['zh', 'en'],
+                       callback=None)
+
+
+def wav_duration(path):
+    """wav文件的时长（秒），其他格式返回None"""
+    try:
+        with wave.open(path, 'rb') as f:
+            return f.getnframes() / f.getframerate()
+    except (wave.Error, EOFError):
+        return None
+
+
+def transcribe_file(path, audio_format='wav', sample_rate=16000, recognition_factory=create_recognition,
+                    metrics=None):
+    """
+    同步识别一个音频文件
+    metrics: AsrMetrics，不为空时记录本次请求的首包/尾包延迟、音频时长和RTF
+    return: (句子列表, 识别实例)；句子包含begin_time/end_time（毫秒）和text，识别实例用于读取延迟指标
+    """
+    recognition = recognition_factory(audio_format, sample_rate)
+    start = time.perf_counter()
+    result = recognition.call(path)
+    processing_seconds = time.perf_counter() - start
+    if result.status_code != HTTPStatus.OK:
+        raise TranscriptionError(result.message, result.get_request_id())
+    if metrics is not None:
+        audio_seconds = wav_duration(path) if audio_format == 'wav' else None
+        metrics.record_recognition(recognition, audio_seconds, processing_seconds)
+    return result.get_sentence() or [], recognition
+
+
+if __name__ == '__main__':
+    try:
+        sentences, recognition = transcribe_file('asr_example.wav', metrics=asr_metrics)
+        print('识别结果：')
+        print(sentences)
+    except TranscriptionError as e:
+        print('Error: ', e)
+    else:
+        # 设置环境变量ASR_METRICS_JSONL可把每次的指标追加到文件中，跨版本、跨地域对比延迟
+        print('[Metric] {}'.format(asr_metrics.summary()))
@@ -1,20 +1,35 @@
 import os
 import signal  # for keyboard events handling (press "Ctrl+C" to terminate recording)
 import sys
+import time
 
 import dashscope
 import pyaudio
 from dashscope.audio.asr import *
 
+from asr_metrics import asr_metrics
+from audio_app.ring_buffer import AudioRingBuffer
+from audio_app.supervisor import SupervisedRecognition
+from audio_app.vad import RecognitionGate, VoiceActivityDetector
+
 mic = None
 stream = None
+gate = None
+ring = None
+started_at = None
+input_overflows = 0
 
 # Set recording parameters
 sample_rate = 16000  # sampling rate (Hz)
 channels = 1  # mono channel
 dtype = 'int16'  # data type
 format_pcm = 'pcm'  # the format of the audio data
-block_size = 3200  # number of frames per buffer
+block_size = 3200  # number of frames per buffer, also the frame size sent to recognition (3200 frames = 200ms)
+enable_vad = True  # only open the recognition stream while someone is speaking
+# 'callback': PortAudio calls back into a preallocated ring buffer and the main loop waits on it;
+# 'blocking': the main loop polls stream.read()
+capture_mode = 'callback'
+ring_buffer_frames = 16  # ring capacity in blocks (16 x 200ms = 3.2s); the oldest audio is dropped when full
 
 
 def init_dashscope_api_key():
@@ -31,39 +46,29 @@ def init_dashscope_api_key():
 
 
 # Real-time speech recognition callback
+# The microphone is opened once in main rather than in on_open, because with VAD enabled
+# the recognition stream is started and stopped for every speech segment.
 class Callback(RecognitionCallback):
     def on_open(self) -> None:
-        global mic
-        global stream
         print('RecognitionCallback open.')
-        mic = pyaudio.PyAudio()
-        stream = mic.open(format=pyaudio.paInt16,
-                          channels=1,
-                          rate=16000,
-                          input=True)
 
     def on_close(self) -> None:
-        global mic
-        global stream
         print('RecognitionCallback close.')
-        stream.stop_stream()
-        stream.close()
-        mic.terminate()
-        stream = None
-        mic = None
 
     def on_complete(self) -> None:
         print('RecognitionCallback completed.')  # recognition completed
 
     def on_error(self, message) -> None:
+        # The supervised recognition reconnects and replays the buffered audio,
+        # so a transient service error no longer terminates the program
         print('RecognitionCallback task_id: ', message.request_id)
         print('RecognitionCallback error: ', message.message)
-        # Stop and close the audio stream if it is running
-        if 'stream' in globals() and stream.active:
-            stream.stop()
-            stream.close()
-        # Forcefully exit the program
-        sys.exit(1)
+
+    def on_reconnecting(self, attempt, delay) -> None:
+        print('RecognitionCallback reconnecting in %.1fs (attempt %d)' % (delay, attempt))
+
+    def on_reconnected(self, gap_ms) -> None:
+        print('RecognitionCallback reconnected after %.0f ms' % gap_ms)
 
     def on_event(self, result: RecognitionResult) -> None:
         sentence = result.get_sentence()
@@ -76,18 +81,88 @@ class Callback(RecognitionCallback):
                 print(result.get_sentence())
 
 
+def audio_callback(in_data, frame_count, time_info, status):
+    # Runs on the PortAudio thread: only copy into the preallocated ring and count driver overruns
+    global input_overflows
+    if status & pyaudio.paInputOverflow:
+        input_overflows += 1
+    ring.write(in_data)
+    return None, pyaudio.paContinue
+
+
+def open_microphone():
+    global mic
+    global stream
+    global ring
+    mic = pyaudio.PyAudio()
+    if capture_mode == 'callback':
+        ring = AudioRingBuffer(frame_bytes=block_size * 2 * channels, capacity_frames=ring_buffer_frames)
+        stream = mic.open(format=pyaudio.paInt16,
+                          channels=channels,
+                          rate=sample_rate,
+                          input=True,
+                          frames_per_buffer=block_size,
+                          stream_callback=audio_callback)
+    else:
+        stream = mic.open(format=pyaudio.paInt16,
+                          channels=channels,
+                          rate=sample_rate,
+                          input=True,
+                          frames_per_buffer=block_size)
+
+
+def read_audio_frame():
+    """Return the next block of audio, or None when capture has stopped"""
+    if ring is None:
+        return stream.read(block_size, exception_on_overflow=False) if stream else None
+    while True:
+        # The ring copies the frame out under its lock, so the audio callback can reuse the slot right away
+        # while send_audio_frame, the VAD pre-roll and the reconnect replay keep the returned bytes
+        frame = ring.read(timeout=1.0)
+        if frame is not None:
+            return frame
+        if ring.closed:
+            return None
+
+
+def record_metrics(audio_seconds, elapsed_seconds):
+    # One record per recognition request (one per speech segment with VAD);
+    # set ASR_METRICS_JSONL to keep them for comparing models and regions over time
+    record = asr_metrics.record_recognition(recognition, audio_seconds, elapsed_seconds)
+    print('[Metric] requestId: {}, first package delay ms: {}, last package delay ms: {}, rtf: {}'.format(
+        record['request_id'], record['first_package_delay_ms'], record['last_package_delay_ms'], record['rtf']))
+
+
+def close_microphone():
+    global mic
+    global stream
+    if ring is not None:
+        ring.close()
+    if stream is not None:
+        stream.stop_stream()
+        stream.close()
+        stream = None
+    if mic is not None:
+        mic.terminate()
+        mic = None
+
+
 def signal_handler(sig, frame):
     print('Ctrl+C pressed, stop recognition ...')
     # Stop recognition
-    recognition.stop()
+    if gate is not None:
+        gate.close()
+        print('[Metric] VAD: {}'.format(gate.get_stats()))
+    else:
+        recognition.stop()
+        elapsed = time.perf_counter() - started_at
+        record_metrics(elapsed, elapsed)
+    close_microphone()
     print('Recognition stopped.')
-    print(
-        '[Metric] requestId: {}, first package delay ms: {}, last package delay ms: {}'
-        .format(
-            recognition.get_last_request_id(),
-            recognition.get_first_package_delay(),
-            recognition.get_last_package_delay(),
-        ))
+    if ring is not None:
+        print('[Metric] capture: {}, input overflows: {}'.format(ring.get_stats(), input_overflows))
+    print('[Metric] reconnect: {}'.format(recognition.get_stats()))
+    print('[Metric] latency: {}'.format(asr_metrics.summary()))
     # Forcefully exit the program
     sys.exit(0)
 
@@ -102,27 +177,44 @@ if __name__ == '__main__':
 
     # Call recognition service by async mode, you can customize the recognition parameters, like model, format,
     # sample_rate
-    recognition = Recognition(
-        model='paraformer-realtime-v2',
-        format=format_pcm,
-        # 'pcm'、'wav'、'opus'、'speex'、'aac'、'amr', you can check the supported formats in the document
-        sample_rate=sample_rate,
-        # support 8000, 16000
-        semantic_punctuation_enabled=False,
-        callback=callback)
-
-    # Start recognition
-    recognition.start()
+    def create_recognition(recognition_callback):
+        return Recognition(
+            model='paraformer-realtime-v2',
+            format=format_pcm,
+            # 'pcm'、'wav'、'opus'、'speex'、'aac'、'amr', you can check the supported formats in the document
+            sample_rate=sample_rate,
+            # support 8000, 16000
+            semantic_punctuation_enabled=False,
+            callback=recognition_callback)
+
+    # A new Recognition is created on every reconnect; the last second of audio is replayed after it
+    recognition = SupervisedRecognition(create_recognition, callback, sample_rate=sample_rate)
+
+    open_microphone()
+
+    if enable_vad:
+        # Recognition is started on speech onset (with pre-roll) and stopped after the hangover
+        gate = RecognitionGate(recognition, VoiceActivityDetector(sample_rate=sample_rate),
+                               on_segment_end=record_metrics)
+    else:
+        # Start recognition
+        started_at = time.perf_counter()
+        recognition.start()
 
     signal.signal(signal.SIGINT, signal_handler)
     print("Press 'Ctrl+C' to stop recording and recognition...")
     # Create a keyboard listener until "Ctrl+C" is pressed
 
     while True:
-        if stream:
-            data = stream.read(3200, exception_on_overflow=False)
-            recognition.send_audio_frame(data)
-        else:
+        data = read_audio_frame()
+        if data is None:
             break
+        if gate is not None:
+            gate.process(data)
+        else:
+            recognition.send_audio_frame(data)
 
-    recognition.stop()
+    if gate is not None:
+        gate.close()
+    else:
+        recognition.stop()
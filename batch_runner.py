@@ -0,0 +1,317 @@
+"""
+批量调用大模型或智能体：逐行读取JSONL请求，有界并发执行，结果逐行追加写入JSONL。
+
+每行请求：
+    {"id": "q1", "prompt": "完整输出静夜思"}
+    {"id": "q2", "messages": [{"role": "user", "content": "..."}], "provider": "deepseek"}
+没有id时以行号为id；没有provider时使用--provider指定的默认值。
+
+- 输入边读边提交，同时在途的请求不超过max_pending，输出写完一行就flush，不在内存中积累结果
+- 每个provider一个令牌桶（rate_limiter.TokenBucket）限制请求速率
+- 输出文件即检查点：重新运行时跳过输出中已成功的id，中断后从停下的地方继续
+- 统计请求数、token数、吞吐（请求/秒、token/秒）和按provider累计的费用
+
+用法：
+    python batch_runner.py prompts.jsonl -o results.jsonl --provider tongyi --workers 8 --rate tongyi=5
+    python batch_runner.py prompts.jsonl -o results.jsonl --provider mock     # 本地模拟，不访问网络
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from jsonl_checkpoint import JsonlCheckpoint
+from rate_limiter import TokenBucket
+
+DEFAULT_RATE = 5.0
+# 每千token价格（元），(输入, 输出)；以各平台官网为准，可用--price覆盖
+PRICES = {
+    "tongyi": (0.0008, 0.002),
+    "deepseek": (0.002, 0.008),
+    "router": (0.0008, 0.002),
+    "agent": (0.0008, 0.002),
+    "mock": (0.0, 0.0),
+}
+
+
+class RequestError(ValueError):
+    """请求本身有问题（格式错误、未知provider），重试也不会成功"""
+
+
+def _messages(request):
+    if "messages" in request:
+        return request["messages"]
+    if "prompt" in request:
+        return [{"role": "user", "content": request["prompt"]}]
+    raise RequestError("请求需要prompt或messages")
+
+
+def _usage(messages):
+    """
+    累计AI消息的token数：优先usage_metadata；ChatTongyi不设置它，用量在response_metadata["token_usage"]中
+    （dashscope为input_tokens/output_tokens，OpenAI协议为prompt_tokens/completion_tokens）
+    """
+    input_tokens = output_tokens = 0
+    for message in messages:
+        usage = getattr(message, "usage_metadata", None)
+        if usage:
+            input_tokens += usage.get("input_tokens", 0)
+            output_tokens += usage.get("output_tokens", 0)
+            continue
+        usage = (getattr(message, "response_metadata", None) or {}).get("token_usage")
+        if usage:
+            input_tokens += usage.get("input_tokens", usage.get("prompt_tokens", 0)) or 0
+            output_tokens += usage.get("output_tokens", usage.get("completion_tokens", 0)) or 0
+    return input_tokens, output_tokens
+
+
+class ChatModelProvider:
+    """LangChain聊天模型"""
+
+    def __init__(self, model, model_name):
+        self.model = model
+        self.model_name = model_name
+
+    def invoke(self, request):
+        message = self.model.invoke(_messages(request))
+        input_tokens, output_tokens = _usage([message])
+        return {"model": self.model_name, "text": message.content,
+                "input_tokens": input_tokens, "output_tokens": output_tokens}
+
+
+class AgentProvider:
+    """
+    深度调研智能体，返回最后一条消息。token数只统计主智能体消息中的模型回复，
+    子智能体内部的模型调用不在state["messages"]中，不计入
+    """
+
+    def __init__(self, agent, model_name="agent"):
+        self.agent = agent
+        self.model_name = model_name
+
+    def invoke(self, request):
+        state = self.agent.invoke({"messages": _messages(request)})
+        input_tokens, output_tokens = _usage(state["messages"])
+        return {"model": self.model_name, "text": state["messages"][-1].content,
+                "input_tokens": input_tokens, "output_tokens": output_tokens}
+
+
+class MockProvider:
+    """本地模拟：延迟服从对数正态分布，按error_rate随机失败，token数按字符数估算"""
+
+    def __init__(self, latency=0.05, error_rate=0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+
+    def invoke(self, request):
+        text = "\n".join(m["content"] for m in _messages(request))
+        time.sleep(random.lognormvariate(0, 0.3) * self.latency)
+        if random.random() < self.error_rate:
+            raise ConnectionError("模拟的服务错误")
+        answer = f"回答：{text[:50]}"
+        return {"model": "mock", "text": answer, "input_tokens": len(text), "output_tokens": len(answer)}
+
+
+def _tongyi():
+    from chat_pool import get_chat_model
+    return ChatModelProvider(get_chat_model("qwen-plus"), "qwen-plus")
+
+
+def _deepseek():
+    from langchain.chat_models import init_chat_model
+    model = init_chat_model(model="deepseek-chat", model_provider="deepseek",
+                            api_key=os.environ["DEEPSEEK_API_KEY"], base_url="https://api.deepseek.com")
+    return ChatModelProvider(model, "deepseek-chat")
+
+
+def _router():
+    from model_router import build_default_router
+    return ChatModelProvider(build_default_router(), "router")
+
+
+def _agent():
+    from agent import get_agent
+    return AgentProvider(get_agent())
+
+
+def _mock():
+    return MockProvider(error_rate=float(os.environ.get("BATCH_MOCK_ERROR_RATE", 0)))
+
+
+# provider名称 -> 创建函数，第一次用到时才创建
+PROVIDERS = {
+    "tongyi": _tongyi,
+    "deepseek": _deepseek,
+    "router": _router,
+    "agent": _agent,
+    "mock": _mock,
+}
+
+
+def read_requests(input_path):
+    """逐行产出(id, 请求)，不一次性读入；不是合法JSON对象的行产出(id, RequestError)"""
+    with open(input_path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield f"line-{number}", RequestError(f"第{number}行不是合法的JSON: {e}")
+                continue
+            if not isinstance(request, dict):
+                yield f"line-{number}", RequestError(f"第{number}行不是JSON对象")
+                continue
+            yield str(request.get("id", f"line-{number}")), request
+
+
+def load_completed(output_path):
+    """读取已有输出中成功的请求id，用于续跑"""
+    return JsonlCheckpoint(output_path, "id").load_completed()
+
+
+class BatchRunner:
+    """
+    所有请求共用一个有界线程池，每个请求先从所属provider的令牌桶取令牌；
+    rates为{provider: 每秒请求数}，prices为{provider: (输入, 输出)每千token价格}。
+    """
+
+    def __init__(self, default_provider="tongyi", workers=4, rates=None, prices=None, retries=2,
+                 max_pending=None, providers=None):
+        self.default_provider = default_provider
+        self.workers = workers
+        self.rates = rates or {}
+        self.prices = dict(PRICES, **(prices or {}))
+        self.retries = retries
+        self.provider_factories = providers or PROVIDERS
+        self._providers = {}
+        self._limiters = {}
+        self._providers_lock = threading.Lock()
+        self._pending = threading.BoundedSemaphore(max_pending or workers * 2)
+        self._stats_lock = threading.Lock()
+        self.stats = {"requests_ok": 0, "requests_failed": 0, "requests_skipped": 0, "retries": 0,
+                      "input_tokens": 0, "output_tokens": 0, "cost": {}}
+
+    def _provider(self, name):
+        with self._providers_lock:
+            if name not in self._providers:
+                if name not in self.provider_factories:
+                    raise RequestError(f"未知的provider: {name}")
+                self._providers[name] = self.provider_factories[name]()
+                rate = self.rates.get(name, DEFAULT_RATE)
+                self._limiters[name] = TokenBucket(rate, capacity=max(1, min(self.workers, rate)))
+            return self._providers[name], self._limiters[name]
+
+    def _invoke(self, request_id, request):
+        name = request.get("provider", self.default_provider)
+        provider, limiter = self._provider(name)
+        started = time.perf_counter()
+        for attempt in range(self.retries + 1):
+            limiter.acquire()
+            try:
+                result = provider.invoke(request)
+                break
+            except RequestError:
+                raise
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                with self._stats_lock:
+                    self.stats["retries"] += 1
+                time.sleep(2 ** attempt)
+        price_in, price_out = self.prices.get(name, (0.0, 0.0))
+        cost = (result["input_tokens"] * price_in + result["output_tokens"] * price_out) / 1000
+        return dict(result, id=request_id, status="ok", provider=name, cost=round(cost, 6),
+                    latency=round(time.perf_counter() - started, 3), attempts=attempt + 1)
+
+    def run(self, requests, output_path, resume=True):
+        """执行requests（(id, 请求)的可迭代对象）并追加写入output_path，返回统计信息"""
+        output = JsonlCheckpoint(output_path, "id")
+        completed = output.load_completed() if resume else set()
+        started = time.perf_counter()
+        # 线程池先于输出文件退出，等所有请求完成、结果写完后再关闭文件
+        with output as out, ThreadPoolExecutor(self.workers) as pool:
+            for request_id, request in requests:
+                if request_id in completed:
+                    self.stats["requests_skipped"] += 1
+                    continue
+                if isinstance(request, Exception):
+                    self._failed(out, request_id, request)
+                    continue
+                self._pending.acquire()
+                future = pool.submit(self._invoke, request_id, request)
+                future.add_done_callback(lambda f, request_id=request_id: self._finish(out, request_id, f))
+        self.stats["wall_seconds"] = time.perf_counter() - started
+        return self.get_stats()
+
+    def _finish(self, out, request_id, future):
+        try:
+            error = future.exception()
+            if error is not None:
+                self._failed(out, request_id, error)
+                return
+            record = future.result()
+            out.write(record)
+            with self._stats_lock:
+                self.stats["requests_ok"] += 1
+                self.stats["input_tokens"] += record["input_tokens"]
+                self.stats["output_tokens"] += record["output_tokens"]
+                cost = self.stats["cost"]
+                cost[record["provider"]] = cost.get(record["provider"], 0.0) + record["cost"]
+        finally:
+            self._pending.release()
+
+    def _failed(self, out, request_id, error):
+        out.write({"id": request_id, "status": "error", "error": f"{type(error).__name__}: {error}"})
+        with self._stats_lock:
+            self.stats["requests_failed"] += 1
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self.stats, cost={k: round(v, 6) for k, v in self.stats["cost"].items()})
+        wall = stats.get("wall_seconds") or 0.0
+        stats["requests_per_s"] = round(stats["requests_ok"] / wall, 2) if wall else 0.0
+        stats["output_tokens_per_s"] = round(stats["output_tokens"] / wall, 1) if wall else 0.0
+        stats["rate_limiters"] = {name: limiter.get_stats() for name, limiter in self._limiters.items()}
+        return stats
+
+
+def _pairs(values, convert):
+    result = {}
+    for value in values or []:
+        name, _, setting = value.partition("=")
+        result[name] = convert(setting)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量调用大模型或智能体")
+    parser.add_argument("input", help="每行一个请求的JSONL文件")
+    parser.add_argument("-o", "--output", default="results.jsonl")
+    parser.add_argument("--provider", default="tongyi", choices=sorted(PROVIDERS),
+                        help="请求中没有指定provider时使用")
+    parser.add_argument("--workers", type=int, default=4, help="并发请求数")
+    parser.add_argument("--rate", action="append", metavar="PROVIDER=QPS",
+                        help=f"某个provider每秒最多发起的请求数，可重复，默认{DEFAULT_RATE}")
+    parser.add_argument("--price", action="append", metavar="PROVIDER=IN,OUT", help="每千token价格（元）")
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--no-resume", action="store_true", help="不跳过输出中已成功的请求")
+    args = parser.parse_args()
+
+    runner = BatchRunner(args.provider, workers=args.workers, rates=_pairs(args.rate, float),
+                         prices=_pairs(args.price, lambda s: tuple(float(v) for v in s.split(","))),
+                         retries=args.retries)
+    stats = runner.run(read_requests(args.input), args.output, resume=not args.no_resume)
+    print(f"请求：成功 {stats['requests_ok']}，失败 {stats['requests_failed']}，跳过 {stats['requests_skipped']}，"
+          f"重试 {stats['retries']} 次")
+    print(f"用时 {stats['wall_seconds']:.1f}s，{stats['requests_per_s']} 请求/秒，"
+          f"{stats['output_tokens_per_s']} 输出token/秒（输入 {stats['input_tokens']}，输出 {stats['output_tokens']}）")
+    print(f"费用（元）：{stats['cost']}")
+
+
+if __name__ == "__main__":
+    main()
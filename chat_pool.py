@@ -0,0 +1,44 @@
+"""
+共享的聊天模型实例：按(模型类, 模型名, 参数)延迟创建一次，之后所有调用复用。
+
+ChatTongyi每次构造都要做参数校验、读取环境变量和导入dashscope，工具每被调用一次就新建一个
+会把这部分开销加到每次调用上；模型实例本身无状态，可以在线程间共享。
+dashscope的HTTP请求使用进程内共享的requests.Session，复用同一个实例即可复用连接。
+"""
+import threading
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def get_chat_model(model="qwen-plus", model_cls=None, **kwargs):
+    """
+    获取共享的聊天模型，线程安全。
+    model_cls默认为ChatTongyi；kwargs透传给构造函数，参数不同的调用各自缓存一个实例。
+    """
+    if model_cls is None:
+        from langchain_community.chat_models import ChatTongyi
+        model_cls = ChatTongyi
+    key = (model_cls, model, _freeze(kwargs))
+    chat_model = _models.get(key)
+    if chat_model is None:
+        with _models_lock:
+            chat_model = _models.get(key)
+            if chat_model is None:
+                chat_model = model_cls(model=model, **kwargs)
+                _models[key] = chat_model
+    return chat_model
+
+
+def clear_chat_models():
+    """丢弃缓存的模型实例（修改API Key等配置后使用）"""
+    with _models_lock:
+        _models.clear()
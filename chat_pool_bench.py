@@ -0,0 +1,88 @@
+"""
+tongyi_llm每次调用的固定开销：每次新建PromptTemplate和ChatTongyi（原实现） vs 共享模型实例（chat_pool）。
+
+用本地的假模型代替通义千问（_generate/_stream直接返回固定文本，不访问网络），
+测出的差值就是每次调用花在构造对象上的时间。
+
+    python chat_pool_bench.py --calls 2000
+"""
+import argparse
+import os
+import statistics
+import time
+
+from langchain_community.chat_models import ChatTongyi
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.prompts import PromptTemplate
+
+from chat_pool import clear_chat_models, get_chat_model
+
+ANSWER = "LangGraph是一个用于构建有状态智能体的框架。"
+
+
+class FakeTongyi(ChatTongyi):
+    """构造过程与ChatTongyi完全相同（参数校验、读取API Key），只是不发请求"""
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=ANSWER))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        for token in ANSWER:
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+def tongyi_llm_rebuild(s):
+    # 原实现：每次调用都新建模板和模型
+    prompt = PromptTemplate.from_template("{question}")
+    tongyi_chat = FakeTongyi(model="qwen-plus", api_key=os.environ["DASHSCOPE_API_KEY"])
+    value = prompt.invoke({"question": s})
+    return tongyi_chat.invoke(value).content
+
+
+PROMPT = PromptTemplate.from_template("{question}")
+
+
+def tongyi_llm_pooled(s):
+    tongyi_chat = get_chat_model("qwen-plus", model_cls=FakeTongyi, api_key=os.environ["DASHSCOPE_API_KEY"])
+    return tongyi_chat.invoke(PROMPT.invoke({"question": s})).content
+
+
+def tongyi_llm_pooled_stream(s):
+    tongyi_chat = get_chat_model("qwen-plus", model_cls=FakeTongyi, api_key=os.environ["DASHSCOPE_API_KEY"],
+                                 streaming=True)
+    return "".join(chunk.content for chunk in tongyi_chat.stream(PROMPT.invoke({"question": s})))
+
+
+def bench(name, func, calls):
+    func("warm up")
+    samples = []
+    for i in range(calls):
+        start = time.perf_counter()
+        func(f"问题{i}")
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    result = {
+        "mean_us": statistics.fmean(samples),
+        "p50_us": samples[len(samples) // 2],
+        "p99_us": samples[int(len(samples) * 0.99) - 1],
+    }
+    print(f"{name:<22} 平均 {result['mean_us']:8.1f}us  p50 {result['p50_us']:8.1f}us  p99 {result['p99_us']:8.1f}us")
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="对比tongyi_llm每次新建模型与共享模型的单次调用开销")
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+    os.environ.setdefault("DASHSCOPE_API_KEY", "sk-bench")
+
+    clear_chat_models()
+    rebuild = bench("每次新建", tongyi_llm_rebuild, args.calls)
+    pooled = bench("共享实例", tongyi_llm_pooled, args.calls)
+    bench("共享实例（流式）", tongyi_llm_pooled_stream, args.calls)
+    saved = rebuild["mean_us"] - pooled["mean_us"]
+    print(f"每次调用节省 {saved:.1f}us（{saved / rebuild['mean_us'] * 100:.1f}%）")
@@ -1,30 +1,16 @@
 import os
-from typing import Literal
-from langchain_community.chat_models import ChatTongyi
 from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableConfig
 from dashscope import api_key
-from tavily import TavilyClient
 from deepagents import create_deep_agent
 import dotenv
 
+from chat_pool import get_chat_model
+from research_tools import internet_search
+from streaming_runner import stream_agent
+
 dotenv.load_dotenv()
-# 初始化搜索客户端
-tavily_client = TavilyClient(api_key=os.environ["TAVILY_API_KEY"])
-# a=tavily_client.search(query="who is Bill Gates")
-# 定义搜索工具
-def internet_search(
-    query: str,
-    max_results: int = 5,
-    topic: Literal["general", "news", "finance"] = "general",
-    include_raw_content: bool = False,
-):
-    """Run a web search"""
-    return tavily_client.search(
-        query,
-        max_results=max_results,
-        include_raw_content=include_raw_content,
-        topic=topic,
-    )
+# 搜索工具见research_tools：多个查询并发搜索、合并去重，Tavily客户端在第一次搜索时创建
 
 # 定义系统提示
 research_instructions = """You are an expert researcher. Your job is to conduct thorough research and then write a polished report.
@@ -33,24 +19,46 @@ You have access to an internet search tool as your primary means of gathering in
 
 ## `internet_search`
 
-Use this to run an internet search for a given query. You can specify the max number of results to return, the topic, and whether raw content should be included.
+Use this to run internet searches. Pass every query you need for the current step together as a list; they run concurrently and the results come back merged and de-duplicated. You can specify the max number of results per query, the topic, and whether raw content should be included.
 """
 
-def tongyi_llm(s):
-    """Run a web search"""
-    # return "hello"
-
-    prompt = PromptTemplate.from_template("{question}")
-    tongyi_chat=ChatTongyi(model="qwen-plus",api_key=os.environ["DASHSCOPE_API_KEY"])
-    value=prompt.invoke({"question":s})
-    return tongyi_chat.invoke(value).content
-# 创建 Deep Agent
-agent = create_deep_agent(
-    model="qwen-plus",
-    tools=[tongyi_llm],
-    system_prompt=research_instructions,
-)
-
-# 运行智能体
-result = agent.invoke({"messages": [{"role": "user", "content": "What is langgraph?"}]})
-print(result["messages"][-1].content)
\ No newline at end of file
+# 提示模板只创建一次；模型实例在第一次调用时创建，之后所有调用共用（见chat_pool）
+prompt = PromptTemplate.from_template("{question}")
+
+
+def tongyi_chat():
+    # ChatTongyi默认显式设置了streaming=False，此时stream()也只返回一整块，这里使用streaming=True的共享实例
+    return get_chat_model("qwen-plus", api_key=os.environ["DASHSCOPE_API_KEY"], streaming=True)
+
+
+def _stream_writer():
+    # 在LangGraph中运行时把token写入custom流，单独调用时不输出
+    from langgraph.config import get_stream_writer
+    try:
+        return get_stream_writer()
+    except (RuntimeError, KeyError):
+        return lambda chunk: None
+
+
+def tongyi_llm(s: str, config: RunnableConfig):
+    """Ask the qwen-plus model a self-contained question and return its full answer as text"""
+    # config由LangChain注入：模型的token随智能体的stream(stream_mode="messages")一起产出，
+    # 同时写入stream_mode="custom"，调用方不必等工具返回就能看到生成的内容
+    writer = _stream_writer()
+    chunks = []
+    for chunk in tongyi_chat().stream(prompt.invoke({"question": s}), config=config):
+        chunks.append(chunk.content)
+        writer({"tool": "tongyi_llm", "token": chunk.content})
+    return "".join(chunks)
+
+
+if __name__ == "__main__":
+    # 创建 Deep Agent
+    agent = create_deep_agent(
+        model="qwen-plus",
+        tools=[internet_search, tongyi_llm],
+        system_prompt=research_instructions,
+    )
+
+    # 运行智能体：token和工具调用边生成边打印，最后输出首token延迟和生成速度
+    result, stats = stream_agent(agent, {"messages": [{"role": "user", "content": "What is langgraph?"}]})
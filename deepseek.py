@@ -2,6 +2,8 @@ import os
 from dotenv import load_dotenv
 from langchain.chat_models import init_chat_model
 
+from llm_cache import langchain_cache
+
 # 加载环境变量
 load_dotenv(override=True)
 
@@ -13,7 +15,9 @@ model = init_chat_model(
     api_key=deepseek_api_key,
     base_url=deepseek_base_url,
     model_provider="deepseek",
-    model="deepseek-chat"
+    model="deepseek-chat",
+    # 设置LLM_CACHE_PATH后，相同的提示词直接返回缓存的回答（默认不缓存，见llm_cache）
+    cache=langchain_cache("deepseek-chat"),
 )
 
 # 测试模型调用
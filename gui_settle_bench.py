@@ -0,0 +1,75 @@
+"""
+GUI操作等待策略基准测试：对比固定等待1秒与画面稳定检测两种模式下每秒可执行的动作数。
+
+运行方式（需要图形桌面）：
+    python gui_settle_bench.py --actions 20 --render-delay 0.15
+
+脚本会启动一个本地Tk窗口作为被操作的界面：每次按键后延迟render_delay秒再重绘，
+模拟真实应用的界面响应时间，然后分别用两种模式驱动相同的按键序列。
+"""
+import argparse
+import importlib
+import subprocess
+import sys
+import time
+
+
+def run_ui(render_delay):
+    """被测界面：输入框获得焦点，按键后延迟一段时间更新大字号计数和背景色。"""
+    import tkinter as tk
+
+    root = tk.Tk()
+    root.title("settle bench")
+    root.geometry("800x600+100+100")
+    label = tk.Label(root, text="0", font=("Arial", 96))
+    label.pack(expand=True, fill="both")
+    entry = tk.Entry(root)
+    entry.pack()
+    entry.focus_force()
+    colors = ["#ffffff", "#ffd54f", "#81c784", "#64b5f6"]
+    count = [0]
+
+    def redraw():
+        count[0] += 1
+        label.config(text=str(count[0]), bg=colors[count[0] % len(colors)])
+
+    root.bind("<Key>", lambda event: root.after(int(render_delay * 1000), redraw))
+    root.mainloop()
+
+
+def bench(gui, actions, until_stable):
+    gui.SETTLE_UNTIL_STABLE = until_stable
+    start = time.perf_counter()
+    for _ in range(actions):
+        gui.execute_gui_action("KEY_PRESS", {"key": "a"}, "")
+    elapsed = time.perf_counter() - start
+    return actions / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--actions", type=int, default=20)
+    parser.add_argument("--render-delay", type=float, default=0.15)
+    parser.add_argument("--ui", action="store_true", help="只启动被测界面（内部使用）")
+    args = parser.parse_args()
+
+    if args.ui:
+        run_ui(args.render_delay)
+        return
+
+    ui = subprocess.Popen([sys.executable, __file__, "--ui", "--render-delay", str(args.render_delay)])
+    try:
+        time.sleep(2)  # 等待窗口出现并获得焦点
+        gui = importlib.import_module("GUI交互")
+        fixed = bench(gui, args.actions, until_stable=False)
+        stable = bench(gui, args.actions, until_stable=True)
+    finally:
+        ui.terminate()
+
+    print(f"界面重绘延迟 {args.render_delay * 1000:.0f}ms, 每种模式 {args.actions} 次动作")
+    print(f"固定等待 {gui.SETTLE_DELAY:.1f}s: {fixed:.2f} 动作/秒")
+    print(f"稳定检测:       {stable:.2f} 动作/秒 ({stable / fixed:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,9 @@
-import os
-from openai import OpenAI
+from llm_cache import cached_openai_client
+from openai_pool import get_openai_client
 
-client = OpenAI(
-    # 若没有配置环境变量，请用百炼API Key将下行替换为：api_key="sk-xxx"
-    api_key=os.getenv("DASHSCOPE_API_KEY"),
-    base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
-)
+# 若没有配置环境变量，请用百炼API Key传入：get_openai_client(api_key="sk-xxx")
+# 设置LLM_CACHE_PATH后，相同的请求直接返回缓存的回答（默认不缓存，见llm_cache）
+client = cached_openai_client(get_openai_client())
 
 completion = client.chat.completions.create(
     # 模型列表：https://help.aliyun.com/zh/model-studio/getting-started/models
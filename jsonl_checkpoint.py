@@ -0,0 +1,59 @@
+"""
+批量任务的JSONL结果文件：每条结果一行、写完立即flush，中断后重新运行时跳过已成功的条目。
+audio_batch.py（按file）和batch_runner.py（按id）共用。
+
+    output = JsonlCheckpoint("results.jsonl", key="id")
+    completed = output.load_completed()
+    with output:
+        output.write({"id": "q1", "status": "ok", ...})
+"""
+import json
+import os
+import threading
+
+
+class JsonlCheckpoint:
+    """key为记录中标识条目的字段；status为"ok"的记录视为已完成。write()线程安全。"""
+
+    def __init__(self, path, key):
+        self.path = path
+        self.key = key
+        self._file = None
+        self._lock = threading.Lock()
+
+    def load_completed(self):
+        """读取已有输出中成功的条目，用于续跑"""
+        completed = set()
+        if not os.path.exists(self.path):
+            return completed
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 上次中断时可能只写了半行
+                    continue
+                if isinstance(record, dict) and record.get("status") == "ok":
+                    completed.add(record[self.key])
+        return completed
+
+    def __enter__(self):
+        """以追加方式打开；上次中断留下的半行先补上换行，单独成行，不影响后续记录的解析"""
+        if os.path.exists(self.path) and os.path.getsize(self.path):
+            with open(self.path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                truncated = f.read(1) != b"\n"
+            if truncated:
+                with open(self.path, "a", encoding="utf-8") as out:
+                    out.write("\n")
+        self._file = open(self.path, "a", encoding="utf-8")
+        return self
+
+    def __exit__(self, *exc_info):
+        self._file.close()
+        self._file = None
+
+    def write(self, record):
+        with self._lock:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
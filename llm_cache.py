@@ -0,0 +1,431 @@
+"""
+大模型回答的持久化缓存（SQLite）：相同的提示词在TTL内直接返回缓存的回答，不再请求模型服务。
+
+- 精确匹配：按(命名空间, 提示词)的哈希查找
+- 相似匹配（可选）：传入embeddings后，精确匹配未命中时在同一命名空间内找最相似的提示词，
+  余弦相似度不低于similarity_threshold即命中；向量索引在内存中（numpy），首次查找时从数据库加载
+- 命名空间区分模型和调用参数，不同模型、不同temperature的回答互不混用
+- 超过max_entries条时按最近访问时间淘汰；get_stats()返回命中率等统计，并按模型分别计数
+
+接入方式：
+    ChatTongyi(model="qwen-plus", cache=langchain_cache("qwen-plus"))   # LangChain聊天模型
+    client = cached_openai_client(get_openai_client())                  # OpenAI协议的原始客户端
+
+默认不缓存：设置LLM_CACHE_PATH（SQLite文件路径）后才启用，避免演示脚本在不知情时重放过期的回答。
+相似匹配的向量在锁外计算，换成远程Embeddings服务时也不会让其他线程的查找和写入排队等待；精确命中不计算向量。
+
+LangChain的缓存只作用于invoke/batch以及智能体内部的模型调用，chain.stream()/model.stream()不查缓存。
+ChatTongyi生成缓存键时不包含模型名，所以通过模型的cache参数按模型分别接入，而不是set_llm_cache全局设置。
+
+运行本文件会用离线的假模型演示缓存效果：
+    python llm_cache.py
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.caches import BaseCache
+
+DEFAULT_TTL = 24 * 3600
+MAX_ENTRIES = 10000
+SIMILARITY_THRESHOLD = 0.95
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    namespace TEXT NOT NULL,
+    label TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    response TEXT NOT NULL,
+    embedding BLOB,
+    created REAL NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed);
+CREATE INDEX IF NOT EXISTS llm_cache_namespace ON llm_cache (namespace);
+"""
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def default_cache_path():
+    """LLM_CACHE_PATH优先，默认放在用户缓存目录（直接创建LLMCache且不指定path时使用）"""
+    return os.environ.get("LLM_CACHE_PATH") or os.path.join(
+        os.path.expanduser("~"), ".cache", "deepagents", "llm_cache.sqlite3")
+
+
+def cache_key(namespace, prompt):
+    return hashlib.sha256(json.dumps([namespace, prompt], ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class NgramEmbeddings:
+    """
+    本地的字符n-gram哈希向量，不需要模型和网络。只能识别字面上接近的提示词（空白、标点、个别字词不同），
+    不理解语义；需要语义相似时换成DashScopeEmbeddings等LangChain Embeddings。
+    """
+
+    def __init__(self, dim=512, n=2):
+        self.dim = dim
+        self.n = n
+
+    def embed_query(self, text):
+        # 忽略大小写、空白和标点
+        text = re.sub(r"[\W_]+", "", text.casefold())
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for i in range(max(1, len(text) - self.n + 1)):
+            vector[zlib.crc32(text[i:i + self.n].encode("utf-8")) % self.dim] += 1
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+class LLMCache:
+    """
+    线程安全。ttl为None表示不过期；embeddings为带embed_query(text)的对象（LangChain Embeddings接口），
+    为None时只做精确匹配。
+    """
+
+    def __init__(self, path=None, ttl=DEFAULT_TTL, max_entries=MAX_ENTRIES, embeddings=None,
+                 similarity_threshold=SIMILARITY_THRESHOLD):
+        self.path = path or default_cache_path()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        # {namespace: (keys, 向量矩阵)}，增删条目时失效，下次相似查找时重建
+        self._index = {}
+        # get未命中时算出的向量，紧接着的put直接使用，不重复计算
+        self._pending = OrderedDict()
+        # 统计
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self._by_label = {}
+
+    def _count(self, label, field):
+        counts = self._by_label.setdefault(label, {"hits": 0, "semantic_hits": 0, "misses": 0})
+        counts[field] += 1
+
+    def _embed(self, key, text):
+        """在锁外调用：优先取get未命中时留下的向量，否则调用embeddings计算（可能是远程请求）"""
+        with self._lock:
+            embedding = self._pending.pop(key, None)
+        if embedding is None:
+            embedding = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+            norm = np.linalg.norm(embedding)
+            embedding = embedding / norm if norm else embedding
+        return embedding
+
+    def _namespace_index(self, namespace):
+        index = self._index.get(namespace)
+        if index is None:
+            rows = self._conn.execute("SELECT key, embedding FROM llm_cache WHERE namespace = ? "
+                                      "AND embedding IS NOT NULL", (namespace,)).fetchall()
+            keys = [key for key, _ in rows]
+            matrix = (np.stack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+                      if rows else np.zeros((0, 0), dtype=np.float32))
+            index = self._index[namespace] = (keys, matrix)
+        return index
+
+    def _similar(self, namespace, key, embedding, now):
+        """相似查找（持有锁时调用），返回(response, 相似度)或None"""
+        self._pending[key] = embedding
+        while len(self._pending) > 64:
+            self._pending.popitem(last=False)
+        keys, matrix = self._namespace_index(namespace)
+        if not keys or matrix.shape[1] != embedding.shape[0]:
+            return None
+        scores = matrix @ embedding
+        # 从最相似的开始，过期的删除后继续看下一个，直到低于阈值
+        for best in np.argsort(-scores):
+            if scores[best] < self.similarity_threshold:
+                break
+            row = self._conn.execute("SELECT response, expires FROM llm_cache WHERE key = ?",
+                                     (keys[best],)).fetchone()
+            if row is None:
+                continue
+            if row[1] is not None and row[1] <= now:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (keys[best],))
+                self._entries -= 1
+                self._index.pop(namespace, None)
+                self.expired += 1
+                continue
+            self._conn.execute("UPDATE llm_cache SET accessed = ? WHERE key = ?", (now, keys[best]))
+            return row[0], float(scores[best])
+        return None
+
+    def get(self, namespace, prompt, text=None, label=""):
+        """
+        返回缓存的回答，未命中时返回None。
+        text为做相似匹配的文本（默认为prompt），label为统计用的模型名。
+        """
+        key = cache_key(namespace, prompt)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, expires FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[1] is not None and row[1] <= now:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._entries -= 1
+                self._index.pop(namespace, None)
+                self.expired += 1
+                row = None
+            if row is not None:
+                self._conn.execute("UPDATE llm_cache SET accessed = ? WHERE key = ?", (now, key))
+                self.hits += 1
+                self._count(label, "hits")
+                return json.loads(row[0])
+            if self.embeddings is None:
+                self.misses += 1
+                self._count(label, "misses")
+                return None
+        # 精确匹配未命中才计算向量，计算期间不持有锁
+        embedding = self._embed(key, text or prompt)
+        with self._lock:
+            similar = self._similar(namespace, key, embedding, now)
+            if similar is not None:
+                self.semantic_hits += 1
+                self._count(label, "semantic_hits")
+                return json.loads(similar[0])
+            self.misses += 1
+            self._count(label, "misses")
+        return None
+
+    def put(self, namespace, prompt, response, text=None, label=""):
+        key = cache_key(namespace, prompt)
+        now = time.time()
+        expires = now + self.ttl if self.ttl else None
+        data = json.dumps(response, ensure_ascii=False)
+        embedding = self._embed(key, text or prompt) if self.embeddings is not None else None
+        with self._lock:
+            exists = self._conn.execute("SELECT 1 FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, namespace, label, prompt, data,
+                 embedding.astype(np.float32).tobytes() if embedding is not None else None, now, expires, now))
+            if not exists:
+                self._entries += 1
+            self._index.pop(namespace, None)
+            if self._entries > self.max_entries:
+                self._evict(now)
+
+    def _evict(self, now):
+        """先删过期的，仍超过上限时按最近访问时间从旧到新删除，直到降到上限的90%"""
+        removed = self._conn.execute("DELETE FROM llm_cache WHERE expires IS NOT NULL AND expires <= ?",
+                                     (now,)).rowcount
+        self.expired += removed
+        self._entries -= removed
+        excess = self._entries - int(self.max_entries * 0.9)
+        if excess > 0:
+            self._conn.execute("DELETE FROM llm_cache WHERE key IN "
+                               "(SELECT key FROM llm_cache ORDER BY accessed LIMIT ?)", (excess,))
+            self.evictions += excess
+            self._entries -= excess
+        self._index.clear()
+
+    def clear(self, namespace=None):
+        with self._lock:
+            if namespace is None:
+                self._conn.execute("DELETE FROM llm_cache")
+            else:
+                self._conn.execute("DELETE FROM llm_cache WHERE namespace = ?", (namespace,))
+            self._entries = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            self._index.clear()
+
+    def get_stats(self):
+        with self._lock:
+            by_label = {label: dict(counts) for label, counts in self._by_label.items()}
+        lookups = self.hits + self.semantic_hits + self.misses
+        return {
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": f"{(self.hits + self.semantic_hits) / lookups * 100:.2f}%" if lookups else "0.00%",
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "entries": self._entries,
+            "by_model": by_label,
+        }
+
+    def close(self):
+        self._conn.close()
+
+
+def get_llm_cache():
+    """
+    进程内共用的缓存（延迟打开）；默认关闭，没有设置LLM_CACHE_PATH（或设为off）时返回None。
+    设置LLM_CACHE_SIMILARITY（如0.95）时启用本地n-gram向量的相似匹配。
+    """
+    global _cache
+    if os.environ.get("LLM_CACHE_PATH", "off").lower() == "off":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            similarity = os.environ.get("LLM_CACHE_SIMILARITY")
+            _cache = LLMCache(embeddings=NgramEmbeddings() if similarity else None,
+                              similarity_threshold=float(similarity) if similarity else SIMILARITY_THRESHOLD)
+        return _cache
+
+
+def _message_text(prompt):
+    """LangChain聊天模型的提示词是消息列表的序列化JSON，相似匹配只用其中的文本内容"""
+    try:
+        messages = json.loads(prompt)
+    except ValueError:
+        return prompt
+    if not isinstance(messages, list):
+        return prompt
+    parts = []
+    for message in messages:
+        content = message.get("kwargs", message).get("content") if isinstance(message, dict) else None
+        if isinstance(content, str):
+            parts.append(content)
+        elif isinstance(content, list):
+            parts.extend(block.get("text", "") for block in content if isinstance(block, dict))
+    return "\n".join(parts) or prompt
+
+
+class LangChainLLMCache(BaseCache):
+    """
+    LangChain的缓存接口。model为模型名，与LangChain传入的llm_string（调用参数）一起组成命名空间。
+    """
+
+    def __init__(self, cache, model=""):
+        self.cache = cache
+        self.model = model
+
+    def _namespace(self, llm_string):
+        return f"langchain:{self.model}:{llm_string}"
+
+    def lookup(self, prompt, llm_string):
+        from langchain_core.load import loads
+        response = self.cache.get(self._namespace(llm_string), prompt, _message_text(prompt), self.model)
+        if response is None:
+            return None
+        return [loads(generation, allowed_objects="core") for generation in response]
+
+    def update(self, prompt, llm_string, return_val):
+        from langchain_core.load import dumps
+        self.cache.put(self._namespace(llm_string), prompt, [dumps(generation) for generation in return_val],
+                       _message_text(prompt), self.model)
+
+    def clear(self, **kwargs):
+        self.cache.clear()
+
+
+def langchain_cache(model, cache=None):
+    """给LangChain聊天模型的cache参数用；缓存关闭（没有设置LLM_CACHE_PATH）时返回None"""
+    cache = cache if cache is not None else get_llm_cache()
+    return LangChainLLMCache(cache, model) if cache is not None else None
+
+
+class _CachedCompletions:
+    def __init__(self, completions, cache, base_url):
+        self._completions = completions
+        self._cache = cache
+        self._base_url = base_url
+
+    def create(self, **kwargs):
+        """与chat.completions.create一致；流式输出、n>1时不缓存"""
+        if self._cache is None or kwargs.get("stream") or kwargs.get("n", 1) != 1:
+            return self._completions.create(**kwargs)
+        from openai.types.chat import ChatCompletion
+        params = {k: v for k, v in kwargs.items() if k != "messages"}
+        namespace = "openai:" + json.dumps([self._base_url, params], ensure_ascii=False, sort_keys=True, default=str)
+        messages = kwargs.get("messages", [])
+        prompt = json.dumps(messages, ensure_ascii=False, sort_keys=True, default=str)
+        text = "\n".join(m["content"] for m in messages if isinstance(m.get("content"), str)) or prompt
+        label = kwargs.get("model", "")
+        response = self._cache.get(namespace, prompt, text, label)
+        if response is not None:
+            return ChatCompletion.model_validate(response)
+        completion = self._completions.create(**kwargs)
+        self._cache.put(namespace, prompt, completion.model_dump(mode="json"), text, label)
+        return completion
+
+    def __getattr__(self, name):
+        return getattr(self._completions, name)
+
+
+class _CachedChat:
+    def __init__(self, chat, cache, base_url):
+        self.completions = _CachedCompletions(chat.completions, cache, base_url)
+        self._chat = chat
+
+    def __getattr__(self, name):
+        return getattr(self._chat, name)
+
+
+class CachedOpenAI:
+    """包装OpenAI客户端：chat.completions.create先查缓存，其余属性和方法原样转发"""
+
+    def __init__(self, client, cache):
+        self._client = client
+        self.chat = _CachedChat(client.chat, cache, str(getattr(client, "base_url", "")))
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def cached_openai_client(client, cache=None):
+    cache = cache if cache is not None else get_llm_cache()
+    return CachedOpenAI(client, cache)
+
+
+class FakeOpenAIClient:
+    """离线的假OpenAI客户端，chat.completions.create返回固定格式的回答，记录实际发出的请求"""
+
+    def __init__(self):
+        self.calls = []
+        self.chat = self
+        self.completions = self
+        self.base_url = "http://fake"
+
+    def create(self, model, messages, **kwargs):
+        from openai.types.chat import ChatCompletion
+        self.calls.append(messages[-1]["content"])
+        return ChatCompletion.model_validate({
+            "id": f"fake-{len(self.calls)}", "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": f"answer to: {messages[-1]['content']}"}}],
+        })
+
+
+if __name__ == "__main__":
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+    prompts = ["完整输出静夜思", "完整输出静夜思", "完整输出 静夜思。", "介绍一下LangGraph", "介绍一下LangChain"]
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = LLMCache(os.path.join(tmp, "llm_cache.sqlite3"), embeddings=NgramEmbeddings())
+        model = FakeListChatModel(responses=[f"回答{i}" for i in range(10)], cache=langchain_cache("fake", cache))
+        for prompt in prompts:
+            print(f"LangChain  {prompt!r:<16} -> {model.invoke(prompt).content}")
+        print(f"假模型实际调用 {model.i} 次")
+
+        client = cached_openai_client(FakeOpenAIClient(), cache)
+        for prompt in prompts:
+            completion = client.chat.completions.create(model="qwen-plus", messages=[{"role": "user", "content": prompt}])
+            print(f"OpenAI     {prompt!r:<16} -> {completion.choices[0].message.content}")
+        print(f"假客户端实际请求 {len(client._client.calls)} 次")
+        print(f"缓存统计: {cache.get_stats()}")
+        cache.close()
@@ -1,9 +1,12 @@
 import dotenv
 from langchain_community.chat_models import ChatTongyi
 from langchain_core.prompts import PromptTemplate
+
+from llm_cache import langchain_cache
 # dotenv.load_dotenv()
 prompt = PromptTemplate.from_template("{question}")
-tongyi_chat=ChatTongyi(model="qwen-plus",)
+# 设置LLM_CACHE_PATH后，相同的提示词直接返回缓存的回答（默认不缓存，见llm_cache）
+tongyi_chat=ChatTongyi(model="qwen-plus",cache=langchain_cache("qwen-plus"))
 value=prompt.invoke({"question":"完整输出静夜思"})
 
 print(tongyi_chat.invoke(value).content)
\ No newline at end of file
@@ -0,0 +1,380 @@
+"""
+多个模型后端之间的路由：每个请求发给当前最快的健康后端，慢了就对冲，出错就切换。
+
+- 每个后端记录最近window次调用的延迟（p50/p95）和错误率；按 p50 ×（1 + 4 × 错误率）从小到大选择，
+  从未调用过的后端排在前面先探测一次，调用过但从没成功过的排在最后
+- 对冲：首选后端hedge_delay秒内还没有返回第一个结果，就同时请求下一个后端，谁先返回用谁
+- 切换：请求出错时改用下一个后端；连续失败failure_threshold次的后端暂停cooldown秒
+- 流式调用（stream、智能体的messages流）同样适用，以首个token为准；已经开始输出后出错不再切换
+- 延迟：非流式调用为完整响应的耗时，流式调用为首个token的耗时
+
+RouterChatModel是LangChain的聊天模型，可以直接传给create_deep_agent(model=...)；
+bind_tools会绑定到每个后端，绑定前后共用同一份统计。
+
+运行本文件会用几个延迟、错误率不同的本地假模型演示路由效果：
+    python model_router.py
+"""
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+from percentiles import percentile
+
+WINDOW = 100
+HEDGE_DELAY = 2.0
+FAILURE_THRESHOLD = 3
+COOLDOWN = 30.0
+ERROR_PENALTY = 4
+
+
+class BackendStats:
+    """一个后端的滚动统计"""
+
+    def __init__(self, name, window=WINDOW):
+        self.name = name
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.wins = 0
+        self.hedges = 0
+        self.consecutive_errors = 0
+        self.cooldown_until = 0.0
+
+    def success(self, seconds):
+        self.latencies.append(seconds)
+        self.outcomes.append(True)
+        self.consecutive_errors = 0
+
+    def failure(self, failure_threshold, cooldown):
+        self.outcomes.append(False)
+        self.errors += 1
+        self.consecutive_errors += 1
+        if self.consecutive_errors >= failure_threshold:
+            self.cooldown_until = time.monotonic() + cooldown
+
+    def healthy(self, now):
+        return now >= self.cooldown_until
+
+    def error_rate(self):
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def score(self):
+        # 从未调用过的先探测一次；调用过但从没成功的排在最后
+        if not self.outcomes:
+            return 0.0
+        if not self.latencies:
+            return float("inf")
+        return percentile(sorted(self.latencies), 0.5) * (1 + ERROR_PENALTY * self.error_rate())
+
+    def as_dict(self, now):
+        latencies = sorted(self.latencies)
+        p50 = percentile(latencies, 0.5)
+        p95 = percentile(latencies, 0.95)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "error_rate": round(self.error_rate(), 3),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "wins": self.wins,
+            "hedges": self.hedges,
+            "healthy": self.healthy(now),
+        }
+
+
+class _RouterState:
+    """绑定工具前后的RouterChatModel共用的统计和线程池"""
+
+    def __init__(self, names, window):
+        self.lock = threading.Lock()
+        self.stats = {name: BackendStats(name, window) for name in names}
+        self.executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="model-router")
+        self.failovers = 0
+
+
+def _backend_name(backend, index):
+    name = getattr(backend, "model_name", None) or getattr(backend, "model", None) or type(backend).__name__
+    return f"{index}:{name}"
+
+
+class RouterChatModel(BaseChatModel):
+    """
+    backends: 聊天模型列表（顺序即样本相同时的优先级），names为统计中显示的名称
+    hedge_delay: 对冲等待的秒数，None表示不对冲
+    """
+
+    backends: List[Any]
+    names: Optional[List[str]] = None
+    hedge_delay: Optional[float] = HEDGE_DELAY
+    window: int = WINDOW
+    failure_threshold: int = FAILURE_THRESHOLD
+    cooldown: float = COOLDOWN
+
+    _state: _RouterState = PrivateAttr()
+
+    def model_post_init(self, __context):
+        if not self.backends:
+            raise ValueError("至少需要一个后端")
+        if self.names is None:
+            self.names = [_backend_name(backend, i) for i, backend in enumerate(self.backends)]
+        self._state = _RouterState(self.names, self.window)
+
+    @property
+    def _llm_type(self):
+        return "router"
+
+    @property
+    def _identifying_params(self):
+        return {"backends": self.names, "hedge_delay": self.hedge_delay}
+
+    def bind_tools(self, tools, **kwargs):
+        router = self.model_copy(update={"backends": [backend.bind_tools(tools, **kwargs)
+                                                      for backend in self.backends]})
+        router._state = self._state
+        return router
+
+    def _ranked(self):
+        """健康的后端按得分排序，全部暂停时按恢复时间排序（总要有一个可用）"""
+        now = time.monotonic()
+        with self._state.lock:
+            stats = [self._state.stats[name] for name in self.names]
+            healthy = [i for i, s in enumerate(stats) if s.healthy(now)]
+            if healthy:
+                return sorted(healthy, key=lambda i: (stats[i].score(), i))
+            return sorted(range(len(stats)), key=lambda i: stats[i].cooldown_until)
+
+    def _race(self, messages, stop, streaming, **kwargs):
+        """
+        按排名请求后端，必要时对冲和切换；产出(后端名, 结果)，结果为AIMessage或AIMessageChunk。
+        只输出最先返回首个结果的那个后端的内容。
+        """
+        state = self._state
+        order = self._ranked()
+        results = queue.Queue()
+        cancelled = set()
+        pending = set()
+        errors = []
+
+        def attempt(index, hedge):
+            name = self.names[index]
+            backend = self.backends[index]
+            start = time.monotonic()
+            with state.lock:
+                state.stats[name].requests += 1
+                state.stats[name].hedges += hedge
+            first = True
+            try:
+                items = (backend.stream(messages, stop=stop, **kwargs) if streaming
+                         else [backend.invoke(messages, stop=stop, **kwargs)])
+                for item in items:
+                    if first:
+                        first = False
+                        with state.lock:
+                            state.stats[name].success(time.monotonic() - start)
+                    if index in cancelled:
+                        return
+                    results.put((index, "item", item))
+                results.put((index, "end", None))
+            except Exception as e:
+                if first:
+                    with state.lock:
+                        state.stats[name].failure(self.failure_threshold, self.cooldown)
+                results.put((index, "error", e))
+
+        def launch(hedge=False):
+            index = order.pop(0)
+            pending.add(index)
+            state.executor.submit(attempt, index, hedge)
+
+        launch()
+        winner = None
+        hedge_at = time.monotonic() + self.hedge_delay if self.hedge_delay is not None else None
+        while True:
+            timeout = None
+            if winner is None and hedge_at is not None and order:
+                timeout = max(0.0, hedge_at - time.monotonic())
+            try:
+                index, kind, value = results.get(timeout=timeout)
+            except queue.Empty:
+                # 首选后端太慢，对冲到下一个
+                launch(hedge=True)
+                hedge_at = None
+                continue
+            if winner is not None and index != winner:
+                continue
+            if kind == "item":
+                if winner is None:
+                    winner = index
+                    cancelled.update(pending - {index})
+                    with state.lock:
+                        state.stats[self.names[index]].wins += 1
+                yield self.names[index], value
+            elif kind == "end":
+                return
+            else:
+                if winner is not None:
+                    raise value
+                pending.discard(index)
+                errors.append(value)
+                if not pending:
+                    if not order:
+                        raise errors[0] if len(errors) == 1 else RuntimeError(
+                            f"所有后端均失败: {[f'{type(e).__name__}: {e}' for e in errors]}") from errors[-1]
+                    with state.lock:
+                        state.failovers += 1
+                    launch()
+                    # 切换后的后端重新计算对冲等待时间
+                    if self.hedge_delay is not None:
+                        hedge_at = time.monotonic() + self.hedge_delay
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        for name, message in self._race(messages, stop, streaming=False, **kwargs):
+            message = message.model_copy(update={
+                "response_metadata": dict(message.response_metadata, router_backend=name)})
+            return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        first = True
+        for name, chunk in self._race(messages, stop, streaming=True, **kwargs):
+            if first:
+                first = False
+                chunk = chunk.model_copy(update={
+                    "response_metadata": dict(chunk.response_metadata, router_backend=name)})
+            chunk = ChatGenerationChunk(message=chunk)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    def get_stats(self):
+        now = time.monotonic()
+        with self._state.lock:
+            return {
+                "backends": {name: self._state.stats[name].as_dict(now) for name in self.names},
+                "failovers": self._state.failovers,
+            }
+
+
+def _tongyi():
+    from langchain_community.chat_models import ChatTongyi
+    return ChatTongyi(model="qwen-plus", streaming=True)
+
+
+def _deepseek():
+    from langchain.chat_models import init_chat_model
+    return init_chat_model(model="deepseek-chat", model_provider="deepseek",
+                           api_key=os.environ["DEEPSEEK_API_KEY"], base_url="https://api.deepseek.com")
+
+
+def build_default_router(hedge_delay=HEDGE_DELAY, **kwargs):
+    """
+    通义千问（dashscope原生接口）、DashScope兼容模式、DeepSeek三个后端，没有配置API Key的跳过。
+    兼容模式后端需要安装langchain-openai。
+    """
+    backends, names = [], []
+    if os.environ.get("DASHSCOPE_API_KEY"):
+        backends.append(_tongyi())
+        names.append("tongyi:qwen-plus")
+        try:
+            from langchain_openai import ChatOpenAI
+        except ImportError:
+            pass
+        else:
+            from openai_pool import DASHSCOPE_BASE_URL
+            backends.append(ChatOpenAI(model="qwen-plus", base_url=DASHSCOPE_BASE_URL,
+                                       api_key=os.environ["DASHSCOPE_API_KEY"]))
+            names.append("dashscope-compatible:qwen-plus")
+    if os.environ.get("DEEPSEEK_API_KEY"):
+        backends.append(_deepseek())
+        names.append("deepseek:deepseek-chat")
+    return RouterChatModel(backends=backends, names=names, hedge_delay=hedge_delay, **kwargs)
+
+
+def build_default_model(**kwargs):
+    """
+    agent.py使用的模型：DASHSCOPE_API_KEY和DEEPSEEK_API_KEY都配置了才在两家服务之间路由；
+    只配置了DeepSeek时直接用DeepSeek，其余情况与原来一样使用ChatTongyi（缺少Key时在调用时报错）。
+    """
+    if os.environ.get("DASHSCOPE_API_KEY") and os.environ.get("DEEPSEEK_API_KEY"):
+        return build_default_router(**kwargs)
+    if os.environ.get("DEEPSEEK_API_KEY"):
+        return _deepseek()
+    return _tongyi()
+
+
+class FakeLatencyChatModel(BaseChatModel):
+    """
+    本地假模型：延迟服从对数正态分布（median秒，sigma控制长尾），按error_rate随机失败。
+    流式输出时先等待延迟再逐字返回。
+    """
+
+    name: str = "fake"
+    median: float = 0.1
+    sigma: float = 0.3
+    error_rate: float = 0.0
+    answer: str = "LangGraph是一个用于构建有状态智能体的框架。"
+
+    @property
+    def _llm_type(self):
+        return "fake-latency"
+
+    def _wait(self):
+        time.sleep(random.lognormvariate(0, self.sigma) * self.median)
+        if random.random() < self.error_rate:
+            raise ConnectionError(f"{self.name}: 模拟的服务错误")
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self._wait()
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.answer))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        self._wait()
+        for token in self.answer:
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+if __name__ == "__main__":
+    random.seed(0)
+    requests = 40
+
+    def make_backends():
+        return [
+            FakeLatencyChatModel(name="flaky-fast", median=0.05, error_rate=0.3),
+            FakeLatencyChatModel(name="steady", median=0.12, sigma=0.2),
+            FakeLatencyChatModel(name="long-tail", median=0.08, sigma=1.0),
+        ]
+
+    def run(name, model):
+        latencies, failures = [], 0
+        for i in range(requests):
+            start = time.monotonic()
+            try:
+                model.invoke(f"问题{i}")
+            except Exception:
+                failures += 1
+            latencies.append(time.monotonic() - start)
+        latencies.sort()
+        print(f"{name:<28} p50 {percentile(latencies, 0.5) * 1000:6.1f}ms  "
+              f"p95 {percentile(latencies, 0.95) * 1000:6.1f}ms  失败 {failures}/{requests}")
+
+    for backend in make_backends():
+        run(f"单独使用 {backend.name}", backend)
+    router = RouterChatModel(backends=make_backends(), names=["flaky-fast", "steady", "long-tail"],
+                             hedge_delay=0.1, cooldown=1.0)
+    run("路由（对冲100ms）", router)
+    for name, stats in router.get_stats()["backends"].items():
+        print(f"  {name:<12} {stats}")
+    print(f"  切换次数 {router.get_stats()['failovers']}")
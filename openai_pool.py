@@ -0,0 +1,83 @@
+"""
+DashScope兼容模式等OpenAI协议服务的共享客户端。
+
+每次调用都新建OpenAI(...)会重新建立连接池和TLS握手；这里按(base_url, api_key)缓存客户端，
+底层复用同一个httpx连接池（keep-alive，安装了h2时启用HTTP/2），重试与退避由OpenAI SDK完成。
+"""
+import importlib.util
+import os
+import threading
+
+import httpx
+from openai import OpenAI
+
+DASHSCOPE_BASE_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1"
+
+# 连接池与超时默认值
+DEFAULT_TIMEOUT = 60.0
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 10
+DEFAULT_KEEPALIVE_EXPIRY = 30.0
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def http2_available():
+    """httpx的HTTP/2支持依赖可选包h2。"""
+    return importlib.util.find_spec("h2") is not None
+
+
+def build_http_client(timeout=DEFAULT_TIMEOUT, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                      max_connections=DEFAULT_MAX_CONNECTIONS,
+                      max_keepalive_connections=DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+                      keepalive_expiry=DEFAULT_KEEPALIVE_EXPIRY):
+    return httpx.Client(
+        http2=http2_available(),
+        timeout=httpx.Timeout(timeout, connect=connect_timeout),
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        ),
+    )
+
+
+def get_openai_client(base_url=DASHSCOPE_BASE_URL, api_key=None, timeout=DEFAULT_TIMEOUT,
+                      max_retries=DEFAULT_MAX_RETRIES, **http_options):
+    """
+    获取共享的OpenAI客户端，线程安全。
+
+    同一(base_url, api_key)只创建一次客户端；timeout/max_retries与缓存的不同时，
+    返回with_options副本，副本仍共用同一个连接池。
+    http_options透传给build_http_client，只在首次创建时生效。
+    """
+    # 若没有配置环境变量，请用阿里云百炼API Key将下行替换为：api_key="sk-xxx"
+    api_key = api_key or os.getenv("DASHSCOPE_API_KEY")
+    key = (base_url, api_key)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = OpenAI(
+                    api_key=api_key,
+                    base_url=base_url,
+                    timeout=timeout,
+                    max_retries=max_retries,
+                    http_client=build_http_client(timeout=timeout, **http_options),
+                )
+                _clients[key] = client
+    if client.timeout != timeout or client.max_retries != max_retries:
+        client = client.with_options(timeout=timeout, max_retries=max_retries)
+    return client
+
+
+def close_openai_clients():
+    """关闭所有缓存的客户端及其连接池。"""
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
@@ -0,0 +1,84 @@
+"""
+共享OpenAI客户端的微基准：在本地模拟的OpenAI兼容服务上，对比每次新建客户端与复用共享客户端的单次请求延迟。
+
+运行方式：
+    python openai_pool_bench.py --requests 200
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from openai import OpenAI
+
+from openai_pool import build_http_client, close_openai_clients, get_openai_client
+
+COMPLETION = {
+    "id": "chatcmpl-mock",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "mock",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+}
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 支持keep-alive
+    disable_nagle_algorithm = True  # 避免响应头与响应体分两次写入时触发延迟确认
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps(COMPLETION).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def call(client):
+    start = time.perf_counter()
+    client.chat.completions.create(model="mock", messages=[{"role": "user", "content": "hi"}])
+    return time.perf_counter() - start
+
+
+def report(name, latencies):
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies) * 1000
+    p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+    print(f"{name}: 平均 {statistics.mean(latencies) * 1000:.2f}ms, p50 {p50:.2f}ms, p95 {p95:.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}/v1"
+
+    # 每次调用都新建客户端（原来get_response的写法）
+    fresh = []
+    for _ in range(args.requests):
+        client = OpenAI(api_key="mock", base_url=base_url, http_client=build_http_client())
+        fresh.append(call(client))
+        client.close()
+
+    # 复用共享客户端
+    shared = [call(get_openai_client(base_url=base_url, api_key="mock")) for _ in range(args.requests)]
+
+    server.shutdown()
+    close_openai_clients()
+    report("每次新建客户端", fresh)
+    report("复用共享客户端", shared)
+
+
+if __name__ == "__main__":
+    main()
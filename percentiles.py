@@ -0,0 +1,12 @@
+"""
+延迟统计共用的分位数计算，asr_metrics（语音识别）和model_router（模型路由）都使用，只依赖标准库。
+"""
+import math
+
+
+def percentile(sorted_values, q):
+    """最近秩法分位数"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q * len(sorted_values)))
+    return sorted_values[rank - 1]
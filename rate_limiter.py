@@ -0,0 +1,58 @@
+"""
+令牌桶限流器：批量识别、批量调用大模型等并发任务共用，控制对远端服务的请求速率。
+
+rate为每秒补充的令牌数（即长期平均QPS），capacity为桶容量（允许的突发请求数）。
+acquire()在线程中阻塞等待，acquire_async()在协程中等待，两者可以混用同一个实例。
+"""
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("rate必须大于0")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        # 统计
+        self.acquired = 0
+        self.waited_seconds = 0.0
+
+    def _reserve(self, tokens):
+        """扣除令牌，返回需要等待的秒数（令牌不足时预支，等待期间不再被其他调用方占用）"""
+        if tokens > self.capacity:
+            raise ValueError(f"一次申请的令牌数{tokens}超过桶容量{self.capacity}")
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.acquired += tokens
+            self.waited_seconds += wait
+            return wait
+
+    def acquire(self, tokens=1):
+        """阻塞直到获得令牌，返回等待的秒数"""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens=1):
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def get_stats(self):
+        return {
+            "rate": self.rate,
+            "capacity": self.capacity,
+            "acquired": self.acquired,
+            "waited_seconds": round(self.waited_seconds, 3),
+        }
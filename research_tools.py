@@ -0,0 +1,164 @@
+"""
+深度调研智能体的联网搜索工具：一次传入多个查询，用AsyncTavilyClient并发搜索，合并去重后返回。
+
+- 并发数由max_concurrency限制，每个查询单独超时，超时或失败的查询记录在errors中，其余结果照常返回
+- 不同查询命中的同一网页（按规范化后的URL）只保留一份，记录命中它的全部查询
+- 同时提供同步和异步实现：智能体以ainvoke/astream运行时直接在其事件循环中并发，
+  同步调用时在后台事件循环线程中执行
+- Tavily客户端在第一次搜索时才创建，导入本模块不需要TAVILY_API_KEY
+- 搜索结果缓存在SQLite中（见search_cache），设置SEARCH_CACHE_PATH=off可关闭
+
+用法：
+    from research_tools import internet_search
+    agent = create_deep_agent(model=..., tools=[internet_search])
+"""
+import asyncio
+import os
+import threading
+import weakref
+from typing import List, Literal
+from urllib.parse import urlsplit, urlunsplit
+
+from langchain_core.tools import StructuredTool
+
+from search_cache import SearchCache, normalize_query
+
+MAX_CONCURRENCY = 5
+QUERY_TIMEOUT = 20.0  # 单个查询的超时（秒）
+
+# AsyncTavilyClient内部持有绑定事件循环的httpx连接池，每个事件循环各用一个客户端
+_clients = weakref.WeakKeyDictionary()
+_loop = None
+_loop_lock = threading.Lock()
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_search_client():
+    """当前事件循环的Tavily异步客户端（延迟创建）"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        from tavily import AsyncTavilyClient
+        client = _clients[loop] = AsyncTavilyClient(api_key=os.environ["TAVILY_API_KEY"])
+    return client
+
+
+def get_search_cache():
+    """进程内共用的搜索缓存（延迟打开）；SEARCH_CACHE_PATH=off时不使用缓存"""
+    global _cache
+    if os.environ.get("SEARCH_CACHE_PATH", "").lower() == "off":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = SearchCache()
+        return _cache
+
+
+def _background_loop():
+    """同步调用共用的后台事件循环，连接池在多次调用间复用"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="research-search-loop", daemon=True).start()
+        return _loop
+
+
+def normalize_url(url):
+    """去掉fragment和末尾的斜杠、域名小写，用于结果去重"""
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/"), parts.query, ""))
+
+
+def merge_results(responses):
+    """合并各查询的结果：按URL去重，保留最高分，按分数从高到低排序"""
+    merged = {}
+    for query, response in responses:
+        for item in response.get("results", []):
+            key = normalize_url(item.get("url", ""))
+            existing = merged.get(key)
+            if existing is None:
+                merged[key] = dict(item, queries=[query])
+                continue
+            existing["queries"].append(query)
+            if item.get("score", 0) > existing.get("score", 0):
+                existing.update({k: v for k, v in item.items() if k != "queries"})
+    return sorted(merged.values(), key=lambda item: item.get("score", 0), reverse=True)
+
+
+async def multi_search(queries, max_results=5, topic="general", include_raw_content=False,
+                       max_concurrency=MAX_CONCURRENCY, timeout=QUERY_TIMEOUT, client=None, cache=None):
+    """
+    并发执行多个查询，先查缓存，只有未命中的查询才请求搜索服务。
+    cache: SearchCache，默认使用get_search_cache()
+    return: {"results": 去重后的结果, "answers": {查询: Tavily的直接答案}, "errors": {查询: 错误信息},
+             "cached": 命中缓存的查询}
+    """
+    cache = cache if cache is not None else get_search_cache()
+    semaphore = asyncio.Semaphore(max_concurrency)
+    cached = []
+
+    async def search_one(query):
+        if cache is not None:
+            response = cache.get(query, max_results, topic, include_raw_content)
+            if response is not None:
+                cached.append(query)
+                return query, response, None
+        async with semaphore:
+            try:
+                response = await asyncio.wait_for(
+                    (client or get_search_client()).search(query, max_results=max_results, topic=topic,
+                                                           include_raw_content=include_raw_content),
+                    timeout)
+            except asyncio.TimeoutError:
+                return query, None, f"超时（{timeout}秒）"
+            except Exception as e:
+                return query, None, f"{type(e).__name__}: {e}"
+        if cache is not None:
+            cache.put(query, response, max_results, topic, include_raw_content)
+        return query, response, None
+
+    # 重复（规范化后相同）的查询只搜索一次
+    unique = {normalize_query(query): query for query in reversed(queries)}
+    outcomes = await asyncio.gather(*(search_one(query) for query in reversed(unique.values())))
+    responses = [(query, response) for query, response, error in outcomes if error is None]
+    return {
+        "results": merge_results(responses),
+        "answers": {query: response["answer"] for query, response in responses if response.get("answer")},
+        "errors": {query: error for query, _, error in outcomes if error is not None},
+        "cached": cached,
+    }
+
+
+async def _internet_search_async(
+    queries: List[str],
+    max_results: int = 5,
+    topic: Literal["general", "news", "finance"] = "general",
+    include_raw_content: bool = False,
+):
+    return await multi_search(queries, max_results, topic, include_raw_content)
+
+
+def _internet_search(
+    queries: List[str],
+    max_results: int = 5,
+    topic: Literal["general", "news", "finance"] = "general",
+    include_raw_content: bool = False,
+):
+    future = asyncio.run_coroutine_threadsafe(
+        _internet_search_async(queries, max_results, topic, include_raw_content), _background_loop())
+    return future.result()
+
+
+internet_search = StructuredTool.from_function(
+    func=_internet_search,
+    coroutine=_internet_search_async,
+    name="internet_search",
+    description=(
+        "Run several web searches concurrently. Pass all the queries you need for the current step in one call "
+        "as a list; results are merged, de-duplicated by URL and sorted by relevance. Each result lists the "
+        "queries that found it. Queries that failed or timed out are reported under `errors`; the other results "
+        "are still returned."
+    ),
+)
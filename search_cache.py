@@ -0,0 +1,196 @@
+"""
+联网搜索结果的持久化缓存（SQLite）：相同或仅大小写、空白、标点不同的查询在TTL内直接返回缓存结果，
+跨进程、跨运行共享，减少Tavily的延迟和配额消耗。
+
+- 键：规范化后的查询 + max_results/topic/include_raw_content
+- TTL按topic区分：新闻、财经类结果很快过时，通用搜索保留更久
+- 数据库超过max_bytes时按最近访问时间淘汰
+- get_stats()返回命中/未命中/过期/淘汰计数
+
+运行本文件会用离线的假搜索后端演示缓存效果：
+    python search_cache.py
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+
+# 各topic的缓存有效期（秒）
+TOPIC_TTL = {
+    "news": 3600,
+    "finance": 4 * 3600,
+    "general": 7 * 24 * 3600,
+}
+DEFAULT_TTL = 24 * 3600
+MAX_BYTES = 50 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_cache (
+    key TEXT PRIMARY KEY,
+    query TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    expires REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS search_cache_accessed ON search_cache (accessed);
+"""
+
+
+def default_cache_path():
+    """SEARCH_CACHE_PATH优先（research_tools中设为off表示不缓存），默认放在用户缓存目录"""
+    return os.environ.get("SEARCH_CACHE_PATH") or os.path.join(
+        os.path.expanduser("~"), ".cache", "deepagents", "search_cache.sqlite3")
+
+
+def normalize_query(query):
+    """小写、合并空白、去掉首尾标点，使近似相同的查询命中同一条缓存"""
+    query = re.sub(r"\s+", " ", query.casefold()).strip()
+    return query.strip(" ?？!！.。,，;；:：'\"“”")
+
+
+def cache_key(query, max_results=5, topic="general", include_raw_content=False):
+    payload = json.dumps([normalize_query(query), max_results, topic, include_raw_content])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SearchCache:
+    """
+    线程安全；单次读写只有毫秒级，在事件循环中直接调用。
+    ttl为{topic: 秒}，未列出的topic使用DEFAULT_TTL。
+    """
+
+    def __init__(self, path=None, ttl=None, max_bytes=MAX_BYTES):
+        self.path = path or default_cache_path()
+        self.ttl = dict(TOPIC_TTL, **(ttl or {}))
+        self.max_bytes = max_bytes
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM search_cache").fetchone()[0]
+        # 统计
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def get(self, query, max_results=5, topic="general", include_raw_content=False):
+        """返回缓存的搜索结果，未命中或已过期时返回None"""
+        key = cache_key(query, max_results, topic, include_raw_content)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, expires, size FROM search_cache WHERE key = ?",
+                                     (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            response, expires, size = row
+            if expires <= now:
+                self._conn.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+                self._total_bytes -= size
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE search_cache SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(response)
+
+    def put(self, query, response, max_results=5, topic="general", include_raw_content=False):
+        key = cache_key(query, max_results, topic, include_raw_content)
+        data = json.dumps(response, ensure_ascii=False)
+        size = len(data.encode("utf-8"))
+        now = time.time()
+        expires = now + self.ttl.get(topic, DEFAULT_TTL)
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM search_cache WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, normalize_query(query), topic, data, size, now, expires, now))
+            self._total_bytes += size - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict(now)
+
+    def _evict(self, now):
+        """先删过期的，仍超过上限时按最近访问时间从旧到新删除，直到降到上限的90%"""
+        removed = self._conn.execute("DELETE FROM search_cache WHERE expires <= ?", (now,)).rowcount
+        self.expired += removed
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM search_cache").fetchone()[0]
+        target = self.max_bytes * 0.9
+        if self._total_bytes <= target:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM search_cache ORDER BY accessed").fetchall():
+            self._conn.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+            self._total_bytes -= size
+            self.evictions += 1
+            if self._total_bytes <= target:
+                break
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM search_cache")
+            self._total_bytes = 0
+
+    def get_stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": f"{self.hits / lookups * 100:.2f}%" if lookups else "0.00%",
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": self._total_bytes,
+        }
+
+    def close(self):
+        self._conn.close()
+
+
+class FakeSearchClient:
+    """离线的假搜索后端，与AsyncTavilyClient.search接口一致，记录实际发出的查询"""
+
+    def __init__(self, latency=0.2):
+        self.latency = latency
+        self.calls = []
+
+    async def search(self, query, max_results=5, topic="general", include_raw_content=False, **kwargs):
+        import asyncio
+        self.calls.append(query)
+        await asyncio.sleep(self.latency)
+        return {
+            "query": query,
+            "answer": None,
+            "results": [{"url": f"https://example.com/{normalize_query(query).replace(' ', '-')}/{i}",
+                         "title": f"{query} #{i}", "content": f"fake result for {query}", "score": 1 - i / 10}
+                        for i in range(max_results)],
+        }
+
+
+if __name__ == "__main__":
+    import asyncio
+
+    from research_tools import multi_search
+
+    queries = ["LangGraph checkpoints", "langgraph   checkpoints?", "deepagents subagents", "LangChain 1.0 release"]
+    backend = FakeSearchClient()
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = SearchCache(os.path.join(tmp, "search_cache.sqlite3"))
+        for run in range(2):
+            start = time.perf_counter()
+            result = asyncio.run(multi_search(queries, client=backend, cache=cache))
+            print(f"第{run + 1}次: {time.perf_counter() - start:.2f}s, 结果 {len(result['results'])} 条, "
+                  f"命中缓存 {len(result['cached'])} 个查询")
+        print(f"实际请求后端 {len(backend.calls)} 次: {backend.calls}")
+        print(f"缓存统计: {cache.get_stats()}")
+        cache.close()
@@ -0,0 +1,227 @@
+"""
+流式运行链和智能体：token和工具调用一产生就输出，不必等整个回答生成完。
+
+- 链：chain.stream/astream，每个输出块作为一个token事件
+- 智能体：agent.stream/astream(stream_mode=["messages", "values"])，模型的token、工具调用、工具返回分别成为事件
+- 输出目标（sink）是一个可调用对象sink(event, data)：stdout_sink打印到终端，sse_sink写成Server-Sent Events，
+  也可以传入任意回调；需要生成器时直接迭代iter_*/aiter_*，配合sse_format用于Flask等框架的流式响应
+- 每次运行记录首token延迟（TTFT）和生成速度（token/s），在done事件中返回，
+  设置STREAM_METRICS_JSONL时逐条追加到该文件
+
+事件：
+    token        {"text", "node"}           模型生成的文本片段
+    tool_call    {"name", "id"}             模型决定调用工具
+    tool_result  {"name", "id", "status", "content"}  工具返回（内容截断到TOOL_RESULT_PREVIEW个字符）
+    done         {运行统计}
+
+用法：
+    text, stats = stream_chain(chain, {"question": "..."})
+    state, stats = stream_agent(agent, {"messages": [{"role": "user", "content": "..."}]})
+"""
+import json
+import os
+import sys
+import time
+
+from langchain_core.messages import AIMessageChunk, ToolMessage
+
+TOOL_RESULT_PREVIEW = 200
+
+
+def _text(content):
+    """消息内容可能是字符串或内容块列表，只取文本部分"""
+    if isinstance(content, str):
+        return content
+    return "".join(block if isinstance(block, str) else block.get("text", "")
+                   for block in content if isinstance(block, str) or block.get("type") == "text")
+
+
+class StreamStats:
+    """一次运行的统计。token数优先使用模型返回的usage，没有时按输出块数计"""
+
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+        self.first_token = None
+        self.last_token = None
+        self.chunks = 0
+        self.characters = 0
+        self.output_tokens = 0
+        self.tool_calls = 0
+
+    def token(self, text):
+        now = time.perf_counter()
+        if self.first_token is None:
+            self.first_token = now
+        self.last_token = now
+        self.chunks += 1
+        self.characters += len(text)
+
+    def usage(self, usage_metadata):
+        if usage_metadata:
+            self.output_tokens += usage_metadata.get("output_tokens", 0)
+
+    def as_dict(self):
+        end = time.perf_counter()
+        tokens = self.output_tokens or self.chunks
+        generating = (self.last_token - self.first_token) if self.first_token is not None else 0
+        return {
+            "name": self.name,
+            "ttft_ms": round((self.first_token - self.start) * 1000, 1) if self.first_token is not None else None,
+            "duration_s": round(end - self.start, 3),
+            "tokens": tokens,
+            "token_source": "usage" if self.output_tokens else "chunks",
+            "tokens_per_s": round(tokens / generating, 1) if generating > 0 else None,
+            "characters": self.characters,
+            "tool_calls": self.tool_calls,
+        }
+
+
+def _finish(stats, jsonl_path):
+    record = stats.as_dict()
+    jsonl_path = jsonl_path or os.environ.get("STREAM_METRICS_JSONL")
+    if jsonl_path:
+        with open(jsonl_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(dict(record, timestamp=round(time.time(), 3)), ensure_ascii=False) + "\n")
+    return record
+
+
+def _chain_event(chunk, stats):
+    # StrOutputParser结尾的链输出字符串，直接以模型结尾的链输出消息块
+    if isinstance(chunk, AIMessageChunk):
+        stats.usage(chunk.usage_metadata)
+        text = _text(chunk.content)
+    else:
+        text = chunk if isinstance(chunk, str) else str(chunk)
+    if text:
+        stats.token(text)
+        return "token", {"text": text, "node": None}
+    return None
+
+
+def _agent_events(message, metadata, stats):
+    """把messages流中的一个消息转换为事件"""
+    node = metadata.get("langgraph_node")
+    if isinstance(message, AIMessageChunk):
+        stats.usage(message.usage_metadata)
+        text = _text(message.content)
+        if text:
+            stats.token(text)
+            yield "token", {"text": text, "node": node}
+        # 同一次工具调用的参数分多块到达，只有第一块带name
+        for call in message.tool_call_chunks:
+            if call.get("name"):
+                stats.tool_calls += 1
+                yield "tool_call", {"name": call["name"], "id": call.get("id")}
+    elif isinstance(message, ToolMessage):
+        yield "tool_result", {"name": message.name, "id": message.tool_call_id, "status": message.status,
+                              "content": _text(message.content)[:TOOL_RESULT_PREVIEW]}
+
+
+def iter_chain(chain, inputs, config=None, name="chain", jsonl_path=None):
+    """逐个产出(event, data)，最后一个是("done", 统计)"""
+    stats = StreamStats(name)
+    for chunk in chain.stream(inputs, config=config):
+        event = _chain_event(chunk, stats)
+        if event:
+            yield event
+    yield "done", _finish(stats, jsonl_path)
+
+
+async def aiter_chain(chain, inputs, config=None, name="chain", jsonl_path=None):
+    stats = StreamStats(name)
+    async for chunk in chain.astream(inputs, config=config):
+        event = _chain_event(chunk, stats)
+        if event:
+            yield event
+    yield "done", _finish(stats, jsonl_path)
+
+
+def iter_agent(agent, inputs, config=None, name="agent", jsonl_path=None):
+    """逐个产出(event, data)，最后一个是("done", 统计)，统计中的state为最终的智能体状态"""
+    stats = StreamStats(name)
+    state = None
+    for mode, data in agent.stream(inputs, config=config, stream_mode=["messages", "values"]):
+        if mode == "values":
+            state = data
+            continue
+        yield from _agent_events(*data, stats)
+    yield "done", dict(_finish(stats, jsonl_path), state=state)
+
+
+async def aiter_agent(agent, inputs, config=None, name="agent", jsonl_path=None):
+    stats = StreamStats(name)
+    state = None
+    async for mode, data in agent.astream(inputs, config=config, stream_mode=["messages", "values"]):
+        if mode == "values":
+            state = data
+            continue
+        for event in _agent_events(*data, stats):
+            yield event
+    yield "done", dict(_finish(stats, jsonl_path), state=state)
+
+
+def sse_format(event, data):
+    """格式化为一条Server-Sent Event"""
+    if event == "done":
+        data = {k: v for k, v in data.items() if k != "state"}
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def sse_sink(write):
+    """write为接收字符串的可调用对象，如wfile.write的包装或队列的put"""
+    return lambda event, data: write(sse_format(event, data))
+
+
+def stdout_sink(event, data, file=None):
+    """token直接打印，工具调用和统计单独成行"""
+    file = file or sys.stdout
+    if event == "token":
+        file.write(data["text"])
+    elif event == "tool_call":
+        file.write(f"\n[调用工具 {data['name']}]\n")
+    elif event == "tool_result":
+        preview = data["content"].replace("\n", " ")[:80]
+        file.write(f"[{data['name']} 返回] {preview}\n")
+    elif event == "done":
+        file.write(f"\n-- 首token {data['ttft_ms']}ms，{data['tokens_per_s']} token/s，"
+                   f"共{data['tokens']} token，耗时{data['duration_s']}s\n")
+    file.flush()
+
+
+def _consume(events, sink):
+    text = []
+    for event, data in events:
+        if event == "token":
+            text.append(data["text"])
+        sink(event, data)
+    return "".join(text), data
+
+
+async def _aconsume(events, sink):
+    text = []
+    async for event, data in events:
+        if event == "token":
+            text.append(data["text"])
+        sink(event, data)
+    return "".join(text), data
+
+
+def stream_chain(chain, inputs, sink=stdout_sink, config=None, name="chain", jsonl_path=None):
+    """流式运行链，返回(完整输出文本, 统计)"""
+    return _consume(iter_chain(chain, inputs, config, name, jsonl_path), sink)
+
+
+async def astream_chain(chain, inputs, sink=stdout_sink, config=None, name="chain", jsonl_path=None):
+    return await _aconsume(aiter_chain(chain, inputs, config, name, jsonl_path), sink)
+
+
+def stream_agent(agent, inputs, sink=stdout_sink, config=None, name="agent", jsonl_path=None):
+    """流式运行智能体，返回(最终状态, 统计)"""
+    _, stats = _consume(iter_agent(agent, inputs, config, name, jsonl_path), sink)
+    return stats.pop("state"), stats
+
+
+async def astream_agent(agent, inputs, sink=stdout_sink, config=None, name="agent", jsonl_path=None):
+    _, stats = await _aconsume(aiter_agent(agent, inputs, config, name, jsonl_path), sink)
+    return stats.pop("state"), stats
@@ -0,0 +1,50 @@
+"""audio_batch的离线测试：验证在静音处切分长音频，以及拼接时重叠区域的句子去重。"""
+import numpy as np
+
+from audio_batch import Segment, split_at_silence, stitch
+
+SAMPLE_RATE = 16000
+
+
+def test_split_at_silence_cuts_inside_quiet_gaps():
+    samples = np.full(5 * SAMPLE_RATE, 1000, dtype=np.int16)
+    gaps = [(24000, 25600), (50400, 52000)]
+    for start, end in gaps:
+        samples[start:end] = 0
+    segments = split_at_silence(samples, SAMPLE_RATE, max_segment=2.0, overlap=0.25, search=1.0)
+    assert len(segments) == 3
+    # 切点落在静音窗的中间
+    assert [segment.own_end for segment in segments[:-1]] == [24800, 51200]
+    assert segments[0].own_start == 0 and segments[-1].own_end == len(samples)
+    overlap = SAMPLE_RATE // 4
+    for previous, current in zip(segments, segments[1:]):
+        assert previous.own_end == current.own_start
+        assert previous.end == previous.own_end + overlap
+        assert current.start == current.own_start - overlap
+    assert all(segment.own_end - segment.own_start <= 2 * SAMPLE_RATE for segment in segments)
+
+
+def test_split_without_long_audio_returns_one_segment():
+    segments = split_at_silence(np.zeros(SAMPLE_RATE, dtype=np.int16), SAMPLE_RATE, max_segment=2.0)
+    assert [(s.start, s.end, s.own_start, s.own_end) for s in segments] == [(0, SAMPLE_RATE, 0, SAMPLE_RATE)]
+
+
+def test_stitch_keeps_overlap_sentence_from_segment_owning_its_midpoint():
+    # 片段0归属0~1000ms，片段1从750ms开始（包含250ms重叠），归属1000~2000ms
+    first = Segment(0, 0, 20000, 0, 16000)
+    second = Segment(1, 12000, 32000, 16000, 32000)
+    results = [
+        (first, [{'begin_time': 100, 'end_time': 800, 'text': '甲'},
+                 {'begin_time': 900, 'end_time': 980, 'text': '乙'},
+                 {'begin_time': 980, 'end_time': 1100, 'text': '丙'}]),
+        # 片段1内的时间相对750ms
+        (second, [{'begin_time': 150, 'end_time': 230, 'text': '乙'},
+                  {'begin_time': 230, 'end_time': 350, 'text': '丙'},
+                  {'begin_time': 500, 'text': '丁'}]),
+    ]
+    assert stitch(results, SAMPLE_RATE) == [
+        {'begin_time': 100, 'end_time': 800, 'text': '甲'},
+        {'begin_time': 900, 'end_time': 980, 'text': '乙'},
+        {'begin_time': 980, 'end_time': 1100, 'text': '丙'},
+        {'begin_time': 1250, 'end_time': 1250, 'text': '丁'},
+    ]
@@ -0,0 +1,75 @@
+"""batch_runner的离线测试：用本地模拟provider验证续跑、格式错误的行和token统计。"""
+import json
+
+from langchain_core.messages import AIMessage
+
+from batch_runner import BatchRunner, MockProvider, RequestError, _usage, load_completed, read_requests
+
+
+def write_lines(path, lines):
+    path.write_text("".join(line + "\n" for line in lines), encoding="utf-8")
+
+
+def read_records(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+
+def runner():
+    return BatchRunner("mock", workers=2, retries=0, providers={"mock": lambda: MockProvider(latency=0.001)})
+
+
+def test_malformed_lines_are_recorded_as_errors(tmp_path):
+    input_path = tmp_path / "in.jsonl"
+    write_lines(input_path, [
+        '{"id": "ok", "prompt": "你好"}',
+        '{"id": "broken"',
+        '["oops"]',
+        '"text"',
+        '{"id": "empty"}',
+        '{"id": "unknown", "prompt": "x", "provider": "nope"}',
+    ])
+    requests = list(read_requests(input_path))
+    assert [request_id for request_id, _ in requests] == ["ok", "line-2", "line-3", "line-4", "empty", "unknown"]
+    assert all(isinstance(request, RequestError) for _, request in requests[1:4])
+
+    output_path = tmp_path / "out.jsonl"
+    stats = runner().run(read_requests(input_path), output_path)
+    assert stats["requests_ok"] == 1
+    assert stats["requests_failed"] == 5
+    status = {record["id"]: record["status"] for record in read_records(output_path)}
+    assert status == {"ok": "ok", "line-2": "error", "line-3": "error", "line-4": "error",
+                      "empty": "error", "unknown": "error"}
+
+
+def test_resume_after_truncated_last_line(tmp_path):
+    input_path = tmp_path / "in.jsonl"
+    write_lines(input_path, [json.dumps({"id": f"q{i}", "prompt": f"问题{i}"}) for i in range(4)])
+    output_path = tmp_path / "out.jsonl"
+    # 上次运行完成了q0，写q1时中断，只留下半行
+    output_path.write_text(json.dumps({"id": "q0", "status": "ok"}) + '\n{"id": "q1", "sta', encoding="utf-8")
+    assert load_completed(output_path) == {"q0"}
+
+    stats = runner().run(read_requests(input_path), output_path)
+    assert stats["requests_skipped"] == 1
+    assert stats["requests_ok"] == 3
+    assert load_completed(output_path) == {"q0", "q1", "q2", "q3"}
+    # 半行单独成行，之后的记录都能解析
+    lines = output_path.read_text(encoding="utf-8").splitlines()
+    assert lines[1] == '{"id": "q1", "sta'
+    assert len([json.loads(line) for line in lines[2:]]) == 3
+
+    stats = runner().run(read_requests(input_path), output_path)
+    assert stats["requests_skipped"] == 4
+    assert stats["requests_ok"] == 0
+
+
+def test_usage_reads_usage_metadata_and_tongyi_token_usage():
+    messages = [
+        AIMessage(content="a", usage_metadata={"input_tokens": 10, "output_tokens": 2, "total_tokens": 12}),
+        # ChatTongyi只在response_metadata中给出用量
+        AIMessage(content="b", response_metadata={"token_usage": {"input_tokens": 30, "output_tokens": 4,
+                                                                  "total_tokens": 34}}),
+        AIMessage(content="c", response_metadata={"token_usage": {"prompt_tokens": 5, "completion_tokens": 1}}),
+        AIMessage(content="d"),
+    ]
+    assert _usage(messages) == (45, 7)
@@ -0,0 +1,121 @@
+"""llm_cache的离线测试：内存数据库 + 本地n-gram向量，验证精确、相似、过期和淘汰。"""
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+import llm_cache
+from llm_cache import FakeOpenAIClient, LLMCache, NgramEmbeddings, cache_key, cached_openai_client, langchain_cache
+
+
+def expire(cache, namespace, prompt):
+    """把条目的过期时间改到过去"""
+    cache._conn.execute("UPDATE llm_cache SET expires = 0 WHERE key = ?", (cache_key(namespace, prompt),))
+
+
+def test_exact_hit_and_miss():
+    cache = LLMCache(":memory:")
+    assert cache.get("ns", "完整输出静夜思") is None
+    cache.put("ns", "完整输出静夜思", {"text": "床前明月光"})
+    assert cache.get("ns", "完整输出静夜思") == {"text": "床前明月光"}
+    # 命名空间不同（模型或参数不同）不混用
+    assert cache.get("other", "完整输出静夜思") is None
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 1)
+
+
+def test_similarity_hit():
+    cache = LLMCache(":memory:", embeddings=NgramEmbeddings(), similarity_threshold=0.9)
+    cache.put("ns", "完整输出静夜思", "床前明月光")
+    assert cache.get("ns", "完整输出 静夜思。") == "床前明月光"
+    assert cache.get("ns", "介绍一下LangGraph") is None
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["semantic_hits"], stats["misses"]) == (0, 1, 1)
+
+
+def test_expired_entry_is_removed():
+    cache = LLMCache(":memory:", ttl=3600)
+    cache.put("ns", "p", "old")
+    expire(cache, "ns", "p")
+    assert cache.get("ns", "p") is None
+    stats = cache.get_stats()
+    assert (stats["expired"], stats["entries"]) == (1, 0)
+
+
+def test_expired_best_candidate_falls_through_to_next():
+    cache = LLMCache(":memory:", embeddings=NgramEmbeddings(), similarity_threshold=0.9)
+    cache.put("ns", "完整输出 静夜思。", "过期的回答")
+    cache.put("ns", "完整输出静夜思吧", "有效的回答")
+    expire(cache, "ns", "完整输出 静夜思。")
+    # 最相似的条目已过期：删除后继续用阈值以上的下一个
+    assert cache.get("ns", "完整输出静夜思") == "有效的回答"
+    stats = cache.get_stats()
+    assert (stats["semantic_hits"], stats["expired"], stats["entries"]) == (1, 1, 1)
+    keys, _ = cache._namespace_index("ns")
+    assert keys == [cache_key("ns", "完整输出静夜思吧")]
+
+
+def test_eviction_removes_least_recently_accessed():
+    cache = LLMCache(":memory:", max_entries=10)
+    for i in range(10):
+        cache.put("ns", f"p{i}", i)
+    # p0最近被访问过，淘汰时保留
+    assert cache.get("ns", "p0") == 0
+    cache.put("ns", "p10", 10)
+    stats = cache.get_stats()
+    assert stats["entries"] == 9
+    assert stats["evictions"] == 2
+    assert cache.get("ns", "p0") == 0
+    assert cache.get("ns", "p1") is None
+    assert cache.get("ns", "p10") == 10
+
+
+class LockCheckingEmbeddings(NgramEmbeddings):
+    """记录调用次数，并检查计算向量时没有持有缓存的锁"""
+
+    def __init__(self):
+        super().__init__()
+        self.cache = None
+        self.calls = 0
+
+    def embed_query(self, text):
+        assert not self.cache._lock.locked()
+        self.calls += 1
+        return super().embed_query(text)
+
+
+def test_embeddings_computed_outside_lock_and_only_on_exact_miss():
+    embeddings = LockCheckingEmbeddings()
+    cache = embeddings.cache = LLMCache(":memory:", embeddings=embeddings, similarity_threshold=0.9)
+    assert cache.get("ns", "完整输出静夜思") is None
+    # 紧接着的put复用get未命中时算出的向量
+    cache.put("ns", "完整输出静夜思", "床前明月光")
+    assert embeddings.calls == 1
+    assert cache.get("ns", "完整输出静夜思") == "床前明月光"
+    assert embeddings.calls == 1
+    assert cache.get("ns", "完整输出 静夜思。") == "床前明月光"
+    assert embeddings.calls == 2
+
+
+def test_shared_cache_is_off_unless_path_is_set(monkeypatch, tmp_path):
+    monkeypatch.setattr(llm_cache, "_cache", None)
+    monkeypatch.delenv("LLM_CACHE_PATH", raising=False)
+    assert llm_cache.get_llm_cache() is None
+    assert langchain_cache("fake") is None
+    monkeypatch.setenv("LLM_CACHE_PATH", "off")
+    assert llm_cache.get_llm_cache() is None
+    monkeypatch.setenv("LLM_CACHE_PATH", str(tmp_path / "cache.sqlite3"))
+    cache = llm_cache.get_llm_cache()
+    assert cache is not None and cache.path == str(tmp_path / "cache.sqlite3")
+    cache.close()
+
+
+def test_langchain_and_openai_clients_use_cache():
+    cache = LLMCache(":memory:")
+    model = FakeListChatModel(responses=["回答1", "回答2"], cache=langchain_cache("fake", cache))
+    assert model.invoke("你好").content == "回答1"
+    assert model.invoke("你好").content == "回答1"
+    assert model.i == 1
+
+    client = cached_openai_client(FakeOpenAIClient(), cache)
+    for _ in range(2):
+        client.chat.completions.create(model="qwen-plus", messages=[{"role": "user", "content": "你好"}])
+    assert client._client.calls == ["你好"]
+    assert cache.get_stats()["by_model"]["qwen-plus"] == {"hits": 1, "semantic_hits": 0, "misses": 1}
@@ -0,0 +1,76 @@
+"""model_router的离线测试：用延迟固定（sigma=0）的本地假模型验证排序、对冲和切换。"""
+import time
+
+import pytest
+
+from model_router import FakeLatencyChatModel, RouterChatModel
+
+
+def fake(name, median=0.01, error_rate=0.0):
+    return FakeLatencyChatModel(name=name, median=median, sigma=0.0, error_rate=error_rate, answer=name)
+
+
+def router(*backends, **kwargs):
+    return RouterChatModel(backends=list(backends), names=[b.name for b in backends], **kwargs)
+
+
+def test_untried_backends_are_probed_then_fastest_wins():
+    r = router(fake("slow", 0.05), fake("fast", 0.01), hedge_delay=None)
+    # 两个后端都没有样本时按配置顺序各探测一次
+    assert r.invoke("x").content == "slow"
+    assert r._ranked() == [1, 0]
+    assert r.invoke("x").content == "fast"
+    for _ in range(3):
+        assert r.invoke("x").content == "fast"
+    assert r.get_stats()["backends"]["slow"]["requests"] == 1
+
+
+def test_backend_that_never_succeeded_ranks_last():
+    r = router(fake("bad", error_rate=1.0), fake("good"), hedge_delay=None, cooldown=60)
+    for _ in range(10):
+        assert r.invoke("x").content == "good"
+    stats = r.get_stats()
+    assert stats["backends"]["bad"]["requests"] == 1
+    assert stats["failovers"] == 1
+    assert r._ranked() == [1, 0]
+
+
+def test_hedge_after_delay_uses_first_result():
+    r = router(fake("slow", 0.5), fake("fast", 0.02), hedge_delay=0.05)
+    start = time.monotonic()
+    message = r.invoke("x")
+    assert message.content == "fast"
+    assert message.response_metadata["router_backend"] == "fast"
+    assert time.monotonic() - start < 0.3
+    assert r.get_stats()["backends"]["fast"]["hedges"] == 1
+
+
+def test_hedge_applies_to_first_token_when_streaming():
+    r = router(fake("slow", 0.5), fake("fast", 0.02), hedge_delay=0.05)
+    chunks = list(r.stream("x"))
+    assert "".join(c.content for c in chunks) == "fast"
+    assert chunks[0].response_metadata["router_backend"] == "fast"
+
+
+def test_failover_on_error_and_all_failed():
+    r = router(fake("bad", error_rate=1.0), fake("good"), hedge_delay=None)
+    assert r.invoke("x").content == "good"
+    assert r.get_stats()["failovers"] == 1
+
+    r = router(fake("a", error_rate=1.0), fake("b", error_rate=1.0), hedge_delay=None)
+    with pytest.raises(RuntimeError, match="所有后端均失败"):
+        r.invoke("x")
+
+
+def test_failover_backend_gets_a_full_hedge_window():
+    # bad在80ms时失败，切换到ok（60ms）；对冲窗口从切换时重新计算，不会在100ms时对冲到spare
+    r = router(fake("bad", 0.08, error_rate=1.0), fake("ok", 0.06), fake("spare", 0.01), hedge_delay=0.1)
+    assert r.invoke("x").content == "ok"
+    assert r.get_stats()["backends"]["spare"]["requests"] == 0
+
+
+def test_bind_tools_shares_stats():
+    r = router(fake("a"), hedge_delay=None)
+    bound = r.bind_tools([])
+    bound.invoke("x")
+    assert r.get_stats()["backends"]["a"]["requests"] == 1